@@ -1,17 +1,28 @@
+import time
+
+import_start = time.perf_counter()
 from experiment import InfantEyetrackingExperiment
 from config import EXPERIMENT_CONFIG
 from utils import setup_logging
+import_time = time.perf_counter() - import_start
 
 def main():
     # Initialize logging (clears any existing log file)
     logger = setup_logging(EXPERIMENT_CONFIG['log_file'])
+    logger.info(f"Startup: imports took {import_time:.2f} s")
     
     # Create an instance of the experiment with configuration and logger
     experiment = InfantEyetrackingExperiment(EXPERIMENT_CONFIG, logger)
     
     # Run each phase of the experiment
-    #experiment.run_training_phase()
+    if EXPERIMENT_CONFIG.get('run_training', False):
+        experiment.run_training_phase()
     experiment.run_gaze_triggered_phase()
     experiment.EndDisp()
+
+    # Flush and close the buffered data files
+    experiment.data_logger.close()
+    experiment.gaze_buffer.wait()
+    experiment.chain_store.close()
 if __name__ == '__main__':
     main()
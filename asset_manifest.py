@@ -0,0 +1,223 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+
+MEDIA_KINDS = {
+    '.png': 'image', '.jpg': 'image', '.jpeg': 'image', '.gif': 'image',
+    '.mp4': 'movie',
+    '.wav': 'sound', '.mp3': 'sound', '.m4a': 'sound',
+}
+
+# Bump when the probed fields change, so existing manifests are rebuilt
+MANIFEST_VERSION = 1
+
+
+def file_hash(path):
+    """Return the SHA-1 hex digest of a file's contents."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def probe_movie(path):
+    """Return a video's frame_count, fps, duration (seconds), width and height (OpenCV)."""
+    try:
+        import cv2
+    except ImportError:
+        return {}
+    capture = cv2.VideoCapture(path)
+    try:
+        if not capture.isOpened():
+            return {}
+        frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = float(capture.get(cv2.CAP_PROP_FPS))
+        return {
+            'frame_count': frame_count,
+            'fps': fps,
+            'duration': frame_count / fps if fps > 0 else None,
+            'width': int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'height': int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        }
+    finally:
+        capture.release()
+
+
+def probe_image(path):
+    """Return an image's width and height (Pillow)."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return {}
+    with Image.open(path) as image:
+        return {'width': image.width, 'height': image.height}
+
+
+def probe_sound(path):
+    """Return a sound's sample_rate, channels, frame_count and duration (soundfile, or wave for .wav)."""
+    try:
+        import soundfile
+        info = soundfile.info(path)
+        return {'sample_rate': info.samplerate, 'channels': info.channels,
+                'frame_count': info.frames, 'duration': info.duration}
+    except ImportError:
+        pass
+    except RuntimeError:
+        # Formats libsndfile cannot read (e.g. .m4a)
+        return {}
+    if path.lower().endswith('.wav'):
+        import wave
+        with wave.open(path, 'rb') as f:
+            return {'sample_rate': f.getframerate(), 'channels': f.getnchannels(),
+                    'frame_count': f.getnframes(), 'duration': f.getnframes() / float(f.getframerate())}
+    return {}
+
+
+PROBES = {'image': probe_image, 'movie': probe_movie, 'sound': probe_sound}
+
+
+class AssetManifest:
+    """
+    Manifest of every stimulus file under a root directory: size, modification
+    time, SHA-1, and the media properties the experiment needs (duration,
+    frame count and rate, dimensions, audio sample rate and channels).
+
+    The manifest is stored as JSON and reused across sessions. ``refresh``
+    walks the tree once; files whose size and modification time match the
+    stored entry keep it, and only new or changed files are hashed and
+    probed. Probing uses OpenCV for movies, Pillow for images and soundfile
+    for sounds; properties a missing library would provide are left out.
+
+    Parameters:
+    -----------
+    root : str
+        Stimuli directory
+    manifest_path : str
+        JSON file the manifest is stored in
+    logger : logging.Logger, optional
+        Experiment logger
+    """
+
+    def __init__(self, root, manifest_path, logger=None):
+        self.root = os.path.abspath(root)
+        self.manifest_path = manifest_path
+        self.logger = logger
+        self.entries = {}  # {relative path: entry dict}
+        self.n_probed = 0
+        if os.path.exists(manifest_path):
+            try:
+                with open(manifest_path) as f:
+                    stored = json.load(f)
+                if stored.get('version') == MANIFEST_VERSION:
+                    self.entries = stored['files']
+            except (OSError, ValueError, KeyError) as e:
+                self._log(f"Ignoring unreadable asset manifest {manifest_path}: {e}")
+
+    def _log(self, message):
+        if self.logger is not None:
+            self.logger.info(message)
+
+    def _walk(self, directory):
+        for entry in os.scandir(directory):
+            if entry.name.startswith('.'):
+                continue
+            if entry.is_dir():
+                yield from self._walk(entry.path)
+            elif os.path.splitext(entry.name)[1].lower() in MEDIA_KINDS:
+                yield entry
+
+    def refresh(self):
+        """
+        Bring the manifest up to date with the files on disk.
+
+        Returns:
+        --------
+        int
+            Number of files that were (re)hashed and probed
+        """
+        entries = {}
+        self.n_probed = 0
+        for dir_entry in self._walk(self.root):
+            stat = dir_entry.stat()
+            relative = os.path.relpath(dir_entry.path, self.root).replace(os.sep, '/')
+            entry = self.entries.get(relative)
+            if entry is None or entry['size'] != stat.st_size or entry['mtime'] != stat.st_mtime:
+                kind = MEDIA_KINDS[os.path.splitext(dir_entry.name)[1].lower()]
+                entry = {'kind': kind, 'size': stat.st_size, 'mtime': stat.st_mtime, 'sha1': file_hash(dir_entry.path)}
+                try:
+                    entry.update(PROBES[kind](dir_entry.path))
+                except Exception as e:
+                    self._log(f"Could not probe {relative}: {e}")
+                self.n_probed += 1
+            elif entry['kind'] in ('movie', 'sound') and 'duration' not in entry:
+                # Probed before its library was available; the hash is still valid
+                try:
+                    entry.update(PROBES[entry['kind']](dir_entry.path))
+                except Exception as e:
+                    self._log(f"Could not probe {relative}: {e}")
+            entries[relative] = entry
+        self.entries = entries
+        return self.n_probed
+
+    def save(self):
+        """Write the manifest (atomically, via a temporary file)."""
+        directory = os.path.dirname(self.manifest_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = self.manifest_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump({'version': MANIFEST_VERSION, 'files': self.entries}, f, indent=1, sort_keys=True)
+        os.replace(temp_path, self.manifest_path)
+
+    def _relative(self, path):
+        return os.path.relpath(os.path.abspath(path), self.root).replace(os.sep, '/')
+
+    def get(self, path):
+        """Return the entry for a file (absolute, or relative to the current directory), or None."""
+        return self.entries.get(self._relative(path))
+
+    def files(self, directory, extensions):
+        """
+        Return the paths of the files directly in a directory with one of the
+        given extensions (".mp3" or "mp3"), without touching the disk.
+        """
+        prefix = self._relative(directory).rstrip('/') + '/'
+        if prefix == './':
+            prefix = ''
+        extensions = tuple(ext.lower() if ext.startswith('.') else '.' + ext.lower() for ext in extensions)
+        return [os.path.join(self.root, relative) for relative in sorted(self.entries)
+                if relative.startswith(prefix) and '/' not in relative[len(prefix):]
+                and relative.lower().endswith(extensions)]
+
+    def sha1(self, path):
+        """Return a file's SHA-1 from the manifest, or None if it is not in it."""
+        entry = self.get(path)
+        return entry['sha1'] if entry else None
+
+    def duration(self, path, default=None):
+        """Return a movie's or sound's duration in seconds from the manifest."""
+        entry = self.get(path)
+        duration = entry.get('duration') if entry else None
+        return duration if duration else default
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or update the stimulus asset manifest.")
+    parser.add_argument('--root', default='stimuli', help="Stimuli directory (default: stimuli)")
+    parser.add_argument('--manifest', default=os.path.join('stimuli', '.asset_manifest.json'),
+                        help="Manifest file (default: stimuli/.asset_manifest.json)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    manifest = AssetManifest(args.root, args.manifest)
+    n_probed = manifest.refresh()
+    manifest.save()
+    print(f"{len(manifest.entries)} assets, {n_probed} probed, "
+          f"{len(manifest.entries) - n_probed} unchanged ({time.perf_counter() - start:.2f} s) -> {args.manifest}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+from psychopy import core
+
+from utils import init_audio
+
+
+def sound_start_time(snd):
+    """
+    Return PsychPortAudio's estimate (core.getTime() seconds) of when a
+    sound's first sample reached the speaker, or None if the backend does
+    not report one (anything but ptb) or the sound has not started yet.
+    """
+    try:
+        start = snd.track.status['StartTime']
+    except (AttributeError, KeyError, TypeError):
+        return None
+    return start if start > 0 else None
+
+
+class AudioScheduler:
+    """
+    Starts sounds together with the next flip and logs when they actually
+    started.
+
+    On the ptb backend a sound is started with ``play(when=...)`` for the
+    predicted time of the next flip (Window.getFutureFlipTime), so
+    PsychPortAudio starts it on the frame the matching visual change appears
+    rather than whenever play() happens to be called in the frame loop.
+    Every onset is logged with the time of the flip it belongs to, the
+    requested start and the start PsychPortAudio reports, which gives the
+    audio-visual asynchrony of each sound. Other backends cannot schedule a
+    start, so the sound is started from a callback right after the flip and
+    the time of that call is logged as its onset.
+
+    PsychPortAudio mixes all sounds with the same sample rate and channel
+    count into one shared output stream; ``preload`` registers the sounds and
+    warns when they need more than one.
+
+    All times are core.getTime() seconds, the clock PsychPortAudio uses.
+
+    Parameters:
+    -----------
+    win : psychopy.visual.Window
+        The window whose flips sounds are locked to
+    logger : logging.Logger
+        Experiment logger
+    data_logger : DataLogger, optional
+        Receives one row per onset (log_audio_onset)
+    """
+
+    def __init__(self, win, logger, data_logger=None):
+        self.win = win
+        self.logger = logger
+        self.data_logger = data_logger
+        self.backend = init_audio().audioLib
+        self.scheduled = self.backend == 'ptb'
+        self.names = {}  # {id(sound): name}
+        self._pending = []  # [(sound, onset)] waiting for their actual start time
+        self._asynchronies = []  # ms, since the last flush
+
+    def preload(self, sounds):
+        """
+        Register loaded sounds under their names.
+
+        Parameters:
+        -----------
+        sounds : dict
+            {name: psychopy.sound.Sound}
+        """
+        formats = set()
+        for name, snd in sounds.items():
+            self.names[id(snd)] = name
+            formats.add((getattr(snd, 'sampleRate', None), getattr(snd, 'channels', None)))
+        self.logger.info(f"Audio scheduler ({self.backend}): {len(sounds)} sounds preloaded, "
+                         f"{len(formats)} stream format(s) {sorted(formats, key=str)}")
+        if self.scheduled and len(formats) > 1:
+            self.logger.warning("Sounds differ in sample rate or channel count and are mixed on separate streams; "
+                                "convert them to one format to play them all through a single stream")
+
+    def play_at_flip(self, snd, label=''):
+        """
+        Start a sound with the next flip.
+
+        Parameters:
+        -----------
+        snd : psychopy.sound.Sound
+            A sound (ideally registered with preload, so it is logged by name)
+        label : str
+            What the sound belongs to (e.g. "loom cross"), for the log
+
+        Returns:
+        --------
+        dict
+            The onset record; flip_time and actual_onset are filled in later
+        """
+        # Replaying a sound overwrites its reported start time, so log the previous onset first
+        self._resolve(snd)
+        onset = {
+            'trial_num': getattr(self.data_logger, 'current_trial', ''),
+            'sound': self.names.get(id(snd), ''),
+            'label': label,
+            'flip_time': None,
+            'requested_onset': None,
+            'actual_onset': None,
+        }
+        if self.scheduled:
+            onset['requested_onset'] = self.win.getFutureFlipTime(clock='ptb')
+            snd.play(when=onset['requested_onset'])
+        self.win.callOnFlip(self._on_flip, snd, onset)
+        self._pending.append((snd, onset))
+        return onset
+
+    def _on_flip(self, snd, onset):
+        onset['flip_time'] = core.getTime()
+        if not self.scheduled:
+            snd.play()
+            onset['requested_onset'] = onset['flip_time']
+            onset['actual_onset'] = core.getTime()
+
+    def _resolve(self, snd=None):
+        # Log the pending onsets of one sound (or of all sounds)
+        pending = []
+        for pending_snd, onset in self._pending:
+            if snd is not None and pending_snd is not snd:
+                pending.append((pending_snd, onset))
+                continue
+            if self.scheduled:
+                onset['actual_onset'] = sound_start_time(pending_snd)
+            if onset['flip_time'] is not None and onset['actual_onset'] is not None:
+                onset['asynchrony_ms'] = (onset['actual_onset'] - onset['flip_time']) * 1000
+                self._asynchronies.append(onset['asynchrony_ms'])
+            if self.data_logger is not None:
+                self.data_logger.log_audio_onset(onset)
+        self._pending = pending
+
+    def flush(self):
+        """Log every pending onset and summarise the asynchrony since the last flush. Call between trials."""
+        self._resolve()
+        if self._asynchronies:
+            self.logger.info(
+                f"Audio onsets: {len(self._asynchronies)} sounds, audio-visual asynchrony "
+                f"mean {sum(self._asynchronies) / len(self._asynchronies):.1f} ms, "
+                f"range {min(self._asynchronies):.1f} to {max(self._asynchronies):.1f} ms")
+        self._asynchronies = []
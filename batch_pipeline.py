@@ -0,0 +1,222 @@
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from asset_manifest import file_hash
+from gaze_events import detect_events
+from tobii_data import EventIndex, read_tobii_tsv, subject_from_path
+
+# Bump when process_subject changes, so cached results are recomputed
+PIPELINE_VERSION = 2
+
+# Study name -> (behavioural data directory name, eyetracking directory name)
+STUDY_DIRS = {
+    'pilot_1': ('pilot_v1', 'pilot_1'),
+    'pilot_2': ('pilot_v2', 'pilot_2'),
+}
+
+SubjectFiles = namedtuple('SubjectFiles', ['selections', 'sequence', 'training_log', 'gaze'])
+
+SUMMARY_COLUMNS = [
+    'subject', 'n_selections', 'n_queued', 'mean_fixation_ms', 'mean_rt_ms',
+    'n_sequence_trials', 'mean_sequence_length', 'n_training_events', 'n_ag_videos',
+    'n_samples', 'valid_fraction', 'n_fixations', 'mean_fixation_duration_ms', 'n_saccades',
+    'n_gt_trials', 'mean_gt_trial_valid_fraction',
+]
+
+
+def normalize_subject(code):
+    """Subject codes in file names sometimes carry a trailing underscore (IB003_)."""
+    return code.rstrip('_')
+
+
+def discover_subjects(study, data_root='data', gaze_root='eyetrackingData'):
+    """
+    Find every subject of a study and its file set.
+
+    Parameters:
+    -----------
+    study : str
+        Study name (a key of STUDY_DIRS, e.g. "pilot_2")
+    data_root, gaze_root : str
+        Roots of the behavioural data and eyetracking data
+
+    Returns:
+    --------
+    dict
+        {subject: SubjectFiles}; files a subject does not have are None
+    """
+    data_dir, gaze_dir = STUDY_DIRS[study]
+    patterns = {
+        'selections': (os.path.join(data_root, 'selections', data_dir, 'selections_*.csv'), 'selections_'),
+        'sequence': (os.path.join(data_root, 'sequences', data_dir, 'sequence_*.csv'), 'sequence_'),
+        'training_log': (os.path.join(data_root, 'training', data_dir, 'training_log_*.csv'), 'training_log_'),
+    }
+    found = {}
+    for field, (pattern, prefix) in patterns.items():
+        for path in glob.glob(pattern):
+            subject = normalize_subject(os.path.splitext(os.path.basename(path))[0][len(prefix):])
+            found.setdefault(subject, {})[field] = path
+    for path in glob.glob(os.path.join(gaze_root, gaze_dir, '*_TOBII_output.tsv')):
+        found.setdefault(subject_from_path(path), {})['gaze'] = path
+
+    return {subject: SubjectFiles(**{field: files.get(field) for field in SubjectFiles._fields})
+            for subject, files in sorted(found.items())}
+
+
+def cache_key(files):
+    """Key a subject's result by the pipeline version and the content of its input files."""
+    digest = hashlib.sha1(f"v{PIPELINE_VERSION}".encode())
+    for field, path in zip(files._fields, files):
+        digest.update(f"{field}={file_hash(path) if path else ''};".encode())
+    return digest.hexdigest()
+
+
+def _read_csv(path):
+    if path is None:
+        return []
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def _mean(values):
+    return float(np.mean(values)) if len(values) else ''
+
+
+def process_subject(subject, files):
+    """
+    Summarise one subject's selections, sequences, training log and gaze.
+
+    Returns:
+    --------
+    dict
+        One summary row (SUMMARY_COLUMNS)
+    """
+    row = {'subject': subject}
+
+    selections = _read_csv(files.selections)
+    executed = [s for s in selections if s['was_executed'] == 'True']
+    row['n_selections'] = len(executed)
+    row['n_queued'] = sum(s['queued_selection'] == 'True' for s in selections)
+    row['mean_fixation_ms'] = _mean([float(s['fixation_duration_ms']) for s in executed
+                                     if float(s['fixation_duration_ms']) > 0])
+    row['mean_rt_ms'] = _mean([float(s['rt_from_previous_selection_ms']) for s in executed])
+
+    sequences = _read_csv(files.sequence)
+    row['n_sequence_trials'] = len(sequences)
+    row['mean_sequence_length'] = _mean([int(s['selection_order']) for s in sequences])
+
+    training = _read_csv(files.training_log)
+    row['n_training_events'] = len(training)
+    row['n_ag_videos'] = sum(t['phase'] == 'AG' and t['event_type'] == 'videoStart' for t in training)
+
+    for column in SUMMARY_COLUMNS[9:]:
+        row[column] = ''
+    if files.gaze is not None:
+        header, samples, events = read_tobii_tsv(files.gaze)
+        valid = ~(np.isnan(samples['x']) | np.isnan(samples['y']))
+        fixations, saccades = detect_events(samples['timestamp'], samples['x'], samples['y'], header=header)
+        row['n_samples'] = len(samples)
+        row['valid_fraction'] = float(valid.mean()) if len(samples) else ''
+        row['n_fixations'] = len(fixations)
+        row['mean_fixation_duration_ms'] = _mean(fixations['duration'])
+        row['n_saccades'] = len(saccades)
+
+        event_index = EventIndex(samples['timestamp'], events)
+        trial_valid = []
+        for trial_num in event_index.trials("gaze_triggered"):
+            start, end = event_index.trial_range(trial_num)
+            if end > start:
+                trial_valid.append(valid[start:end].mean())
+        row['n_gt_trials'] = len(trial_valid)
+        row['mean_gt_trial_valid_fraction'] = _mean(trial_valid)
+    return row
+
+
+def run_study(study, out_root=os.path.join('data', 'analysis'), workers=None, force=False,
+              data_root='data', gaze_root='eyetrackingData'):
+    """
+    Process every subject of a study in a process pool, reusing cached results.
+
+    Each subject's result is cached in <out_root>/<study>/cache/<subject>.json
+    under a key made from the SHA-1 of its input files, so only subjects whose
+    inputs are new or changed are processed again. The combined summary is
+    written to <out_root>/<study>/subjects.csv.
+
+    Parameters:
+    -----------
+    study : str
+        Study name (a key of STUDY_DIRS)
+    out_root : str
+        Output root (default: data/analysis)
+    workers : int, optional
+        Number of worker processes (default: one per CPU)
+    force : bool
+        Ignore cached results (default: False)
+
+    Returns:
+    --------
+    tuple (rows, processed)
+        Summary rows for all subjects and the subjects that were (re)processed
+    """
+    subjects = discover_subjects(study, data_root, gaze_root)
+    cache_dir = os.path.join(out_root, study, 'cache')
+    os.makedirs(cache_dir, exist_ok=True)
+
+    results = {}
+    pending = {}
+    for subject, files in subjects.items():
+        key = cache_key(files)
+        cache_path = os.path.join(cache_dir, f"{subject}.json")
+        if not force and os.path.exists(cache_path):
+            with open(cache_path) as f:
+                cached = json.load(f)
+            if cached.get('key') == key:
+                results[subject] = cached['result']
+                continue
+        pending[subject] = key
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(process_subject, subject, subjects[subject]): subject for subject in pending}
+            for future in as_completed(futures):
+                subject = futures[future]
+                result = future.result()
+                results[subject] = result
+                with open(os.path.join(cache_dir, f"{subject}.json"), 'w') as f:
+                    json.dump({'key': pending[subject], 'files': subjects[subject]._asdict(), 'result': result}, f,
+                              indent=2)
+
+    rows = [results[subject] for subject in sorted(results)]
+    with open(os.path.join(out_root, study, 'subjects.csv'), 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return rows, sorted(pending)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch-process every subject of a study.")
+    parser.add_argument('studies', nargs='+', choices=sorted(STUDY_DIRS), help="Studies to process")
+    parser.add_argument('--out', default=os.path.join('data', 'analysis'), help="Output root (default: data/analysis)")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument('--force', action='store_true', help="Ignore cached results")
+    args = parser.parse_args()
+
+    for study in args.studies:
+        start = time.perf_counter()
+        rows, processed = run_study(study, args.out, args.workers, args.force)
+        print(f"{study}: {len(rows)} subjects, {len(processed)} processed, {len(rows) - len(processed)} cached "
+              f"({time.perf_counter() - start:.2f} s) -> {os.path.join(args.out, study, 'subjects.csv')}")
+
+
+if __name__ == '__main__':
+    main()
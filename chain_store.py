@@ -0,0 +1,271 @@
+import argparse
+import csv
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+# One trial of a participant's selection sequence
+SeedTrial = namedtuple('SeedTrial', ['trial_num', 'shapes', 'positions', 'timings_ms'])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS participants (
+    subject     TEXT PRIMARY KEY,
+    chain_id    TEXT NOT NULL,
+    generation  INTEGER NOT NULL,
+    parent      TEXT REFERENCES participants(subject),
+    created_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS participants_chain_generation ON participants(chain_id, generation);
+CREATE INDEX IF NOT EXISTS participants_parent ON participants(parent);
+
+CREATE TABLE IF NOT EXISTS selections (
+    subject     TEXT NOT NULL REFERENCES participants(subject),
+    trial_num   INTEGER NOT NULL,
+    step        INTEGER NOT NULL,
+    shape       TEXT NOT NULL,
+    pos_x       REAL,
+    pos_y       REAL,
+    timing_ms   INTEGER NOT NULL,
+    PRIMARY KEY (subject, trial_num, step)
+) WITHOUT ROWID;
+"""
+
+
+def parse_position(position):
+    """Parse a logged position ("(-480.0, -270.0)" or a tuple) into an (x, y) float tuple."""
+    if isinstance(position, (list, tuple)):
+        return float(position[0]), float(position[1])
+    x, y = position.strip().strip('()').split(',')
+    return float(x), float(y)
+
+
+def split_positions(position_sequence):
+    """Split a comma-joined position_sequence ("(x1, y1),(x2, y2)") into position strings."""
+    return [f"({part.strip().strip('()')})" for part in position_sequence.split('),(') if part.strip()]
+
+
+def read_sequence_csv(path):
+    """Read a sequence_<subj>.csv file (as written by DataLogger.end_trial) into a list of SeedTrial."""
+    trials = []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            shapes = row['shape_sequence'].split(',') if row['shape_sequence'] else []
+            positions = split_positions(row['position_sequence'])
+            timings = [int(t) for t in row['timing_sequence_ms'].split(',') if t]
+            trials.append(SeedTrial(int(row['trial_num']), shapes, positions, timings))
+    return trials
+
+
+class ChainStore:
+    """
+    SQLite store of iterated-learning chains.
+
+    Every participant records its parent (the infant whose sequence it was
+    seeded with), its chain and its generation, and its executed selection
+    sequences are stored one row per selection, keyed by
+    (subject, trial_num, step). Loading a parent's seed sequence is a single
+    primary-key range scan; lineage walks parent links with a recursive query
+    over the primary key, and "all sequences of generation N" uses the
+    (chain_id, generation) index, so queries stay fast as chains grow.
+
+    Parameters:
+    -----------
+    path : str
+        SQLite database file (created if needed)
+    logger : logging.Logger, optional
+        Experiment logger
+    """
+
+    def __init__(self, path, logger=None):
+        self.path = path
+        self.logger = logger
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def participant(self, subject):
+        """Return (subject, chain_id, generation, parent) or None if unknown."""
+        rows = self._query("SELECT subject, chain_id, generation, parent FROM participants WHERE subject = ?",
+                           (subject,))
+        return rows[0] if rows else None
+
+    def add_participant(self, subject, parent=None):
+        """
+        Register a participant. Without a parent the participant starts a new
+        chain (named after it) at generation 0; otherwise it joins the parent's
+        chain one generation later.
+
+        Returns:
+        --------
+        tuple
+            (subject, chain_id, generation, parent)
+
+        Raises:
+        -------
+        KeyError
+            If the parent is not in the store
+        """
+        existing = self.participant(subject)
+        if existing is not None:
+            return existing
+        if parent:
+            parent_row = self.participant(parent)
+            if parent_row is None:
+                raise KeyError(f"Parent {parent} is not in the chain store {self.path}")
+            chain_id, generation = parent_row[1], parent_row[2] + 1
+        else:
+            parent, chain_id, generation = None, subject, 0
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO participants (subject, chain_id, generation, parent, created_at) VALUES (?, ?, ?, ?, ?)",
+                (subject, chain_id, generation, parent, time.time()))
+        return subject, chain_id, generation, parent
+
+    def record_trial(self, subject, trial_num, shapes, positions, timings_ms):
+        """
+        Store (or replace) one trial of a participant's executed selection sequence.
+
+        Parameters:
+        -----------
+        subject : str
+            Participant (must have been added)
+        trial_num : int
+            Trial number
+        shapes : list of str
+            Selected box/object names in order
+        positions : list of str or tuple
+            Positions of the selections
+        timings_ms : list of int
+            Time of each selection since the previous one (the first since trial start)
+        """
+        rows = []
+        for step, (shape, position, timing) in enumerate(zip(shapes, positions, timings_ms), start=1):
+            x, y = parse_position(position)
+            rows.append((subject, trial_num, step, shape, x, y, int(timing)))
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM selections WHERE subject = ? AND trial_num = ?", (subject, trial_num))
+            self._conn.executemany(
+                "INSERT INTO selections (subject, trial_num, step, shape, pos_x, pos_y, timing_ms) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def import_sequence_csv(self, subject, path, parent=None):
+        """
+        Register a participant and import its sequence_<subj>.csv (as written by DataLogger.end_trial).
+
+        Returns:
+        --------
+        int
+            Number of trials imported
+        """
+        self.add_participant(subject, parent)
+        trials = read_sequence_csv(path)
+        for trial in trials:
+            self.record_trial(subject, trial.trial_num, trial.shapes, trial.positions, trial.timings_ms)
+        return len(trials)
+
+    def seed_sequence(self, subject):
+        """
+        Return a participant's selection sequences, the seed for its children.
+
+        Returns:
+        --------
+        list of SeedTrial
+            One entry per trial, in trial order
+        """
+        rows = self._query(
+            "SELECT trial_num, shape, pos_x, pos_y, timing_ms FROM selections WHERE subject = ? "
+            "ORDER BY trial_num, step", (subject,))
+        trials = []
+        for trial_num, shape, x, y, timing in rows:
+            if not trials or trials[-1].trial_num != trial_num:
+                trials.append(SeedTrial(trial_num, [], [], []))
+            trials[-1].shapes.append(shape)
+            trials[-1].positions.append((x, y))
+            trials[-1].timings_ms.append(timing)
+        return trials
+
+    def lineage(self, subject):
+        """Return the participants from the chain's root down to (and including) a subject."""
+        rows = self._query(
+            "WITH RECURSIVE ancestors(subject, parent, generation) AS ("
+            "  SELECT subject, parent, generation FROM participants WHERE subject = ?"
+            "  UNION ALL"
+            "  SELECT p.subject, p.parent, p.generation FROM participants p"
+            "  JOIN ancestors a ON p.subject = a.parent"
+            ") SELECT subject FROM ancestors ORDER BY generation", (subject,))
+        return [row[0] for row in rows]
+
+    def children(self, subject):
+        """Return the participants seeded by a subject."""
+        return [row[0] for row in self._query(
+            "SELECT subject FROM participants WHERE parent = ? ORDER BY created_at", (subject,))]
+
+    def generation(self, chain_id, generation):
+        """
+        Return the sequences of every participant of a chain generation.
+
+        Returns:
+        --------
+        dict
+            {subject: list of SeedTrial}
+        """
+        subjects = [row[0] for row in self._query(
+            "SELECT subject FROM participants WHERE chain_id = ? AND generation = ? ORDER BY subject",
+            (chain_id, generation))]
+        return {subject: self.seed_sequence(subject) for subject in subjects}
+
+    def chain_tip(self, chain_id):
+        """Return the most recent participant of the latest generation of a chain (or None)."""
+        rows = self._query(
+            "SELECT subject FROM participants WHERE chain_id = ? ORDER BY generation DESC, created_at DESC LIMIT 1",
+            (chain_id,))
+        return rows[0][0] if rows else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or fill the iterated-learning chain store.")
+    parser.add_argument('--db', default=os.path.join('data', 'chains.sqlite'), help="Chain store (default: data/chains.sqlite)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    add = commands.add_parser('import', help="Import a sequence_<subj>.csv file")
+    add.add_argument('sequence_csv')
+    add.add_argument('--subject', help="Subject code (default: taken from the file name)")
+    add.add_argument('--parent', help="Parent subject code (default: start a new chain)")
+    show = commands.add_parser('lineage', help="Show a subject's ancestors and seed sequence")
+    show.add_argument('subject')
+    args = parser.parse_args()
+
+    with ChainStore(args.db) as store:
+        if args.command == 'import':
+            subject = args.subject or os.path.splitext(os.path.basename(args.sequence_csv))[0][len('sequence_'):]
+            n_trials = store.import_sequence_csv(subject, args.sequence_csv, args.parent)
+            print(f"Imported {n_trials} trials for {subject}: {store.participant(subject)}")
+        elif args.command == 'lineage':
+            print(" -> ".join(store.lineage(args.subject)))
+            for trial in store.seed_sequence(args.subject):
+                print(f"  trial {trial.trial_num}: {','.join(trial.shapes)} timings={trial.timings_ms}")
+
+
+if __name__ == '__main__':
+    main()
@@ -6,5 +6,27 @@ EXPERIMENT_CONFIG = {
     'gaze_trigger_timeout': 5,       # max time to wait for a fixation before re-cueing
     'results_file': 'experiment_results.csv',
     'log_file': 'experiment_log.txt',
+    'buffered_logging': True,        # write CSV rows from a background thread instead of reopening files per row
+    'log_flush_interval': 1.0,       # max seconds buffered rows wait before being flushed (always flushed at trial end)
+    'log_flush_timeout': 5.0,        # max seconds a trial-end flush waits for the writer thread before warning
+    'frame_profiling': True,         # time every flip and write per-trial summaries to frame_timing_*.csv
+    'refresh_rate': None,            # display refresh rate in Hz (None = read from the window)
+    'max_video_decoders': 8,         # open box-video decoders kept resident before idle ones are evicted
+    'frame_cache_dir': 'stimuli/.frame_cache',  # decoded first/last box-video frames, keyed by file hash
+    'asset_manifest': 'stimuli/.asset_manifest.json',  # stimulus sizes, hashes and media properties, reused across sessions
+    'gaze_buffer_capacity': 32768,   # gaze records held per trial before the oldest are overwritten
+    'track_loss_tolerance': 0.1,     # seconds of invalid samples (blinks, dropouts) that don't reset a dwell
+    'chain_store': 'data/chains.sqlite',  # iterated-learning chains: parent links and selection sequences
+    'training_order': 'orders/trainingOrders/IterBaby_TrainingOrder{order}.csv',  # training sequence for orders other than "test"
+    'audio_lib': ['ptb', 'pyo'],     # audio backends in order of preference, started after the subject info dialog
+    'audio_scheduling': True,        # start loom/selection sounds with the next flip and log their onsets to audio_onsets_*.csv
+    'run_training': False,           # run the training phase before the gaze-triggered phase
+    'warmup': True,                  # draw stimuli, pre-roll decoders and open audio streams before the start screen
+    'warmup_preroll': 0.2,           # seconds each decoder plays offscreen and the sounds play muted during the warm-up
+    'seed_selections': None,         # parent selections replayed, at the parent's timing, in seeded trials (None = all)
+    'ag_reengage_dwell': None,       # seconds of on-screen gaze that end an attention-getter early (None = play it out)
+    'ag_min_duration': 1.0,          # seconds an attention-getter plays before re-engagement can end it
+    'ag_skip_keys': ['space'],       # keys that end an attention-getter (mouse: any click)
+    'ag_post_gap': 0.5,              # seconds of black screen after an attention-getter
     # Additional parameters (e.g., screen resolution, shape positions, etc.) can be added here.
 }
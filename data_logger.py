@@ -1,8 +1,163 @@
 import csv
 import os
+import queue
+import threading
 import time
 from psychopy import core
+
+
+class AsyncCSVWriter:
+    """
+    Background writer that keeps CSV file handles open and appends rows off the
+    render thread.
+
+    Rows are pushed onto an in-memory queue by ``write_row`` (which never touches
+    the file system). A dedicated daemon thread drains the queue in batches,
+    writes the rows through persistent ``csv.writer`` objects and flushes the
+    files whenever ``flush_interval`` seconds have passed. ``flush`` forces a
+    flush (and optionally an fsync) and blocks until the writer thread has
+    caught up, so it should be called at trial boundaries, not mid-frame.
+
+    Parameters:
+    -----------
+    logger : logging.Logger
+        Logger used to report write errors
+    flush_interval : float
+        Maximum time in seconds that written rows may sit in the OS buffer
+        before the writer thread flushes them (default: 1.0)
+    """
+
+    _FLUSH = object()
+    _CLOSE = object()
+
+    def __init__(self, logger, flush_interval=1.0):
+        self.logger = logger
+        self.flush_interval = flush_interval
+        self._queue = queue.SimpleQueue()
+        self._files = {}    # {path: (file_handle, csv_writer)}
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="AsyncCSVWriter", daemon=True)
+        self._thread.start()
+
+    def write_row(self, path, row):
+        """Queue a row to be appended to the CSV file at path."""
+        if self._closed:
+            raise RuntimeError("AsyncCSVWriter is closed")
+        self._queue.put((path, row))
+
+    def flush(self, fsync=True, timeout=None):
+        """
+        Block until every queued row has been written and flushed to disk.
+
+        Parameters:
+        -----------
+        fsync : bool
+            Also fsync the files so the rows survive a crash (default: True)
+        timeout : float, optional
+            Maximum time in seconds to wait for the writer thread
+
+        Returns:
+        --------
+        bool
+            True if the flush completed within the timeout
+        """
+        if self._closed:
+            return True
+        if not self._thread.is_alive():
+            self.logger.error("AsyncCSVWriter thread is not running; rows cannot be flushed")
+            return False
+        done = threading.Event()
+        self._queue.put((self._FLUSH, (fsync, done)))
+        return done.wait(timeout)
+
+    def close(self, timeout=None):
+        """Flush all pending rows, close the file handles and stop the thread."""
+        if self._closed:
+            return
+        self._closed = True
+        if not self._thread.is_alive():
+            self.logger.error("AsyncCSVWriter thread is not running; pending rows were not written")
+            return
+        self._queue.put((self._CLOSE, None))
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            self.logger.warning(f"AsyncCSVWriter did not finish closing within {timeout} s")
+
+    def _get_writer(self, path):
+        if path not in self._files:
+            f = open(path, 'a', newline='')
+            self._files[path] = (f, csv.writer(f))
+        return self._files[path][1]
+
+    def _flush_files(self, fsync):
+        for f, _ in self._files.values():
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+
+    def _try_flush_files(self, fsync):
+        # Runs on the writer thread, which must survive a failed flush (disk full, handle gone)
+        try:
+            self._flush_files(fsync)
+        except Exception as e:
+            self.logger.error(f"AsyncCSVWriter failed to flush: {e}")
+
+    def _run(self):
+        last_flush = time.monotonic()
+        running = True
+        while running:
+            # Wake up at least once per flush interval so buffered rows are not held indefinitely
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                batch = []
+            # Drain everything that is already waiting so rows are written in batches
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for path, payload in batch:
+                try:
+                    if path is self._FLUSH:
+                        fsync, done = payload
+                        self._flush_files(fsync)
+                        last_flush = time.monotonic()
+                        done.set()
+                    elif path is self._CLOSE:
+                        running = False
+                    else:
+                        self._get_writer(path).writerow(payload)
+                except Exception as e:
+                    self.logger.error(f"AsyncCSVWriter failed to write to {path}: {e}")
+                    if path is self._FLUSH:
+                        payload[1].set()
+
+            if self._files and time.monotonic() - last_flush >= self.flush_interval:
+                self._try_flush_files(fsync=False)
+                last_flush = time.monotonic()
+
+        self._try_flush_files(fsync=True)
+        for path, (f, _) in self._files.items():
+            try:
+                f.close()
+            except Exception as e:
+                self.logger.error(f"AsyncCSVWriter failed to close {path}: {e}")
+        self._files = {}
+
+
 class DataLogger:
+    FRAME_TIMING_COLUMNS = [
+        'trial_num', 'phase', 'n_frames', 'duration_s', 'refresh_hz',
+        'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms',
+        'missed_deadlines', 'dropped_frames',
+        'gaze_ms', 'aoi_ms', 'logging_ms', 'draw_ms', 'flip_ms'
+    ]
+    AUDIO_ONSET_COLUMNS = [
+        'trial_num', 'sound', 'label', 'flip_time', 'requested_onset', 'actual_onset', 'asynchrony_ms'
+    ]
+
     def __init__(self, experiment_controller):
         self.controller = experiment_controller
         self.logger = experiment_controller.logger
@@ -14,6 +169,13 @@ class DataLogger:
         self.trial_start_time = 0
         self.last_selection_time = 0
 
+        # Rows are handed to a background writer thread in buffered mode so the
+        # frame loop never blocks on file-system I/O
+        if self.config.get('buffered_logging', True):
+            self.writer = AsyncCSVWriter(self.logger, self.config.get('log_flush_interval', 1.0))
+        else:
+            self.writer = None
+
         # Initialize output files
         self.initialize_output_files()
 
@@ -24,6 +186,9 @@ class DataLogger:
         2. Traditional tracking data file (compatible with existing code)
         3. Gaze-triggered selection data
         4. Selection sequence data (for next child in chain)
+        5. Per-trial frame timing summaries
+        6. Per-trial binary gaze traces (written by GazeRingBuffer, see gaze_trace_path)
+        7. Flip-locked sound onsets from the AudioScheduler
 
         Creates appropriate directories if they don't exist.
         """
@@ -32,9 +197,10 @@ class DataLogger:
         training_dir = os.path.join(data_dir, "training")
         selections_dir = os.path.join(data_dir, "selections")
         sequence_dir = os.path.join(data_dir, "sequences")
+        self.gaze_dir = os.path.join(data_dir, "gaze")
 
         # Create directories if they don't exist
-        for directory in [data_dir, training_dir, selections_dir, sequence_dir]:
+        for directory in [data_dir, training_dir, selections_dir, sequence_dir, self.gaze_dir]:
             os.makedirs(directory, exist_ok=True)
 
         # 1. Initialize legacy files for backward compatibility
@@ -70,17 +236,58 @@ class DataLogger:
                 'timing_sequence_ms'
             ])
 
+        # 5. Frame timing - per-trial frame interval summaries from the FrameProfiler
+        self.frame_timing_path = os.path.join(training_dir, f"frame_timing_{self.subjVariables['subjCode']}.csv")
+        with open(self.frame_timing_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.FRAME_TIMING_COLUMNS)
+
+        # 7. Audio onsets - requested and actual start of each flip-locked sound
+        self.audio_onset_path = os.path.join(training_dir, f"audio_onsets_{self.subjVariables['subjCode']}.csv")
+        with open(self.audio_onset_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.AUDIO_ONSET_COLUMNS)
+
         self.logger.info(f"Output files initialized:")
         self.logger.info(f"  Training file: {training_filepath}")
         self.logger.info(f"  Training log: {self.training_log_path}")
         self.logger.info(f"  Selection data: {self.selection_data_path}")
         self.logger.info(f"  Sequence data: {self.sequence_data_path}")
+        self.logger.info(f"  Frame timing: {self.frame_timing_path}")
+        self.logger.info(f"  Audio onsets: {self.audio_onset_path}")
 
         # Initialize tracking variables
         self.current_trial = 0
         self.last_selection_time = 0
         self.trial_selections = []  # Will store selections for current trial
 
+    def _write_row(self, path, row):
+        """Append a row to a CSV file, via the background writer if buffered logging is enabled"""
+        if self.writer is not None:
+            self.writer.write_row(path, row)
+        else:
+            with open(path, 'a', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(row)
+
+    def flush(self):
+        """Wait for all buffered rows to reach disk. Call only between trials."""
+        if self.writer is not None:
+            timeout = self.config.get('log_flush_timeout', 5.0)
+            if not self.writer.flush(timeout=timeout):
+                self.logger.warning(f"Buffered log rows were not flushed within {timeout} s")
+
+    def close(self):
+        """Flush and close all output files at the end of the session."""
+        if self.writer is not None:
+            self.writer.close(timeout=self.config.get('log_flush_timeout', 5.0))
+        if not self.trainingOutputFile.closed:
+            self.trainingOutputFile.close()
+
+    def gaze_trace_path(self, trial_num, phase="gaze_triggered"):
+        """Return the .npy path for a trial's gaze trace"""
+        return os.path.join(self.gaze_dir, f"gaze_{self.subjVariables['subjCode']}_{phase}_trial{trial_num}.npy")
+
     def log_to_eyetracker(self, message):
         """Send a log message to the eyetracker if available"""
         if self.subjVariables.get('eyetracker') == "yes" and hasattr(self.controller, 'tracker'):
@@ -114,12 +321,10 @@ class DataLogger:
         timestamp = core.getTime()
 
         # Log to training CSV file
-        with open(self.training_log_path, 'a', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                trial_num, phase, timestamp, event_type,
-                shape, position, additional_info
-            ])
+        self._write_row(self.training_log_path, [
+            trial_num, phase, timestamp, event_type,
+            shape, position, additional_info
+        ])
 
         # Also log to eyetracker if available
         log_message = f"{phase}_trial{trial_num}_{event_type}"
@@ -188,20 +393,18 @@ class DataLogger:
             })
 
         # Log to selection data CSV
-        with open(self.selection_data_path, 'a', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                trial_num,
-                selection_num,
-                selection_time,
-                shape,
-                position_str,
-                fixation_duration * 1000,  # Convert to ms
-                rt_from_trial_start,
-                rt_from_previous,
-                queued,
-                was_executed  # This should be False for queued selections until they're shown
-            ])
+        self._write_row(self.selection_data_path, [
+            trial_num,
+            selection_num,
+            selection_time,
+            shape,
+            position_str,
+            fixation_duration * 1000,  # Convert to ms
+            rt_from_trial_start,
+            rt_from_previous,
+            queued,
+            was_executed  # This should be False for queued selections until they're shown
+        ])
 
         # Log to eyetracker
         if self.subjVariables.get('eyetracker') == "yes" and hasattr(self, 'tracker'):
@@ -233,6 +436,44 @@ class DataLogger:
             f"Selection logged: Trial {trial_num}, Selection {selection_num}, Shape {shape}, Queued={queued}")
         return selection_time  # Return time for convenience in calling functions
 
+    def log_frame_timing(self, summary):
+        """
+        Log a per-trial frame timing summary produced by FrameProfiler.end_trial.
+
+        Parameters:
+        -----------
+        summary : dict
+            Summary keyed by the names in FRAME_TIMING_COLUMNS
+        """
+        row = []
+        for column in self.FRAME_TIMING_COLUMNS:
+            value = summary.get(column, "")
+            row.append(round(value, 3) if isinstance(value, float) else value)
+        self._write_row(self.frame_timing_path, row)
+
+        self.logger.info(
+            f"Frame timing {summary.get('phase')} trial {summary.get('trial_num')}: "
+            f"p50={summary.get('p50_ms', 0):.1f}ms, p95={summary.get('p95_ms', 0):.1f}ms, "
+            f"p99={summary.get('p99_ms', 0):.1f}ms, dropped={summary.get('dropped_frames', 0)}")
+
+    def log_audio_onset(self, onset):
+        """
+        Log one flip-locked sound onset produced by the AudioScheduler.
+
+        Parameters:
+        -----------
+        onset : dict
+            Onset record keyed by the names in AUDIO_ONSET_COLUMNS; times in
+            seconds, missing values None
+        """
+        row = []
+        for column in self.AUDIO_ONSET_COLUMNS:
+            value = onset.get(column)
+            if value is None:
+                value = ""
+            row.append(round(value, 6) if isinstance(value, float) else value)
+        self._write_row(self.audio_onset_path, row)
+
     def start_trial(self, trial_num):
         """Initialize data for a new trial"""
         self.trial_selections = []
@@ -252,6 +493,8 @@ class DataLogger:
         # Only process if we have selections
         if not self.trial_selections:
             self.logger.info(f"Trial {trial_num} ended with no selections")
+            # Trial boundary: make sure everything logged during the trial is on disk
+            self.flush()
             return
 
         # Extract sequences
@@ -273,16 +516,19 @@ class DataLogger:
         position_sequence = ",".join([str(p) for p in positions])
         timing_sequence = ",".join([str(t) for t in timing_ms])
 
+        # Record the sequence in the chain store, where the next child's seed is read from
+        chain_store = getattr(self.controller, 'chain_store', None)
+        if chain_store is not None:
+            chain_store.record_trial(self.subjVariables['subjCode'], trial_num, shapes, positions, timing_ms)
+
         # Write to sequence file
-        with open(self.sequence_data_path, 'a', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                trial_num,
-                len(shapes),
-                shape_sequence,
-                position_sequence,
-                timing_sequence
-            ])
+        self._write_row(self.sequence_data_path, [
+            trial_num,
+            len(shapes),
+            shape_sequence,
+            position_sequence,
+            timing_sequence
+        ])
 
         # Log trial summary information
         summary_info = (f"shapes={shape_sequence}, positions={position_sequence}, "
@@ -299,3 +545,6 @@ class DataLogger:
 
         # Reset trial selections for next trial
         self.trial_selections = []
+
+        # Trial boundary: make sure everything logged during the trial is on disk
+        self.flush()
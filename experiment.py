@@ -1,11 +1,21 @@
 import time
 import csv
+import math
 import os
+from contextlib import contextmanager
 import pygaze
 from pygaze import settings, libscreen, eyetracker
 from utils import *
 from data_logger import *
-import tobii_research as tr
+from frame_profiler import FrameProfiler
+from video_pool import VideoPool
+from frame_cache import VideoFrameCache
+from gaze import GazeRingBuffer, GazeStream, AOIIndex
+from trial_engine import AttentionGetterEngine, GazeTriggeredTrialEngine, TrialSchedule, plan_seeded_trial
+from chain_store import ChainStore
+from order_compiler import AssetInventory, OrderError, compile_order, resolve_order
+from asset_manifest import AssetManifest
+from audio_scheduler import AudioScheduler
 from psychopy.hardware import keyboard
 from psychopy import core, visual, event
 
@@ -35,6 +45,7 @@ class InfantEyetrackingExperiment:
                     }
         self.init_size = 300
         self.init_opacity = .3
+        self._fallback_ag = None  # [circle, colors, color index] of the fallback attention-getter
         self.current_trial = 0
         self.last_selection_time = 0
         # Setup subject info
@@ -86,7 +97,12 @@ class InfantEyetrackingExperiment:
             '10': {'name': 'responseDevice',
                    'prompt': 'keyboard / mouse',
                    'options': ("keyboard", "mouse"),
-                   'default': 'keyboard'}
+                   'default': 'keyboard'},
+            '11': {'name': 'parentCode',
+                   'prompt': 'Parent subject code (blank = start a new chain)',
+                   'options': 'any',
+                   'default': '',
+                   'type': str}
         }
 
         self.ag_video_list = ['balloons_5', 'bouncyballs_5', 'galaxies_5', 'kangaroo_5']
@@ -98,19 +114,42 @@ class InfantEyetrackingExperiment:
         # Note: "cookies" (plural) matches the actual file name stripes_cookies.mp4
 
         # Pre-experiment setup: subject info entry and data file initialization.
-        self.initialize_subj_info()
-
-        self.data_logger = DataLogger(self)
-
-        self.setup_display()
-        self.setup_exp_paths()
-        self.setup_input_devices()
-        self.load_stimuli()
-        self.setup_stimuli_assignment()
+        # Each subsystem is timed; the tracker SDK and audio backend are only
+        # loaded here, when the session needs them.
+        self.startup_times = {}  # {subsystem: seconds}
+        with self.startup_step("subject info"):
+            self.initialize_subj_info()
+
+        with self.startup_step("data files"):
+            self.data_logger = DataLogger(self)
+            self.setup_chain()
+
+        with self.startup_step("display"):
+            self.setup_display()
+            self.setup_exp_paths()
+        with self.startup_step("input devices"):
+            self.setup_input_devices()
+        with self.startup_step("audio backend"):
+            init_audio(self.config.get('audio_lib'))
+        with self.startup_step("stimuli"):
+            self.load_stimuli()
+            self.setup_stimuli_assignment()
+            self.load_training_order()
+        if self.config.get('warmup', True):
+            self.warm_up()
+        self.logger.info("Startup: " + ", ".join(f"{name} {seconds:.2f} s" for name, seconds in self.startup_times.items()))
         self.display_start_screen()
 
         self.logger.info("Experiment initialized with configuration.")
 
+    @contextmanager
+    def startup_step(self, name):
+        """Time one startup step and record it in startup_times under name."""
+        start = time.perf_counter()
+        yield
+        self.startup_times[name] = time.perf_counter() - start
+        self.logger.info(f"Startup: {name} took {self.startup_times[name]:.2f} s")
+
     def get_experiment_data(self, key, default=None):
         """Access method for the data logger to get experiment variables"""
         if key == 'subjVariables':
@@ -166,6 +205,26 @@ class InfantEyetrackingExperiment:
                 popupError('That subject code already exists!')
                 self.logger.error("Duplicate subject code detected; prompting for new input.")
 
+    def setup_chain(self):
+        """
+        Registers the subject in the iterated-learning chain store under its
+        parent (or as the root of a new chain) and loads the parent's
+        selection sequences as the seed for this session.
+        """
+        self.chain_store = ChainStore(self.config.get('chain_store', os.path.join('data', 'chains.sqlite')), self.logger)
+        parent = self.subjVariables.get('parentCode', '').strip() or None
+        try:
+            subject, chain_id, generation, parent = self.chain_store.add_participant(
+                self.subjVariables['subjCode'], parent)
+        except KeyError as e:
+            popupError(str(e))
+            self.logger.error(f"Unknown parent subject: {e}")
+            exit(1)
+
+        self.seed_sequence = self.chain_store.seed_sequence(parent) if parent else []
+        self.logger.info(f"Chain {chain_id}, generation {generation}, parent {parent}: "
+                         f"{len(self.seed_sequence)} seed trials loaded")
+
     def setup_exp_paths(self):
         """
         loads stimulis directories
@@ -184,11 +243,7 @@ class InfantEyetrackingExperiment:
         Sets up the display using PsychoPy (via libscreen and pygaze),
         """
         from pygaze.libscreen import Display, Screen
-        import pygaze
-        import tobii_research as tr
-        from pygaze import eyetracker, libinput
-        from psychopy.hardware import keyboard  # Assuming a keyboard module is available
-        
+
         # Configure pygaze settings from constants (important for dummy mode)
         # Pygaze should read constants automatically, but we'll ensure settings are set
         settings.DUMMYMODE = constants.DUMMYMODE
@@ -204,6 +259,15 @@ class InfantEyetrackingExperiment:
         # Typically, pygaze.expdisplay sets up the experimental window.
         self.win = pygaze.expdisplay  
         self.logger.info(f"Winsize: {self.win.size}, win units: {self.win.units}")
+
+        # All trial-loop flips go through the frame profiler so every frame is timed
+        self.frame_profiler = FrameProfiler(
+            self.win,
+            data_logger=self.data_logger,
+            refresh_rate=self.config.get('refresh_rate'),
+            enabled=self.config.get('frame_profiling', True)
+        )
+        self.logger.info(f"Frame profiler refresh rate: {self.frame_profiler.refresh_rate:.2f} Hz")
         self.logger.info("Display and screens initialized.")
 
     def setup_input_devices(self):
@@ -219,6 +283,7 @@ class InfantEyetrackingExperiment:
                 self.logger.info(f"Eyetracker connected? {self.tracker.connected()}")
             else:
                 # Real eyetracker mode - try to find Tobii device
+                import tobii_research as tr
                 attempts = 0
                 max_attempts = 20
                 self.eyetrackers = tr.find_all_eyetrackers()
@@ -235,7 +300,15 @@ class InfantEyetrackingExperiment:
                 self.tracker = pygaze.eyetracker.EyeTracker(self.disp)
                 self.logger.info(self.tracker)
                 self.logger.info(f"Eyetracker connected? {self.tracker.connected()}")
+
+            # Full-rate gaze samples (Tobii stream), polled per frame for trackers without one
+            self.gaze_stream = GazeStream(self.tracker, constants.DISPSIZE, clock=core.getTime, logger=self.logger)
         
+        # Per-trial gaze trace, dumped to a binary file at the end of each trial
+        self.gaze_buffer = GazeRingBuffer(
+            capacity=self.config.get('gaze_buffer_capacity', 32768), logger=self.logger
+        )
+
         # Input device setup based on subject selection.
         if self.subjVariables.get('responseDevice', 'keyboard') == 'keyboard':
             self.inputDevice = "keyboard"
@@ -277,13 +350,25 @@ class InfantEyetrackingExperiment:
         loadScreen.draw_text(text = "Loading Files...", color = "white", fontsize = 48)
         self.disp.fill(loadScreen)
         self.disp.show()
-        
-        self.movieMatrix = loadFilesMovie(self.moviePath, ['mp4', 'mov'], 'movie', self.win)
-        self.AGmovieMatrix = loadFilesMovie(self.AGPath, ['mp4'], 'movie', self.win)
-        selectionSoundMatrix = loadFiles(os.path.join(self.soundPath, 'selection'), ['.mp3', '.wav'], 'sound')
-        loomSoundMatrix = loadFiles(os.path.join(self.soundPath, 'loom'), ['.mp3', '.wav'], 'sound')
-        self.AGsoundMatrix = loadFiles(self.AGPath, ['.mp3', '.wav'], 'sound')
-        self.stars = loadFiles(self.AGPath, ['.jpg'], 'image', self.win)
+
+        # One walk of the stimuli tree; only new or changed files are hashed and probed
+        manifest_start = core.getTime()
+        self.asset_manifest = AssetManifest(
+            os.path.join(self.path, 'stimuli'),
+            self.config.get('asset_manifest', os.path.join('stimuli', '.asset_manifest.json')), self.logger
+        )
+        self.asset_manifest.refresh()
+        self.asset_manifest.save()
+        self.logger.info(f"Asset manifest: {len(self.asset_manifest.entries)} files, "
+                         f"{self.asset_manifest.n_probed} probed in {core.getTime() - manifest_start:.2f} s")
+
+        self.AGmovieMatrix = loadFiles(self.AGPath, ['mp4'], 'movie', self.win, manifest=self.asset_manifest)
+        selectionSoundMatrix = loadFiles(os.path.join(self.soundPath, 'selection'), ['.mp3', '.wav'], 'sound',
+                                         manifest=self.asset_manifest)
+        loomSoundMatrix = loadFiles(os.path.join(self.soundPath, 'loom'), ['.mp3', '.wav'], 'sound',
+                                    manifest=self.asset_manifest)
+        self.AGsoundMatrix = loadFiles(self.AGPath, ['.mp3', '.wav'], 'sound', manifest=self.asset_manifest)
+        self.stars = loadFiles(self.AGPath, ['.jpg'], 'image', self.win, manifest=self.asset_manifest)
 
         self.image_files = {
             "fixator": os.path.join(self.imagePath, "spinning-wheel.png")
@@ -298,33 +383,26 @@ class InfantEyetrackingExperiment:
                 ori=0
             )
         
-        # Load box videos - format: [boxstyle]_[object].mp4
-        # We'll create video stimuli for each box-object combination
-        self.box_videos = {}  # Will store {box_name: {object_name: video_stim}}
-        loaded_count = 0
-        missing_count = 0
-        
-        for box in self.box_types:
-            self.box_videos[box] = {}
-            for obj in self.objects:
-                video_filename = f"{box}_{obj}.mp4"
-                video_path = os.path.join(self.moviePath, video_filename)
-                if os.path.exists(video_path):
-                    try:
-                        video = visual.MovieStim(self.win, video_path, noAudio=True, loop=False)
-                        self.box_videos[box][obj] = video
-                        loaded_count += 1
-                    except Exception as e:
-                        self.logger.error(f"Failed to load video {video_path}: {e}")
-                        missing_count += 1
-                else:
-                    self.logger.warning(f"Video file not found: {video_path}")
-                    missing_count += 1
-        
-        self.logger.info(f"Loaded {loaded_count} videos, {missing_count} missing")
+        # Box videos - format: [boxstyle]_[object].mp4
+        # Decoders are opened on demand by the pool (only the 4 a trial needs)
+        self.video_pool = VideoPool(
+            self.win, self.moviePath, self.box_types, self.objects, self.logger,
+            max_decoders=self.config.get('max_video_decoders', 8)
+        )
+        # First/last frames of the box videos are drawn as stills while paused
+        self.frame_cache = VideoFrameCache(
+            self.win, self.config.get('frame_cache_dir', os.path.join('stimuli', '.frame_cache')), self.logger,
+            hash_lookup=self.asset_manifest.sha1
+        )
+        self.still_frames = {}  # {box: ImageStim} still currently shown for each paused box
+        # Staged setup of an upcoming trial (see begin_trial_preparation)
+        self._trial_preparation = None
+        self._preparing_objects = None
+        self._prepared_trial = None
+
         # Log which box-object combinations are available
         for box in self.box_types:
-            available_objects = list(self.box_videos[box].keys())
+            available_objects = self.video_pool.available_objects(box)
             self.logger.info(f"Box '{box}' has {len(available_objects)} objects: {available_objects}")
 
         # Preloaded video stimuli will be set up in setup_stimuli_assignment
@@ -349,6 +427,15 @@ class InfantEyetrackingExperiment:
             self.loom_sounds[box] = loomSoundMatrix[key]
             self.logger.info(f"Assigned loom sound '{key}' to box '{box}'")
 
+        # Loom and selection sounds start with the flip that shows their animation
+        self.audio_scheduler = None
+        if self.config.get('audio_scheduling', True):
+            self.audio_scheduler = AudioScheduler(self.win, self.logger, self.data_logger)
+            self.audio_scheduler.preload(
+                {**{f"selection/{name}": snd for name, snd in selectionSoundMatrix.items()},
+                 **{f"loom/{name}": snd for name, snd in loomSoundMatrix.items()}}
+            )
+
         self.logger.info("Loaded Files")
 
     def get_next_ag_video(self):
@@ -384,44 +471,301 @@ class InfantEyetrackingExperiment:
         # Box order for training phase playback
         self.box_order = ["cross", "stripes", "dot", "grid"]  # TopLeft, BottomLeft, TopRight, BottomRight
 
-        # Randomly sample 4 objects from 6 without replacement
-        import random
-        selected_objects = random.sample(self.objects, 4)
-        
-        # Assign objects to boxes
+        # Randomly sample 4 objects from 6 without replacement and open their videos
         self.box_object_assignment = {}
-        for i, box in enumerate(self.box_order):
-            self.box_object_assignment[box] = selected_objects[i]
+        self._next_selected_objects = None
+        self.gt_trial_plans = []
+        self.prepare_trial_videos(self.sample_trial_objects())
 
         self.logger.info(f"Box positions assigned: {self.box_positions}")
         self.logger.info(f"Object assignments: {self.box_object_assignment}")
 
-        # Create preloaded video stimuli for this trial
-        self.preloaded_video_stimuli = {}
-        for box, obj in self.box_object_assignment.items():
-            if box in self.box_videos and obj in self.box_videos[box]:
-                video = self.box_videos[box][obj]
-                video.pos = self.box_positions[box]
-                video.size = (500, 500)  # Set appropriate size
-                # Stop and pause video (will show first frame when paused)
-                video.stop()
-                video.pause()
-                self.preloaded_video_stimuli[box] = video
-            else:
-                self.logger.error(f"Video not found for {box}_{obj}")
-
-        # Setup AOIs for gaze detection
-        self.boxAOIs = {}
+        # Setup AOIs for gaze detection: one index answers "which box?" in a single call.
+        # Hit indices follow box_order.
         aoi_width = 500
         aoi_height = 500
 
-        for box, pos in self.box_positions.items():
-            pygaze_pos = psychopy_to_pygaze(pos, x_offset = aoi_width/2, y_offset = aoi_height/2)
-            print(pygaze_pos)
-            self.boxAOIs[box] = aoi.AOI('rectangle', pos=pygaze_pos, size=(aoi_width, aoi_height))
+        aoi_positions = [
+            psychopy_to_pygaze(self.box_positions[box], x_offset=aoi_width/2, y_offset=aoi_height/2)
+            for box in self.box_order
+        ]
+        self.aoi_index = AOIIndex.from_rects(
+            self.box_order, aoi_positions, [(aoi_width, aoi_height)] * len(self.box_order)
+        )
+
+        self.logger.info(f"Box AOIs created for {len(self.aoi_index.names)} boxes: {aoi_positions}")
 
-        self.logger.info(f"Box AOIs created for {len(self.boxAOIs)} boxes")
 
+    def load_training_order(self):
+        """
+        Compiles the session's training order file into self.training_plan.
+        The order "test", or an order without a file, runs the built-in
+        training sequence (self.training_plan stays None).
+        Every attention-getter and box video it names is checked against the
+        stimuli and bound to its loaded stimulus now, so a broken order stops
+        the session before it starts, and boxes without objects in the order
+        get their random objects here.
+        """
+        import random
+        self.training_plan = None
+        order = self.subjVariables.get('order', 'test')
+        if order == 'test':
+            return
+
+        order_path = self.config.get(
+            'training_order', os.path.join('orders', 'trainingOrders', 'IterBaby_TrainingOrder{order}.csv')
+        ).format(order=order)
+        if not os.path.exists(order_path):
+            self.logger.warning(f"No training order file {order_path} for order {order}; "
+                                f"running the built-in training sequence")
+            return
+        try:
+            plan = compile_order(order_path, AssetInventory.from_manifest(self.asset_manifest),
+                                 self.box_order, self.objects, supported_types=('AG', 'boxTraining'))
+            images = {name: stim[0] for name, stim in self.stars.items()}
+            plan = resolve_order(plan, {'movie': self.AGmovieMatrix, 'sound': self.AGsoundMatrix, 'image': images})
+            image_ags = [step.trial_id for step in plan if step.trial_type == 'AG' and 'AGVideo' not in step.assets]
+            if image_ags:
+                raise OrderError(order_path, [f"trial {trial_id}: only movie attention-getters are supported"
+                                              for trial_id in image_ags])
+        except OrderError as e:
+            popupError(str(e))
+            self.logger.error(f"Invalid training order: {e}")
+            exit(1)
+
+        self.training_plan = [
+            step._replace(fields=dict(step.fields, objects=step.fields['objects'] or random.sample(self.objects, 4)))
+            if step.trial_type == 'boxTraining' else step
+            for step in plan
+        ]
+        self.logger.info(f"Training order {order_path}: {len(self.training_plan)} steps")
+
+    def sample_trial_objects(self):
+        """
+        Return the objects for the upcoming trial (4 of 6, without replacement)
+        and draw the following trial's objects so their videos can be prefetched
+        while this trial, or the attention-getter before it, is running.
+        """
+        import random
+        if self._next_selected_objects is None:
+            self._next_selected_objects = random.sample(self.objects, 4)
+        selected_objects = self._next_selected_objects
+
+        self._next_selected_objects = random.sample(self.objects, 4)
+        self.prefetch_trial_videos(self._next_selected_objects)
+        return selected_objects
+
+    def prefetch_trial_videos(self, selected_objects):
+        """Start opening a later trial's videos and still frames in the background."""
+        keys = list(zip(self.box_order, selected_objects))
+        self.video_pool.prefetch(keys)
+        self.frame_cache.prefetch([self.video_pool.paths[key] for key in keys if key in self.video_pool.paths])
+
+    def plan_gt_trial(self, attempt):
+        """
+        Decide a gaze-triggered trial's objects and seed selections ahead of time.
+
+        With a parent, attempt n replays the parent's n-th trial (cycling if the
+        parent has fewer): its selections (all of them, or the first
+        'seed_selections') at the parent's timing, with the parent's objects in
+        the boxes it saw. Without one, the
+        objects are random and the first box is the seed at trial start.
+
+        Parameters:
+        -----------
+        attempt : int
+            Zero-based attempt number in the gaze-triggered phase
+
+        Returns:
+        --------
+        TrialSchedule
+        """
+        import random
+        if self.seed_sequence:
+            seed_trial = self.seed_sequence[attempt % len(self.seed_sequence)]
+            return plan_seeded_trial(seed_trial, self.box_order, self.objects,
+                                     self.config.get('seed_selections'))
+        return TrialSchedule(random.sample(self.objects, 4), [(0.0, self.box_order[0])], None)
+
+    def plan_gt_trials(self, n_attempts):
+        """Return the plans (plan_gt_trial) of the first n_attempts gaze-triggered attempts, planning each once."""
+        while len(self.gt_trial_plans) < n_attempts:
+            self.gt_trial_plans.append(self.plan_gt_trial(len(self.gt_trial_plans)))
+        return self.gt_trial_plans[:n_attempts]
+
+    def first_trial_objects(self):
+        """
+        Return the objects of the first box trial the session will run: the
+        first training trial's if the training phase runs ('run_training'),
+        else the first gaze-triggered attempt's. None if there is no box trial.
+        """
+        if not self.config.get('run_training', False):
+            return self.plan_gt_trials(1)[0].objects
+        if self.training_plan is None:
+            return self._next_selected_objects
+        box_trials = [step for step in self.training_plan if step.trial_type == 'boxTraining']
+        return box_trials[0].fields['objects'] if box_trials else None
+
+    def set_still_frame(self, box, which):
+        """
+        Show the cached first or last frame for a box while its video is paused.
+        Falls back to drawing the paused decoder if no still is available.
+        """
+        obj = self.box_object_assignment[box]
+        self.still_frames[box] = self.frame_cache.get_stim(
+            self.video_pool.paths[(box, obj)], which, self.box_positions[box]
+        )
+
+    def begin_trial_preparation(self, selected_objects):
+        """
+        Start preparing an upcoming trial's videos (replacing any unfinished
+        preparation). The work is split into one step per box - fetching the
+        decoder, its first-frame still and its animation - which
+        service_trial_preparation runs while nothing of the current trial is
+        on screen, so the trial itself starts without decoder work.
+        """
+        self._preparing_objects = list(selected_objects)
+        self._prepared_trial = None
+        self._trial_preparation = self._trial_preparation_steps(self._preparing_objects)
+
+    def service_trial_preparation(self):
+        """
+        Run one step of the pending trial preparation. Call from the main
+        thread only between trials (inter-trial interval, attention-getter):
+        the next trial may reuse the current trial's decoders.
+
+        Returns:
+        --------
+        bool
+            True if there are still steps to run
+        """
+        if self._trial_preparation is None:
+            return False
+        if next(self._trial_preparation, None) is None:
+            self._trial_preparation = None
+            return False
+        return True
+
+    def _trial_preparation_steps(self, selected_objects):
+        videos, stills, animations = {}, {}, {}
+        for box, obj in zip(self.box_order, selected_objects):
+            if not self.video_pool.available(box, obj):
+                # Log error if video is missing
+                self.logger.error(f"Video not found for {box}_{obj} - cannot proceed with trial")
+                raise FileNotFoundError(f"Required video file not found: {box}_{obj}.mp4")
+            video = self.video_pool.get(box, obj)
+            video.size = (500, 500)
+            videos[box] = video
+            stills[box] = self.frame_cache.get_stim(
+                self.video_pool.paths[(box, obj)], VideoFrameCache.FIRST, self.box_positions[box]
+            )
+            # The animation positions the video, stops it and pauses it on its first frame
+            animations[box] = self.make_box_animation(box, obj, videos, stills)
+            yield box
+        self._prepared_trial = (selected_objects, videos, stills, animations)
+
+    def wait_and_prepare(self, duration):
+        """
+        Wait for a number of seconds without flipping, using the time to open
+        prefetched decoders and prepare the next trial.
+        """
+        deadline = core.getTime() + duration
+        while core.getTime() < deadline:
+            busy = self.video_pool.service()
+            busy = self.service_trial_preparation() or busy
+            if not busy:
+                core.wait(min(0.002, max(0.0, deadline - core.getTime())))
+
+    def prepare_trial_videos(self, selected_objects):
+        """
+        Assign the selected objects to boxes and install the trial's videos
+        (paused on their first frame), stills and animations. Whatever
+        preparation has not already run between trials is finished here.
+
+        Parameters:
+        -----------
+        selected_objects : list of str
+            One object per box, in box_order
+        """
+        selected_objects = list(selected_objects)
+        if self._prepared_trial is None or self._prepared_trial[0] != selected_objects:
+            if self._preparing_objects != selected_objects or self._trial_preparation is None:
+                self.begin_trial_preparation(selected_objects)
+            steps = 0
+            while self.service_trial_preparation():
+                steps += 1
+            if steps:
+                self.logger.info(f"Trial preparation finished synchronously ({steps} of {len(self.box_order)} steps)")
+
+        _, videos, stills, animations = self._prepared_trial
+        self._prepared_trial = None
+        self._preparing_objects = None
+        self.box_object_assignment.update(zip(self.box_order, selected_objects))
+        self.preloaded_video_stimuli = videos
+        self.still_frames = stills
+        # One reusable animation per box, so selections allocate nothing in the frame loop
+        self.box_animations = animations
+
+        # Keep this trial's decoders resident while other ones are evicted
+        self.video_pool.pin(list(zip(self.box_order, selected_objects)))
+
+        # Validate that all boxes have videos loaded
+        if len(self.preloaded_video_stimuli) != len(self.box_order):
+            missing_boxes = set(self.box_order) - set(self.preloaded_video_stimuli.keys())
+            self.logger.error(f"Missing videos for boxes: {missing_boxes}")
+            raise ValueError(f"Cannot proceed: missing videos for {missing_boxes}")
+
+    def warm_up(self):
+        """
+        Prime the session so the first trial runs at the same timing as later
+        ones: the first trial's videos are installed (first_trial_objects),
+        every stimulus is drawn once to the back buffer (uploading its
+        texture), the attention-getter and first-trial decoders are played
+        offscreen for a moment, and every sound is played at zero volume to
+        open its audio stream. Nothing is flipped; each step is timed in
+        startup_times.
+        """
+        preroll = self.config.get('warmup_preroll', 0.2)
+
+        with self.startup_step("warm-up first trial"):
+            first_objects = self.first_trial_objects()
+            if first_objects:
+                self.prepare_trial_videos(first_objects)
+
+        with self.startup_step("warm-up textures"):
+            stims = [self.fixator_stim] + [stim[0] for stim in self.stars.values()] + list(self.still_frames.values())
+            for stim in stims:
+                stim.draw()
+            self.win.clearBuffer()
+
+        with self.startup_step("warm-up decoders"):
+            for video in list(self.AGmovieMatrix.values()) + list(self.preloaded_video_stimuli.values()):
+                video.play()
+                preroll_end = core.getTime() + preroll
+                while core.getTime() < preroll_end:
+                    video.draw()
+                    core.wait(0.005)
+                video.stop()
+            self.win.clearBuffer()
+            # Box videos go back to being paused on their first frame
+            for animation in self.box_animations.values():
+                animation.seek_to_first_frame()
+
+        with self.startup_step("warm-up audio"):
+            sounds = list(self.selection_sounds.values()) + list(self.loom_sounds.values()) + list(self.AGsoundMatrix.values())
+            sounds = list({id(snd): snd for snd in sounds}.values())  # boxes can share a sound
+            volumes = [snd.volume for snd in sounds]
+            for snd in sounds:
+                snd.volume = 0
+                snd.play()
+            core.wait(preroll)
+            for snd, volume in zip(sounds, volumes):
+                snd.stop()
+                snd.volume = volume
+
+        self.logger.info(f"Warm-up: {len(stims)} stimuli drawn, "
+                         f"{len(self.AGmovieMatrix) + len(self.preloaded_video_stimuli)} decoders and "
+                         f"{len(sounds)} sounds primed")
 
     def display_start_screen(self):
         self.initialScreen = libscreen.Screen()
@@ -436,42 +780,20 @@ class InfantEyetrackingExperiment:
         print(f"Key pressed: {key}")
         self.disp.show()
 
-    def run_training_trial(self):
+    def run_training_trial(self, selected_objects=None):
         # --- Phase 0: Setup eyetracking and reassign objects ---
         # Increment trial counter
         self.current_trial += 1
+        self.frame_profiler.start_trial(self.current_trial, "training")
         self.trial_start_time = core.getTime()
         # Record trial start time
         self.data_logger.trial_start_time = self.trial_start_time
         self.data_logger.current_trial = self.current_trial
 
-        # Reassign objects to boxes for this trial (random sampling without replacement)
-        import random
-        selected_objects = random.sample(self.objects, 4)
-        
-        # Initialize preloaded_video_stimuli dictionary for this trial
-        self.preloaded_video_stimuli = {}
-        
-        for i, box in enumerate(self.box_order):
-            self.box_object_assignment[box] = selected_objects[i]
-            # Update preloaded video stimuli
-            if box in self.box_videos and selected_objects[i] in self.box_videos[box]:
-                video = self.box_videos[box][selected_objects[i]]
-                video.pos = self.box_positions[box]
-                video.size = (500, 500)
-                video.stop()
-                video.pause()
-                self.preloaded_video_stimuli[box] = video
-            else:
-                # Log error if video is missing
-                self.logger.error(f"Video not found for {box}_{selected_objects[i]} - cannot proceed with trial")
-                raise FileNotFoundError(f"Required video file not found: {box}_{selected_objects[i]}.mp4")
-        
-        # Validate that all boxes have videos loaded
-        if len(self.preloaded_video_stimuli) != len(self.box_order):
-            missing_boxes = set(self.box_order) - set(self.preloaded_video_stimuli.keys())
-            self.logger.error(f"Missing videos for boxes: {missing_boxes}")
-            raise ValueError(f"Cannot proceed: missing videos for {missing_boxes}")
+        # Reassign objects to boxes for this trial (from the order, else random sampling without replacement)
+        if selected_objects is None:
+            selected_objects = self.sample_trial_objects()
+        self.prepare_trial_videos(selected_objects)
 
         # Start eyetracking recording for this trial
         if self.subjVariables.get('eyetracker') == "yes":
@@ -493,11 +815,13 @@ class InfantEyetrackingExperiment:
         spin_start = core.getTime()
 
         while core.getTime() - spin_start < spin_duration:
-            draw_static_videos(self.preloaded_video_stimuli)
+            draw_static_videos(self.preloaded_video_stimuli, self.still_frames)
             elapsed = core.getTime() - spin_start
             self.fixator_stim.ori = (elapsed * 360) % 360
             self.fixator_stim.draw()
-            self.win.flip()
+            self.frame_profiler.flip()
+            # Open the next trial's prefetched decoders while nothing is playing
+            self.video_pool.service()
 
         self.data_logger.log_trial_event(
             trial_num=self.current_trial,
@@ -507,8 +831,8 @@ class InfantEyetrackingExperiment:
             position=""
         )
 
-        draw_static_videos(self.preloaded_video_stimuli)
-        self.win.flip()
+        draw_static_videos(self.preloaded_video_stimuli, self.still_frames)
+        self.frame_profiler.flip()
 
         # --- Phase 2: Play each video in order (TopLeft, BottomLeft, TopRight, BottomRight) ---
         # Each video plays to completion, then pauses on the last frame
@@ -530,23 +854,27 @@ class InfantEyetrackingExperiment:
             video.stop()
             video.play()
             
-            # Play loom sound when video starts
+            # Play loom sound with the video's first frame
             if box in self.loom_sounds:
-                self.loom_sounds[box].play()
+                play_sound(self.loom_sounds[box], self.audio_scheduler, f"loom {box}")
             
             # Play video until it finishes completely
             while not video.isFinished:
-                # Draw all videos (background ones paused, this one playing)
+                # Draw all videos (background ones as stills, this one playing)
                 for bg_box, bg_video in self.preloaded_video_stimuli.items():
                     if bg_box != box:
-                        bg_video.draw()
+                        if self.still_frames.get(bg_box) is not None:
+                            self.still_frames[bg_box].draw()
+                        else:
+                            bg_video.draw()
                 video.draw()
-                self.win.flip()
+                self.frame_profiler.flip()
             
             # Video has finished - pause on the last frame
             # Note: When isFinished is True, the video is already on the last frame
-            # We pause it to keep it displayed
+            # We pause it to keep it displayed, and show the cached last frame from now on
             video.pause()
+            self.set_still_frame(box, VideoFrameCache.LAST)
             
             current_time = core.getTime()
 
@@ -560,14 +888,15 @@ class InfantEyetrackingExperiment:
             )
 
             # Show all videos paused (others on first frame, this one on last frame)
-            draw_static_videos(self.preloaded_video_stimuli)
-            self.win.flip()
+            draw_static_videos(self.preloaded_video_stimuli, self.still_frames)
+            self.frame_profiler.flip()
 
         # Reset all videos to first frame at end of trial
         for box in self.box_order:
             video = self.preloaded_video_stimuli[box]
             video.stop()
             video.pause()
+            self.set_still_frame(box, VideoFrameCache.FIRST)
 
         self.data_logger.log_trial_event(
             trial_num=self.current_trial,
@@ -581,321 +910,170 @@ class InfantEyetrackingExperiment:
         if self.subjVariables.get('eyetracker') == "yes":
             self.tracker.stop_recording()
 
-    def run_gt_trial(self):
-        # Reassign objects to boxes for this trial (random sampling without replacement)
-        import random
-        selected_objects = random.sample(self.objects, 4)
-        
-        # Initialize preloaded_video_stimuli dictionary for this trial
-        self.preloaded_video_stimuli = {}
-        
-        for i, box in enumerate(self.box_order):
-            self.box_object_assignment[box] = selected_objects[i]
-            # Update preloaded video stimuli
-            if box in self.box_videos and selected_objects[i] in self.box_videos[box]:
-                video = self.box_videos[box][selected_objects[i]]
-                video.pos = self.box_positions[box]
-                video.size = (500, 500)
-                video.stop()
-                video.pause()
-                self.preloaded_video_stimuli[box] = video
-            else:
-                # Log error if video is missing
-                self.logger.error(f"Video not found for {box}_{selected_objects[i]} - cannot proceed with trial")
-                raise FileNotFoundError(f"Required video file not found: {box}_{selected_objects[i]}.mp4")
-        
-        # Validate that all boxes have videos loaded
-        if len(self.preloaded_video_stimuli) != len(self.box_order):
-            missing_boxes = set(self.box_order) - set(self.preloaded_video_stimuli.keys())
-            self.logger.error(f"Missing videos for boxes: {missing_boxes}")
-            raise ValueError(f"Cannot proceed: missing videos for {missing_boxes}")
-
-        # Increment trial counter
-        self.current_trial += 1
-        self.data_logger.current_trial = self.current_trial
-        # initialize trial in data_logger
-        self.data_logger.start_trial(self.current_trial)
-
-        # Reset last selection time for new trial
-        self.last_selection_time = 0
-
-        self.logger.info(f"Starting gaze-triggered trial {self.current_trial}")
+        self.frame_profiler.end_trial()
+        if self.audio_scheduler is not None:
+            self.audio_scheduler.flush()
 
-        # --- Phase 1: Show static videos (paused on first frame) with a spinning fixator ---
-        spin_duration = 1  # second
-        spin_start = core.getTime()
-        while core.getTime() - spin_start < spin_duration:
-            draw_static_videos(self.preloaded_video_stimuli)
-            elapsed = core.getTime() - spin_start
-            self.fixator_stim.ori = (elapsed * 360) % 360
-            self.fixator_stim.draw()
-            self.win.flip()
-
-        draw_static_videos(self.preloaded_video_stimuli)
-        self.win.flip()
-
-        if self.subjVariables.get('eyetracker') == "yes":
-            self.tracker.start_recording()
+        # Trial boundary: write out everything buffered during the trial
+        self.data_logger.flush()
 
-        box_obj_info = '-'.join([f"{box}_{self.box_object_assignment[box]}" for box in self.box_order])
-        self.data_logger.log_trial_event(
-            trial_num=self.current_trial,
-            phase="gaze_triggered",
-            event_type="trial_start",
-            shape="all",
-            position="",
-            additional_info=f"box_order={'-'.join(self.box_order)}, assignments={box_obj_info}"
+    def make_trial_engine(self):
+        """
+        Create the state machine that runs a gaze-triggered trial's selections,
+        queueing, cooldowns and timeouts (see trial_engine.py).
+        """
+        return GazeTriggeredTrialEngine(
+            self.box_order,
+            required_fixation=0.25,  # seconds
+            max_trial_time=20,  # seconds
+            selection_timeout=7,  # seconds - max time between selections
+            initial_selection_timeout=5,  # seconds - max time to wait for first infant selection
+            cooldown=5.0,  # seconds cooldown
+            max_selections=4,
+            dropout_tolerance=self.config.get('track_loss_tolerance', 0.1),
+            frame_tolerance=self.frame_profiler.frame_period / 2  # seeds start on the flip nearest their onset
         )
 
-        self.trial_start_time = core.getTime()
-        # Record trial start time
-        self.data_logger.trial_start_time = self.trial_start_time
-
-        last_selection_time = self.trial_start_time
-
-        max_trial_time = 20  # seconds
-        required_fixation = 0.25  # seconds
-        selection_count = 0
-        selection_timeout = 7 # seconds - max time between selections
-        initial_selection_timeout = 5 #seconds - max time to wait for first selection
-
-        # Setup dictionaries.
-        gaze_histories = {box: [] for box in self.box_order}
-        triggered_flags = {box: False for box in self.box_order}
-        last_triggered = {box: 0 for box in self.box_order}
-        cooldown = 5.0  # seconds cooldown
-
-        active_animation = None    # Currently running animation.
-        queued_animation = None    # Candidate for the next animation.
-
-        # Main loop: run until max_trial_time OR we've reached 4 selections and no animation is active.
-        while (core.getTime() - self.trial_start_time) < max_trial_time:
-
-            # If we've already reached 4 selections and no animation is playing, end the trial.
-            if selection_count >= 4 and active_animation is None:
-                break
-
-            current_time = core.getTime()
+    def make_box_animation(self, box, obj, videos, stills):
+        """Create the selection animation for a box showing an object, over a trial's videos and stills."""
+        return VideoAnimation(
+            video=videos[box],
+            win=self.win,
+            pos=self.box_positions[box],
+            current_box=box,
+            current_object=obj,
+            background_videos=videos,
+            background_stills=stills,
+            video_duration=self.asset_manifest.duration(self.video_pool.paths[(box, obj)], 1.5),
+            selection_sound=self.selection_sounds[box],
+            loom_sound=self.loom_sounds[box],
+            audio_scheduler=self.audio_scheduler
+        )
 
-            if selection_count == 0 and (current_time - self.trial_start_time) > initial_selection_timeout:
-                self.logger.info(
-                    f"No initial selection made within {initial_selection_timeout} seconds; terminating trial early.")
-                break
+    def apply_trial_event(self, trial_event, engine, active_animation, queued_animation):
+        """
+        Carry out the side effects (logging, starting videos) of one trial engine event.
 
-            if selection_count > 0 and selection_count < 4 and active_animation is None and (
-                    current_time - last_selection_time) > selection_timeout:
-                self.logger.info(
-                    f"No selection for {selection_timeout} seconds after previous selection; terminating trial early.")
-                break
+        Returns:
+        --------
+        tuple
+            The updated (active_animation, queued_animation)
+        """
+        box = trial_event.box
+        current_time = trial_event.time
 
-            if self.subjVariables.get('eyetracker') == "yes":
-                gaze_sample = self.tracker.sample()
+        if trial_event.kind == engine.SELECT:
+            obj = self.box_object_assignment[box]
+            if trial_event.fixation_duration > 0:
+                self.logger.info(f"Box {box} ({obj}) triggered via fixation (immediate).")
             else:
-                gaze_sample = None
-
-            # Update active animation.
-            if active_animation is not None:
-                if active_animation.update(current_time):
-                    # Video playback complete, reset to first frame
-                    self.logger.info(f"Active animation {active_animation.current_box} completed, setting to None")
-                    active_animation.reset_to_first_frame()
-                    last_triggered[active_animation.current_box] = current_time
-                    active_animation = None
-                    # NOTE: Don't clear queued_animation here - it should be promoted next!
-
-            # Promote queued animation if no animation is active:
-            if active_animation is None and queued_animation is not None:
-                self.logger.info(f"Promoting queued animation {queued_animation.current_box} to active")
-                # Only promote if we haven't reached 4 selections
-                if selection_count < 4:
-                    # At this point, the queued animation is being activated,
-                    # so we need to log it as an executed (non-queued) selection
-                    selection_count += 1
-                    last_selection_time = current_time
-                    for other_box in self.box_order:
-                        if other_box != queued_animation.current_box:
-                            last_triggered[other_box] = 0
-
-                    # Log that the queued selection is now being executed
-                    box_obj_name = f"{queued_animation.current_box}_{queued_animation.current_object}"
-                    self.data_logger.log_selection(
-                        trial_num=self.current_trial,
-                        selection_num=selection_count,  # This is the current selection number
-                        shape=box_obj_name,
-                        position=self.box_positions[queued_animation.current_box],
-                        fixation_duration=0,  # We don't know the original fixation duration here
-                        queued=False,  # It's no longer queued
-                        was_executed=True,  # It's being executed now
-                        selection_time=current_time
-                    )
-
-                    # Promote queued animation to active and start playing it
-                    active_animation = queued_animation
-                    active_animation.play(current_time)  # Actually start the video!
-                    queued_animation = None
-
-            self.logger.info(gaze_sample)
-            # Process gaze sample for each box (only if we have a valid gaze sample)
-            if gaze_sample is not None:
-                for box in self.box_order:
-                    if self.boxAOIs[box].contains(gaze_sample):
-                        # Gaze is on this box - add to history and check fixation
-                        gaze_histories[box].append((gaze_sample, current_time))
-                        fixation_duration = self._fixation_duration(gaze_histories[box])
-
-                        if fixation_duration >= required_fixation:
-
-                            # Immediate trigger only if no animation is active and we haven't reached 4.
-                            if active_animation is None and selection_count < 4:
-                                # Enforce cooldown.
-                                if current_time - last_triggered[box] < cooldown:
-                                    continue
-
-                                selection_count += 1
-                                last_selection_time = current_time
-                                obj = self.box_object_assignment[box]
-                                self.logger.info(f"Box {box} ({obj}) triggered via fixation (immediate).")
-
-                                # Log the selection event
-                                box_obj_name = f"{box}_{obj}"
-                                self.data_logger.log_selection(
-                                    trial_num=self.current_trial,
-                                    selection_num=selection_count,
-                                    shape=box_obj_name,
-                                    position=self.box_positions[box],
-                                    fixation_duration=fixation_duration,
-                                    queued=False,
-                                    was_executed=True,
-                                    selection_time=current_time
-                                )
-
-                                video = self.preloaded_video_stimuli[box]
-                                active_animation = VideoAnimation(
-                                    video=video,
-                                    win=self.win,
-                                    pos=self.box_positions[box],
-                                    current_box=box,
-                                    current_object=obj,
-                                    background_videos=self.preloaded_video_stimuli,
-                                    video_duration=1.5,
-                                    selection_sound=self.selection_sounds[box],
-                                    loom_sound=self.loom_sounds[box]
-                                )
-                                active_animation.play(current_time)
-
-                                triggered_flags[box] = True
-                                gaze_histories[box] = []
-                                last_triggered[box] = current_time
-                                for other_box in self.box_order:
-                                    if other_box != box:
-                                        last_triggered[other_box] = 0  # Reset cooldown for others
-
-                            # If an animation is active, allow queuing only if selection_count is less than 3.
-                            elif active_animation is not None and selection_count < 3:
-                                if queued_animation is None or queued_animation.current_box != box:
-                                    obj = self.box_object_assignment[box]
-                                    self.logger.info(f"Box {box} ({obj}) queued as next candidate (N+1)")
-
-                                    # Log the queued selection - note was_executed=False because it's not shown yet
-                                    box_obj_name = f"{box}_{obj}"
-                                    self.data_logger.log_selection(
-                                        trial_num=self.current_trial,
-                                        selection_num=selection_count + 1,  # This will be the next selection number
-                                        shape=box_obj_name,
-                                        position=self.box_positions[box],
-                                        fixation_duration=fixation_duration,
-                                        queued=True,
-                                        was_executed=False,  # Not executed yet, just queued
-                                        selection_time=current_time
-                                    )
-
-                                    video = self.preloaded_video_stimuli[box]
-                                    queued_animation = VideoAnimation(
-                                        video=video,
-                                        win=self.win,
-                                        pos=self.box_positions[box],
-                                        current_box=box,
-                                        current_object=obj,
-                                        background_videos=self.preloaded_video_stimuli,
-                                        video_duration=1.5,
-                                        selection_sound=self.selection_sounds[box],
-                                        loom_sound=self.loom_sounds[box]
-                                    )
-                                    triggered_flags[box] = True
-                                    gaze_histories[box] = []
-                    else:
-                        # Gaze is NOT on this box - clear its history
-                        gaze_histories[box] = []
+                self.logger.info(f"Box {box} ({obj}) played automatically (seed).")
+            self.data_logger.log_selection(
+                trial_num=self.current_trial,
+                selection_num=trial_event.selection_num,
+                shape=f"{box}_{obj}",
+                position=self.box_positions[box],
+                fixation_duration=trial_event.fixation_duration,
+                queued=False,
+                was_executed=True,
+                selection_time=current_time
+            )
+            active_animation = self.box_animations[box]
+            active_animation.play(current_time)
 
-            # Always ensure something is drawn every frame
-            if active_animation is not None:
-                # Animation is active - update it again to ensure continuous drawing
-                # This is critical: videos must be drawn every frame to play properly
-                active_animation.update(current_time)
-            else:
-                # No animation active - draw static display
-                draw_static_videos(self.preloaded_video_stimuli)
-                self.win.flip()
+        elif trial_event.kind == engine.QUEUE:
+            obj = self.box_object_assignment[box]
+            self.logger.info(f"Box {box} ({obj}) queued as next candidate (N+1)")
+            # Log the queued selection - note was_executed=False because it's not shown yet
+            self.data_logger.log_selection(
+                trial_num=self.current_trial,
+                selection_num=trial_event.selection_num,  # This will be the next selection number
+                shape=f"{box}_{obj}",
+                position=self.box_positions[box],
+                fixation_duration=trial_event.fixation_duration,
+                queued=True,
+                was_executed=False,  # Not executed yet, just queued
+                selection_time=current_time
+            )
+            queued_animation = self.box_animations[box]
 
-        # END OF WHILE LOOP - Trial has ended
-        
-        # End of trial processes
-        # 1. Mark any queued selection that wasn't executed
-        if queued_animation is not None:
+        elif trial_event.kind == engine.PROMOTE:
+            self.logger.info(f"Promoting queued animation {box} to active")
+            # The queued selection is now being executed
+            box_obj_name = f"{queued_animation.current_box}_{queued_animation.current_object}"
+            self.data_logger.log_selection(
+                trial_num=self.current_trial,
+                selection_num=trial_event.selection_num,
+                shape=box_obj_name,
+                position=self.box_positions[box],
+                fixation_duration=0,  # We don't know the original fixation duration here
+                queued=False,  # It's no longer queued
+                was_executed=True,  # It's being executed now
+                selection_time=current_time
+            )
+            active_animation = queued_animation
+            active_animation.play(current_time)  # Actually start the video!
+            queued_animation = None
+
+        elif trial_event.kind == engine.COMPLETE:
+            # Video playback complete, reset to first frame
+            self.logger.info(f"Active animation {box} completed, setting to None")
+            active_animation.reset_to_first_frame()
+            active_animation = None
+
+        elif trial_event.kind == engine.DISCARD:
+            # Mark a queued selection that was never shown
             box_obj_name = f"{queued_animation.current_box}_{queued_animation.current_object}"
             self.data_logger.log_selection(
                 trial_num=self.current_trial,
-                selection_num=selection_count + 1,
+                selection_num=trial_event.selection_num,
                 shape=box_obj_name,
-                position=self.box_positions[queued_animation.current_box],
+                position=self.box_positions[box],
                 fixation_duration=0,  # Unknown at this point
                 queued=True,
                 was_executed=False
             )
+            queued_animation = None
 
-        # 2. Record trial summary
-        self.data_logger.end_trial(self.current_trial)
+        elif trial_event.kind == engine.END:
+            if trial_event.reason == "initial_selection_timeout":
+                self.logger.info(
+                    f"No initial selection made within {engine.initial_selection_timeout} seconds; terminating trial early.")
+            elif trial_event.reason == "selection_timeout":
+                self.logger.info(
+                    f"No selection for {engine.selection_timeout} seconds after previous selection; terminating trial early.")
+            else:
+                self.logger.info(f"Trial {self.current_trial} ended ({trial_event.reason})")
 
-        # 3. Stop eyetracker recording
-        if self.subjVariables.get('eyetracker') == "yes":
-            self.tracker.stop_recording()
+        return active_animation, queued_animation
 
-        return selection_count
+    def run_gt_trial(self, plan=None):
+        """
+        Run one gaze-triggered trial.
 
-    def run_seeded_gt_trial(self):
-        # Reassign objects to boxes for this trial (random sampling without replacement)
-        import random
-        selected_objects = random.sample(self.objects, 4)
-        
-        # Initialize preloaded_video_stimuli dictionary for this trial
-        self.preloaded_video_stimuli = {}
-        
-        for i, box in enumerate(self.box_order):
-            self.box_object_assignment[box] = selected_objects[i]
-            # Update preloaded video stimuli
-            if box in self.box_videos and selected_objects[i] in self.box_videos[box]:
-                video = self.box_videos[box][selected_objects[i]]
-                video.pos = self.box_positions[box]
-                video.size = (500, 500)
-                video.stop()
-                video.pause()
-                self.preloaded_video_stimuli[box] = video
-            else:
-                # Log error if video is missing
-                self.logger.error(f"Video not found for {box}_{selected_objects[i]} - cannot proceed with trial")
-                raise FileNotFoundError(f"Required video file not found: {box}_{selected_objects[i]}.mp4")
-        
-        # Validate that all boxes have videos loaded
-        if len(self.preloaded_video_stimuli) != len(self.box_order):
-            missing_boxes = set(self.box_order) - set(self.preloaded_video_stimuli.keys())
-            self.logger.error(f"Missing videos for boxes: {missing_boxes}")
-            raise ValueError(f"Cannot proceed: missing videos for {missing_boxes}")
+        Parameters:
+        -----------
+        plan : TrialSchedule, optional
+            The trial's objects and seed selections (see plan_gt_trial); by
+            default the objects are random and nothing is seeded
+
+        Returns:
+        --------
+        int
+            Number of selections made in the trial (including seeds)
+        """
+        if plan is None:
+            plan = TrialSchedule(self.sample_trial_objects(), [], None)
+        # Assign this trial's objects to boxes and set up their videos and animations
+        self.prepare_trial_videos(plan.objects)
 
         # Increment trial counter
         self.current_trial += 1
         self.data_logger.current_trial = self.current_trial
         # initialize trial in data_logger
         self.data_logger.start_trial(self.current_trial)
+        self.frame_profiler.start_trial(self.current_trial, "gaze_triggered")
+        self.gaze_buffer.clear()
 
         # Reset last selection time for new trial
         self.last_selection_time = 0
@@ -906,17 +1084,20 @@ class InfantEyetrackingExperiment:
         spin_duration = 1  # second
         spin_start = core.getTime()
         while core.getTime() - spin_start < spin_duration:
-            draw_static_videos(self.preloaded_video_stimuli)
+            draw_static_videos(self.preloaded_video_stimuli, self.still_frames)
             elapsed = core.getTime() - spin_start
             self.fixator_stim.ori = (elapsed * 360) % 360
             self.fixator_stim.draw()
-            self.win.flip()
+            self.frame_profiler.flip()
+            # Open the next trial's prefetched decoders while nothing is playing
+            self.video_pool.service()
 
-        draw_static_videos(self.preloaded_video_stimuli)
-        self.win.flip()
+        draw_static_videos(self.preloaded_video_stimuli, self.still_frames)
+        self.frame_profiler.flip()
 
         if self.subjVariables.get('eyetracker') == "yes":
             self.tracker.start_recording()
+            self.gaze_stream.start()
 
         box_obj_info = '-'.join([f"{box}_{self.box_object_assignment[box]}" for box in self.box_order])
         self.data_logger.log_trial_event(
@@ -925,274 +1106,138 @@ class InfantEyetrackingExperiment:
             event_type="trial_start",
             shape="all",
             position="",
-            additional_info=f"box_order={'-'.join(self.box_order)}, assignments={box_obj_info}"
+            additional_info=f"box_order={'-'.join(self.box_order)}, assignments={box_obj_info}, "
+                            f"seeds={'-'.join(f'{box}@{onset:.3f}' for onset, box in plan.seeds)}, "
+                            f"seed_trial={plan.source_trial}"
         )
 
         self.trial_start_time = core.getTime()
         # Record trial start time
         self.data_logger.trial_start_time = self.trial_start_time
 
-        # Play the first box automatically (seed box)
-        first_box = self.box_order[0]
-        first_obj = self.box_object_assignment[first_box]
-        selection_count = 1  # Start with 1 since we're playing the first box automatically
-        current_time = core.getTime()
-        last_selection_time = current_time
-        
-        # Log the automatic first selection
-        box_obj_name = f"{first_box}_{first_obj}"
-        self.data_logger.log_selection(
-            trial_num=self.current_trial,
-            selection_num=selection_count,
-            shape=box_obj_name,
-            position=self.box_positions[first_box],
-            fixation_duration=0,  # No fixation required for automatic animation
-            queued=False,
-            was_executed=True,
-            selection_time=current_time
-        )
-        
-        # Create and activate the first animation
-        video = self.preloaded_video_stimuli[first_box]
-        active_animation = VideoAnimation(
-            video=video,
-            win=self.win,
-            pos=self.box_positions[first_box],
-            current_box=first_box,
-            current_object=first_obj,
-            background_videos=self.preloaded_video_stimuli,
-            video_duration=1.5,
-            selection_sound=self.selection_sounds[first_box],
-            loom_sound=self.loom_sounds[first_box]
-        )
-        active_animation.play(current_time)
-        
-        # Set up for the rest of the trial
-        queued_animation = None    # Candidate for the next animation
-        max_trial_time = 20  # seconds
-        required_fixation = 0.25  # seconds
-        selection_timeout = 7  # seconds - max time between selections
-        initial_selection_timeout = 5  # seconds - max time to wait for first infant selection
-
-        # Setup dictionaries
-        gaze_histories = {box: [] for box in self.box_order}
-        triggered_flags = {box: False for box in self.box_order}
-        last_triggered = {box: 0 for box in self.box_order}
-        last_triggered[first_box] = current_time  # Set the first box as already triggered
-        cooldown = 5.0  # seconds cooldown
-
-        # Main loop: run until max_trial_time OR we've reached 4 selections and no animation is active
-        while (core.getTime() - self.trial_start_time) < max_trial_time:
-
-            # If we've already reached 4 selections and no animation is playing, end the trial
-            if selection_count >= 4 and active_animation is None:
-                break
+        # Selection, queueing, cooldown and timeout logic lives in the engine;
+        # this loop only feeds it gaze and carries out its events
+        engine = self.make_trial_engine()
+        active_animation = None    # Currently running animation.
+        queued_animation = None    # Candidate for the next animation.
+        for trial_event in engine.start(self.trial_start_time, schedule=plan.seeds):
+            active_animation, queued_animation = self.apply_trial_event(
+                trial_event, engine, active_animation, queued_animation)
 
+        # Main loop: run until the engine ends the trial (time limit, 4 selections or a timeout)
+        while not engine.ended:
             current_time = core.getTime()
 
-            # Modified condition to account for automatic first selection
-            if selection_count == 1 and active_animation is None and (current_time - self.trial_start_time) > initial_selection_timeout:
-                self.logger.info(
-                    f"No infant selection made within {initial_selection_timeout} seconds after automatic first selection; terminating trial early.")
-                break
-
-            if selection_count > 1 and selection_count < 4 and active_animation is None and (
-                    current_time - last_selection_time) > selection_timeout:
-                self.logger.info(
-                    f"No selection for {selection_timeout} seconds after previous selection; terminating trial early.")
-                break
-
             if self.subjVariables.get('eyetracker') == "yes":
-                gaze_sample = self.tracker.sample()
+                gaze_samples = self.gaze_stream.drain()
             else:
-                gaze_sample = None
-
-            # Update active animation
-            if active_animation is not None:
-                if active_animation.update(current_time):
-                    # Video playback complete, reset to first frame
-                    self.logger.info(f"Active animation {active_animation.current_box} completed, setting to None")
-                    active_animation.reset_to_first_frame()
-                    last_triggered[active_animation.current_box] = current_time
-                    active_animation = None
-                    # NOTE: Don't clear queued_animation here - it should be promoted next!
-
-            # Promote queued animation if there's no active animation
-            if active_animation is None and queued_animation is not None:
-                self.logger.info(f"Promoting queued animation {queued_animation.current_box} to active")
-                # Only promote if we haven't reached 4 selections
-                if selection_count < 4:
-                    # At this point, the queued animation is being activated,
-                    # so we need to log it as an executed (non-queued) selection
-                    selection_count += 1
-                    last_selection_time = current_time
-                    for other_box in self.box_order:
-                        if other_box != queued_animation.current_box:
-                            last_triggered[other_box] = 0
-
-                    # Log that the queued selection is now being executed
-                    box_obj_name = f"{queued_animation.current_box}_{queued_animation.current_object}"
-                    self.data_logger.log_selection(
-                        trial_num=self.current_trial,
-                        selection_num=selection_count,  # This is the current selection number
-                        shape=box_obj_name,
-                        position=self.box_positions[queued_animation.current_box],
-                        fixation_duration=0,  # We don't know the original fixation duration here
-                        queued=False,  # It's no longer queued
-                        was_executed=True,  # It's being executed now
-                        selection_time=current_time
-                    )
-                    self.logger.info(f"Queued animation promoted: {box_obj_name}, selection_count now {selection_count}")
-
-                    # Promote queued animation to active and start playing it
-                    active_animation = queued_animation
-                    active_animation.play(current_time)  # Actually start the video!
-                    queued_animation = None
-
-            self.logger.info(gaze_sample)
-            # Process gaze sample for each box (only if we have a valid gaze sample)
-            if gaze_sample is not None:
-                for box in self.box_order:
-                    if self.boxAOIs[box].contains(gaze_sample):
-                        gaze_histories[box].append((gaze_sample, current_time))
-                        fixation_duration = self._fixation_duration(gaze_histories[box])
-
-                        if fixation_duration >= required_fixation:
-
-                            # Immediate trigger only if no animation is active and we haven't reached 4
-                            if active_animation is None and selection_count < 4:
-                                # Enforce cooldown
-                                if current_time - last_triggered[box] < cooldown:
-                                    continue
-
-                                selection_count += 1
-                                last_selection_time = current_time
-                                obj = self.box_object_assignment[box]
-                                self.logger.info(f"Box {box} ({obj}) triggered via fixation (immediate).")
-
-                                # Log the selection event
-                                box_obj_name = f"{box}_{obj}"
-                                self.data_logger.log_selection(
-                                    trial_num=self.current_trial,
-                                    selection_num=selection_count,
-                                    shape=box_obj_name,
-                                    position=self.box_positions[box],
-                                    fixation_duration=fixation_duration,
-                                    queued=False,
-                                    was_executed=True,
-                                    selection_time=current_time
-                                )
-
-                                video = self.preloaded_video_stimuli[box]
-                                active_animation = VideoAnimation(
-                                    video=video,
-                                    win=self.win,
-                                    pos=self.box_positions[box],
-                                    current_box=box,
-                                    current_object=obj,
-                                    background_videos=self.preloaded_video_stimuli,
-                                    video_duration=1.5,
-                                    selection_sound=self.selection_sounds[box],
-                                    loom_sound=self.loom_sounds[box]
-                                )
-                                active_animation.play(current_time)
-
-                                triggered_flags[box] = True
-                                gaze_histories[box] = []
-                                last_triggered[box] = current_time
-                                for other_box in self.box_order:
-                                    if other_box != box:
-                                        last_triggered[other_box] = 0  # Reset cooldown for others
-
-                            # If an animation is active, allow queuing only if selection_count is less than 3
-                            elif active_animation is not None and selection_count < 3:
-                                if queued_animation is None or queued_animation.current_box != box:
-                                    obj = self.box_object_assignment[box]
-                                    self.logger.info(f"Box {box} ({obj}) queued as next candidate (N+1)")
-
-                                    # Log the queued selection - note was_executed=False because it's not shown yet
-                                    box_obj_name = f"{box}_{obj}"
-                                    self.data_logger.log_selection(
-                                        trial_num=self.current_trial,
-                                        selection_num=selection_count + 1,  # This will be the next selection number
-                                        shape=box_obj_name,
-                                        position=self.box_positions[box],
-                                        fixation_duration=fixation_duration,
-                                        queued=True,
-                                        was_executed=False,  # Not executed yet, just queued
-                                        selection_time=current_time
-                                    )
-
-                                    video = self.preloaded_video_stimuli[box]
-                                    queued_animation = VideoAnimation(
-                                        video=video,
-                                        win=self.win,
-                                        pos=self.box_positions[box],
-                                        current_box=box,
-                                        current_object=obj,
-                                        background_videos=self.preloaded_video_stimuli,
-                                        video_duration=1.5,
-                                        selection_sound=self.selection_sounds[box],
-                                        loom_sound=self.loom_sounds[box]
-                                    )
-                                    triggered_flags[box] = True
-                                    gaze_histories[box] = []
-                    else:
-                        # Clear history if gaze is not on the AOI
-                        gaze_histories[box] = []
+                gaze_samples = []
+            self.frame_profiler.lap("gaze")
+
+            # Feed every gaze sample received since the last frame to the engine
+            # and the gaze trace, so dwell onsets have sample-rate rather than frame-rate precision
+            for sample_time, gaze_x, gaze_y, sample_valid in gaze_samples:
+                # Single vectorized containment test across all boxes
+                hit_box = self.aoi_index.hit(gaze_x, gaze_y) if sample_valid else -1
+                # A valid sample elsewhere ends a dwell, brief track loss does not
+                engine.add_sample(sample_time, self.aoi_index.name(hit_box), valid=sample_valid)
+                self.gaze_buffer.append(sample_time, gaze_x, gaze_y, hit_box)
+            self.frame_profiler.lap("aoi")
+
+            # Update: advance the active animation's playback state (no drawing here)
+            active_complete = active_animation is not None and active_animation.update(current_time)
+
+            for trial_event in engine.step(current_time, active_complete):
+                active_animation, queued_animation = self.apply_trial_event(
+                    trial_event, engine, active_animation, queued_animation)
+            self.frame_profiler.lap("logging")
+
+            if engine.ended:
+                break
 
-            # Always ensure something is drawn every frame
+            # Draw: something must be drawn every frame - videos only advance while drawn
             if active_animation is not None:
-                # Animation is active - update it again to ensure continuous drawing
-                # This is critical: videos must be drawn every frame to play properly
-                active_animation.update(current_time)
+                active_animation.draw()
             else:
                 # No animation active - draw static display
-                draw_static_videos(self.preloaded_video_stimuli)
-                self.win.flip()
+                draw_static_videos(self.preloaded_video_stimuli, self.still_frames)
+
+            # Flip: exactly once per loop iteration
+            self.frame_profiler.flip()
 
         # END OF WHILE LOOP - Trial has ended
-        
+
         # End of trial processes
         # 1. Mark any queued selection that wasn't executed
-        if queued_animation is not None:
-            box_obj_name = f"{queued_animation.current_box}_{queued_animation.current_object}"
-            self.data_logger.log_selection(
-                trial_num=self.current_trial,
-                selection_num=selection_count + 1,
-                shape=box_obj_name,
-                position=self.box_positions[queued_animation.current_box],
-                fixation_duration=0,  # Unknown at this point
-                queued=True,
-                was_executed=False
-            )
+        for trial_event in engine.finish(core.getTime()):
+            active_animation, queued_animation = self.apply_trial_event(
+                trial_event, engine, active_animation, queued_animation)
 
         # 2. Record trial summary
+        self.frame_profiler.end_trial()
+        if self.audio_scheduler is not None:
+            self.audio_scheduler.flush()
+        self.gaze_buffer.dump(self.data_logger.gaze_trace_path(self.current_trial))
         self.data_logger.end_trial(self.current_trial)
 
         # 3. Stop eyetracker recording
         if self.subjVariables.get('eyetracker') == "yes":
+            self.gaze_stream.stop()
             self.tracker.stop_recording()
 
-        return selection_count
+        return engine.selection_count
+
+    def run_seeded_gt_trial(self, plan=None):
+        """
+        Run a gaze-triggered trial that starts with seed selections: the
+        parent's, replayed at the parent's timing, when the plan comes from
+        plan_gt_trial, otherwise the first box at trial start.
+        """
+        if plan is None:
+            plan = TrialSchedule(self.sample_trial_objects(), [(0.0, self.box_order[0])], None)
+        return self.run_gt_trial(plan)
 
-    def run_ag_trial(self, video_name):
+    def run_ag_trial(self, video_name, duration=5.0, audio_name=None):
         """
         Play an attention-getting video.
 
+        The attention-getter runs as a frame loop against a deadline instead
+        of blocking waits: every frame it feeds the gaze samples received
+        since the last frame to an AttentionGetterEngine, which measures how
+        long the infant looked at the screen and decides when the
+        attention-getter is over, checks the response device for a skip
+        press (ag_skip_keys, or a mouse click), and opens prefetched decoders
+        and prepares the next trial. The video plays once, then a black
+        screen holds until the deadline. With ag_reengage_dwell set, the
+        attention-getter ends as soon as the infant has looked at the screen
+        that long. A black post-AG gap (ag_post_gap) follows.
+
         Parameters:
         -----------
         video_name : str
             Name of the video to play (without extension)
+        duration : float
+            Time in seconds the attention-getter lasts at most (default: 5.0)
+        audio_name : str, optional
+            Name of the sound played with it (default: video_name)
+
+        Returns:
+        --------
+        str
+            Why the attention-getter ended (see AttentionGetterEngine)
         """
         self.logger.info(f"Playing attention-getter video: {video_name}")
+        self.frame_profiler.start_trial(self.current_trial, "AG")
+        use_eyetracker = self.subjVariables.get('eyetracker') == "yes"
 
         # Start eyetracking recording if enabled
-        if self.subjVariables.get('eyetracker') == "yes":
+        if use_eyetracker:
             self.tracker.start_recording()
+            self.gaze_stream.start()
+        self.clear_skip_input()
 
         # Log trial start
-        current_time = self.data_logger.log_trial_event(
+        self.data_logger.log_trial_event(
             trial_num=self.current_trial,
             phase="AG",
             event_type="videoStart",
@@ -1200,107 +1245,125 @@ class InfantEyetrackingExperiment:
             position="center",
             additional_info=f"video={video_name}"
         )
-        audio_played = False
-        if video_name in self.AGsoundMatrix:
-            audio = self.AGsoundMatrix[video_name]
+        audio = None
+        audio_name = audio_name or video_name
+        if audio_name in self.AGsoundMatrix:
+            audio = self.AGsoundMatrix[audio_name]
             audio.play()
-            audio_played = True
-            self.logger.info(f"Playing audio: {video_name}")
+            self.logger.info(f"Playing audio: {audio_name}")
         else:
-            self.logger.warning(f"No matching audio found for {video_name}")
+            self.logger.warning(f"No matching audio found for {audio_name}")
 
         # Find the video in our loaded movies
-        if video_name in self.AGmovieMatrix:
-            video = self.AGmovieMatrix[video_name]
+        video = self.AGmovieMatrix.get(video_name)
+        if video is not None:
             video.size = (self.x_length, self.y_length)
-            video.pos = (0,0)
-            # Set the video to loop if it's too short
+            video.pos = (0, 0)
             video.loop = False  # Only play once
             video.play()
+        else:
+            self.logger.error(f"Attention-getter video {video_name} not found in loaded videos")
+            self.logger.info("Displaying fallback attention-getter animation")
 
-            # Keep track of starting time
-            start_time = core.getTime()
-            total_ag_duration = 5.0
-            # Continue displaying until the movie is finished
-            while not video.isFinished and (core.getTime() - start_time) < total_ag_duration:
-                video.draw()
-                self.win.flip()
+        engine = AttentionGetterEngine(
+            duration,
+            reengage_dwell=self.config.get('ag_reengage_dwell'),
+            min_duration=self.config.get('ag_min_duration', 1.0),
+            dropout_tolerance=self.config.get('track_loss_tolerance', 0.1)
+        )
+        start_time = core.getTime()
+        engine.start(start_time)
+        gap_end = None
+        while True:
+            current_time = core.getTime()
+            gaze_samples = self.gaze_stream.drain() if use_eyetracker else []
+            for sample_time, gaze_x, gaze_y, sample_valid in gaze_samples:
+                on_screen = 0 <= gaze_x < self.x_length and 0 <= gaze_y < self.y_length
+                engine.add_sample(sample_time, on_screen, valid=sample_valid)
+            self.frame_profiler.lap("gaze")
+
+            if gap_end is None:
+                if self.poll_skip_input():
+                    engine.stop(current_time)
+                if engine.step(current_time) is not None:
+                    # The attention-getter is over: stop it and hold the post-AG gap
+                    if video is not None:
+                        video.stop()
+                    if audio is not None:
+                        audio.stop()
+                    self.data_logger.log_trial_event(
+                        trial_num=self.current_trial,
+                        phase="AG",
+                        event_type="videoEnd",
+                        shape="all",
+                        position="center",
+                        additional_info=f"video={video_name}, duration={current_time - start_time:.2f}s, "
+                                        f"end={engine.end_reason}, looking_time={engine.looking_time:.2f}s, "
+                                        f"gaze_samples={engine.n_samples}"
+                    )
+                    self.logger.info(f"Attention-getter ended ({engine.end_reason}) after "
+                                     f"{current_time - start_time:.2f} s, looking time {engine.looking_time:.2f} s")
+                    gap_end = current_time + self.config.get('ag_post_gap', 0.5)
+            elif current_time >= gap_end:
+                break
+            self.frame_profiler.lap("logging")
 
-            remaining_time = total_ag_duration - (core.getTime() - start_time)
-            if remaining_time > 0:
-                # Show black screen but continue playing audio
-                self.disp.fill(self.blackScreen)
-                self.disp.show()
-                core.wait(remaining_time)
+            # Draw: the video until it finishes, then a black screen
+            if gap_end is None:
+                if video is None:
+                    self.draw_fallback_ag(current_time - start_time)
+                elif not video.isFinished:
+                    video.draw()
+            self.frame_profiler.flip()
 
-            # Stop the video
-            video.stop()
+            # Nothing timing-critical is playing: open decoders and prepare the next trial
+            self.video_pool.service()
+            self.service_trial_preparation()
 
-            if audio_played:
-                audio.stop()
-            # Log duration
-            elapsed = core.getTime() - start_time
-            self.data_logger.log_trial_event(
-                trial_num=self.current_trial,
-                phase="AG",
-                event_type="videoEnd",
-                shape="all",
-                position="center",
-                additional_info=f"video={video_name}, duration={elapsed:.2f}s"
-            )
-        else:
-            self.logger.error(f"Attention-getter video {video_name} not found in loaded videos")
-            # Display a fallback animation if video is not available
-            self.display_fallback_ag()
-            if audio_played:
-                audio.stop()
+        self.frame_profiler.end_trial()
 
         # Stop eyetracking recording
-        if self.subjVariables.get('eyetracker') == "yes":
+        if use_eyetracker:
+            self.gaze_stream.stop()
             self.tracker.stop_recording()
+        return engine.end_reason
 
-        # Short pause after the video
-        self.win.flip()
-        core.wait(.5)
+    def clear_skip_input(self):
+        """Discard key presses made before an attention-getter started."""
+        if self.inputDevice == "keyboard":
+            self.input.clearEvents()
 
-    def display_fallback_ag(self):
+    def poll_skip_input(self):
+        """Return True if the experimenter asked to end the attention-getter (without waiting)."""
+        if self.inputDevice == "keyboard":
+            return bool(self.input.getKeys(keyList=self.config.get('ag_skip_keys', ['space']), waitRelease=False))
+        return any(self.input.get_pressed())
+
+    def draw_fallback_ag(self, elapsed):
         """
-        Display a fallback attention-getter animation if the video is not available.
-        This uses a pulsing colorful circle as a simple alternative.
+        Draw one frame of the fallback attention-getter, a pulsing circle
+        cycling through the hues, used when the video is not available. The
+        circle and its colors are made once; the color changes only when the
+        hue moves to the next step.
         """
-        self.logger.info("Displaying fallback attention-getter animation")
-
-        # Create a simple colorful circle
-        circle = visual.Circle(
-            self.win, radius=300, fillColor="red", lineColor=None, pos=(0, 0)
-        )
-
-        # Animation duration
-        duration = 5.0  # seconds
-        start_time = core.getTime()
-
-        # Loop until duration is reached
-        while core.getTime() - start_time < duration:
-            elapsed = core.getTime() - start_time
-
-            # Pulsing animation
-            size_factor = 0.5 + 0.5 * abs(math.sin(elapsed * 3))
-            circle.radius = 200 * size_factor
-
-            # Change color
-            hue = (elapsed * 30) % 360
-            circle.fillColor = [hue, 1, 1]  # HSV color
-
-            # Draw and flip
-            circle.draw()
-            self.win.flip()
-
-    def _fixation_duration(self, gaze_history):
-        if not gaze_history:
-            return 0
-        start_time = gaze_history[0][1]
-        end_time = gaze_history[-1][1]
-        return end_time - start_time
+        if self._fallback_ag is None:
+            import colorsys
+            circle = visual.Circle(self.win, radius=300, fillColor="red", lineColor=None, pos=(0, 0))
+            # 10-degree hue steps as psychopy rgb (-1..1)
+            colors = [[2 * c - 1 for c in colorsys.hsv_to_rgb(step / 36.0, 1, 1)] for step in range(36)]
+            self._fallback_ag = [circle, colors, None]
+        circle, colors, color_index = self._fallback_ag
+
+        # Pulsing animation
+        size_factor = 0.5 + 0.5 * abs(math.sin(elapsed * 3))
+        circle.radius = 200 * size_factor
+
+        # Hue advances 30 degrees per second
+        hue_index = int(elapsed * 30 / 10) % len(colors)
+        if hue_index != color_index:
+            circle.fillColor = colors[hue_index]
+            self._fallback_ag[2] = hue_index
+        circle.draw()
 
     def run_training_phase(self):
         """
@@ -1308,11 +1371,19 @@ class InfantEyetrackingExperiment:
         """
         self.logger.info("Starting training phase.")
 
+        if self.training_plan is not None:
+            self.run_planned_training_phase()
+            return
+
         n_training_blocks = 4
         n_trials_per_block = 3
 
         total_trials = n_training_blocks * n_trials_per_block
         trials_between_ag = 4
+        inter_trial_interval = 0.25  # seconds, used to set up the next trial when no AG follows
+
+        # Set up the first trial's videos while the initial attention getter plays
+        self.begin_trial_preparation(self._next_selected_objects)
 
             # Play initial attention getter before starting
         ag_video = self.get_next_ag_video()
@@ -1323,6 +1394,8 @@ class InfantEyetrackingExperiment:
         for trial_num in range(1, total_trials + 1):
             # Run the training trial
             self.run_training_trial()
+            # Nothing of this trial is playing any more; stage the next one
+            self.begin_trial_preparation(self._next_selected_objects)
             
             # Play attention getter after every 'trials_between_ag' trials
             # But don't play one after the very last trial
@@ -1330,6 +1403,37 @@ class InfantEyetrackingExperiment:
                 ag_video = self.get_next_ag_video()
                 if ag_video:
                     self.run_ag_trial(ag_video)
+            elif trial_num < total_trials:
+                # Back-to-back trials: set up the next one in a short inter-trial interval
+                self.wait_and_prepare(inter_trial_interval)
+
+        self.logger.info("Training phase completed.")
+
+    def run_planned_training_phase(self):
+        """
+        Run the training phase step by step from the compiled training order
+        (see load_training_order); nothing is parsed or looked up by path here.
+        """
+        box_trials = [step for step in self.training_plan if step.trial_type == 'boxTraining']
+        if box_trials:
+            self.begin_trial_preparation(box_trials[0].fields['objects'])
+
+        inter_trial_interval = 0.25  # seconds, used to set up the next trial when no AG comes first
+        n_box_trials = 0
+        for i, step in enumerate(self.training_plan):
+            if step.trial_type == 'AG':
+                audio = step.assets.get('AGAudio')
+                self.run_ag_trial(step.assets['AGVideo'][1], step.durations.get('AGTime', 5.0),
+                                  audio[1] if audio else None)
+            else:
+                self.run_training_trial(step.fields['objects'])
+                n_box_trials += 1
+                # Stage the next box trial while the following steps run
+                if n_box_trials < len(box_trials):
+                    self.begin_trial_preparation(box_trials[n_box_trials].fields['objects'])
+                    # An AG services the preparation itself; back-to-back trials get an inter-trial interval
+                    if self.training_plan[i + 1].trial_type == 'boxTraining':
+                        self.wait_and_prepare(inter_trial_interval)
 
         self.logger.info("Training phase completed.")
 
@@ -1352,6 +1456,14 @@ class InfantEyetrackingExperiment:
         successful_trials = 0
         consecutive_failures = 0
 
+        # Every attempt's objects and seeds are decided up front, so each
+        # trial's videos can be prefetched while the previous one runs and
+        # set up during the inter-trial interval (and attention-getter) before it
+        inter_trial_interval = 0.25  # seconds
+        trial_plans = self.plan_gt_trials(max_total_attempts)
+        self.prefetch_trial_videos(trial_plans[0].objects)
+        self.begin_trial_preparation(trial_plans[0].objects)
+
         while trial_attempts < max_total_attempts and successful_trials < required_successful_trials:
             if consecutive_failures >= consecutive_failures_for_ag:
                 self.logger.info(
@@ -1364,8 +1476,12 @@ class InfantEyetrackingExperiment:
             trial_attempts += 1
             self.logger.info(f"Starting test trial {trial_attempts} of maximum {max_total_attempts}")
 
-            libtime.pause(250)
-            selections_made = self.run_seeded_gt_trial()
+            self.wait_and_prepare(inter_trial_interval)
+            if trial_attempts < max_total_attempts:
+                self.prefetch_trial_videos(trial_plans[trial_attempts].objects)
+            selections_made = self.run_seeded_gt_trial(trial_plans[trial_attempts - 1])
+            if trial_attempts < max_total_attempts:
+                self.begin_trial_preparation(trial_plans[trial_attempts].objects)
 
             if selections_made == 4:
                 successful_trials += 1
@@ -0,0 +1,180 @@
+import os
+import threading
+
+import numpy as np
+from PIL import Image
+from psychopy import visual
+
+from asset_manifest import file_hash
+
+
+class VideoFrameCache:
+    """
+    Cache of the first and last frame of each box video as still textures.
+
+    Paused box videos only ever show their first or last frame, so instead of
+    keeping a live MovieStim decoder paused and redrawing it every frame, the
+    two frames are decoded once and drawn as ImageStims. Decoded frames are
+    persisted to ``cache_dir`` as .npz files keyed by the SHA-1 of the video
+    file, so later sessions load them from disk without decoding at all.
+
+    Frame arrays (CPU work only) can be loaded ahead of time in a background
+    thread with ``prefetch``; ImageStims are created lazily on the main thread
+    by ``get_stim`` because they need the OpenGL context.
+
+    Decoding uses OpenCV (cv2). If it is not installed, ``get_stim`` returns
+    None and callers fall back to drawing the paused decoder.
+
+    Parameters:
+    -----------
+    win : psychopy.visual.Window
+        The window the stills are drawn to
+    cache_dir : str
+        Directory where decoded frames are stored
+    logger : logging.Logger
+        Experiment logger
+    size : tuple (w, h)
+        Size applied to every still (default: (500, 500))
+    hash_lookup : callable, optional
+        Returns a video's known SHA-1 (e.g. AssetManifest.sha1) or None, so
+        unchanged videos are not re-hashed every session (default: None)
+    """
+    FIRST = "first"
+    LAST = "last"
+
+    def __init__(self, win, cache_dir, logger, size=(500, 500), hash_lookup=None):
+        self.win = win
+        self.cache_dir = cache_dir
+        self.logger = logger
+        self.size = size
+        self.hash_lookup = hash_lookup
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._frames = {}   # {video_path: {"first": array, "last": array}}
+        self._stims = {}    # {(video_path, which): ImageStim}
+        self._lock = threading.Lock()
+        self._loading = {}  # {video_path: Lock held while its frames are loaded}
+
+    def _decode(self, video_path):
+        """Decode the first and last frame of a video as RGB uint8 arrays."""
+        try:
+            import cv2
+        except ImportError:
+            self.logger.warning("OpenCV not available - cannot cache still frames")
+            return None
+
+        capture = cv2.VideoCapture(video_path)
+        try:
+            ok, first = capture.read()
+            if not ok:
+                return None
+            last = first
+            n_frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+            if n_frames > 1:
+                capture.set(cv2.CAP_PROP_POS_FRAMES, n_frames - 1)
+                ok, frame = capture.read()
+                if not ok:
+                    # Frame counts from the container can be off by a few; read through instead
+                    capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    while True:
+                        ok, next_frame = capture.read()
+                        if not ok:
+                            break
+                        frame = next_frame
+                last = frame if frame is not None else first
+        finally:
+            capture.release()
+
+        return {
+            self.FIRST: cv2.cvtColor(first, cv2.COLOR_BGR2RGB),
+            self.LAST: cv2.cvtColor(last, cv2.COLOR_BGR2RGB),
+        }
+
+    def load_frames(self, video_path):
+        """
+        Return the cached first/last frames of a video, loading them from the
+        disk cache or decoding (and caching) them if necessary.
+
+        Returns:
+        --------
+        dict or None
+            {"first": array, "last": array}, or None if the frames cannot be decoded
+        """
+        with self._lock:
+            if video_path in self._frames:
+                return self._frames[video_path]
+            # One load per video at a time, so the prefetch thread and the main
+            # thread never decode or write the same cache file together
+            path_lock = self._loading.setdefault(video_path, threading.Lock())
+
+        with path_lock:
+            with self._lock:
+                if video_path in self._frames:
+                    return self._frames[video_path]
+
+            digest = self.hash_lookup(video_path) if self.hash_lookup is not None else None
+            cache_file = os.path.join(self.cache_dir, (digest or file_hash(video_path)) + '.npz')
+            frames = None
+            if os.path.exists(cache_file):
+                try:
+                    with np.load(cache_file) as data:
+                        frames = {self.FIRST: data[self.FIRST], self.LAST: data[self.LAST]}
+                except Exception as e:
+                    # Truncated or corrupt files raise anything from BadZipFile to EOFError; decode again
+                    self.logger.warning(f"Ignoring unreadable frame cache {cache_file}: {e}")
+
+            if frames is None:
+                frames = self._decode(video_path)
+                if frames is None:
+                    return None
+                # Write atomically, via a temporary file, so a crash never leaves a partial cache file
+                temp_path = cache_file + '.tmp'
+                with open(temp_path, 'wb') as f:
+                    np.savez(f, **frames)
+                os.replace(temp_path, cache_file)
+                self.logger.info(f"Cached still frames for {os.path.basename(video_path)}")
+
+            with self._lock:
+                self._frames[video_path] = frames
+            return frames
+
+    def prefetch(self, video_paths):
+        """Load the frames for the given videos in a background thread."""
+        def _load():
+            for path in video_paths:
+                try:
+                    self.load_frames(path)
+                except Exception as e:
+                    self.logger.warning(f"Could not prefetch still frames for {path}: {e}")
+        threading.Thread(target=_load, name="FrameCachePrefetch", daemon=True).start()
+
+    def get_stim(self, video_path, which, pos):
+        """
+        Return an ImageStim showing the first or last frame of a video.
+
+        Parameters:
+        -----------
+        video_path : str
+            Path to the video file
+        which : str
+            VideoFrameCache.FIRST or VideoFrameCache.LAST
+        pos : tuple (x, y)
+            Position of the still in window coordinates
+
+        Returns:
+        --------
+        psychopy.visual.ImageStim or None
+            The still, or None if the frames are unavailable
+        """
+        key = (video_path, which)
+        stim = self._stims.get(key)
+        if stim is None:
+            frames = self.load_frames(video_path)
+            if frames is None:
+                return None
+            # Hand PsychoPy a PIL image so it orients the texture like an image file
+            image = Image.fromarray(frames[which])
+            stim = visual.ImageStim(self.win, image=image, size=self.size, units='pix', interpolate=True)
+            self._stims[key] = stim
+        stim.pos = pos
+        return stim
@@ -0,0 +1,161 @@
+import time
+
+
+class FrameProfiler:
+    """
+    Per-frame timing instrumentation for the trial loops.
+
+    Every ``flip`` goes through the profiler, which timestamps the flip and
+    records the frame interval. A frame that took more than 1.5 refresh
+    periods counts as a missed vsync deadline, and the number of refreshes
+    it spanned beyond the first counts as dropped frames. Between flips the trial loop
+    calls ``lap(phase)`` to charge the time spent since the previous mark to
+    a phase (e.g. "gaze", "aoi", "logging", "draw"); the time spent blocked
+    in the flip itself is charged to "flip".
+
+    At the end of a trial, ``end_trial`` summarises the frame intervals
+    (p50/p95/p99/max, dropped frames, mean time per phase) and hands the
+    summary to the data logger, which writes it to
+    ``frame_timing_<subjCode>.csv`` next to the training log.
+
+    Parameters:
+    -----------
+    win : psychopy.visual.Window
+        The window whose flips are timed
+    data_logger : DataLogger, optional
+        Logger that receives the per-trial summaries (default: None)
+    refresh_rate : float, optional
+        Display refresh rate in Hz. If None, it is taken from the window's
+        frame period, falling back to 60 Hz.
+    enabled : bool
+        If False, flip() just flips the window and nothing is recorded (default: True)
+    """
+    PHASES = ("gaze", "aoi", "logging", "draw", "flip")
+
+    def __init__(self, win, data_logger=None, refresh_rate=None, enabled=True):
+        self.win = win
+        self.data_logger = data_logger
+        self.enabled = enabled
+
+        if refresh_rate is None:
+            frame_period = getattr(win, 'monitorFramePeriod', None)
+            refresh_rate = 1.0 / frame_period if frame_period else 60.0
+        self.refresh_rate = refresh_rate
+        self.frame_period = 1.0 / refresh_rate
+        # A frame counts as missed once it overshoots the deadline by half a refresh
+        self.missed_threshold = 1.5 * self.frame_period
+
+        self.trial_num = None
+        self.phase = None
+        self._reset()
+
+    def _reset(self):
+        self.frame_intervals = []
+        self.dropped_frames = 0
+        self.missed_deadlines = 0
+        self.phase_totals = {phase: 0.0 for phase in self.PHASES}
+        self.trial_start = None
+        self.last_flip = None
+        self.last_mark = None
+
+    def start_trial(self, trial_num, phase):
+        """Begin collecting frame timings for a new trial."""
+        self._reset()
+        self.trial_num = trial_num
+        self.phase = phase
+        self.trial_start = time.perf_counter()
+        self.last_mark = self.trial_start
+
+    def lap(self, phase):
+        """Charge the time since the previous mark to the given phase."""
+        if not self.enabled or self.last_mark is None:
+            return
+        now = time.perf_counter()
+        self.phase_totals[phase] = self.phase_totals.get(phase, 0.0) + (now - self.last_mark)
+        self.last_mark = now
+
+    def flip(self):
+        """
+        Flip the window and record the frame interval.
+
+        Returns:
+        --------
+        float
+            The flip timestamp returned by the window
+        """
+        if not self.enabled or self.trial_start is None:
+            return self.win.flip()
+
+        # Anything since the last mark is drawing work for this frame
+        self.lap("draw")
+        flip_time = self.win.flip()
+        now = time.perf_counter()
+        self.phase_totals["flip"] += now - self.last_mark
+        self.last_mark = now
+
+        if self.last_flip is not None:
+            interval = now - self.last_flip
+            self.frame_intervals.append(interval)
+            if interval > self.missed_threshold:
+                self.missed_deadlines += 1
+                self.dropped_frames += int(round(interval / self.frame_period)) - 1
+        self.last_flip = now
+        return flip_time
+
+    @staticmethod
+    def _percentile(sorted_values, pct):
+        """Nearest-rank percentile of an already sorted list."""
+        if not sorted_values:
+            return 0.0
+        rank = int(round(pct / 100.0 * (len(sorted_values) - 1)))
+        return sorted_values[rank]
+
+    def summary(self):
+        """
+        Summarise the frame timings collected for the current trial.
+
+        Returns:
+        --------
+        dict
+            Frame count, percentiles (ms), dropped-frame count and mean time
+            per frame spent in each phase (ms)
+        """
+        intervals = sorted(self.frame_intervals)
+        n_frames = len(self.frame_intervals) + (1 if self.last_flip is not None else 0)
+        duration = (time.perf_counter() - self.trial_start) if self.trial_start is not None else 0.0
+        summary = {
+            'trial_num': self.trial_num,
+            'phase': self.phase,
+            'n_frames': n_frames,
+            'duration_s': duration,
+            'refresh_hz': self.refresh_rate,
+            'mean_ms': (sum(intervals) / len(intervals) * 1000) if intervals else 0.0,
+            'p50_ms': self._percentile(intervals, 50) * 1000,
+            'p95_ms': self._percentile(intervals, 95) * 1000,
+            'p99_ms': self._percentile(intervals, 99) * 1000,
+            'max_ms': (intervals[-1] * 1000) if intervals else 0.0,
+            'missed_deadlines': self.missed_deadlines,
+            'dropped_frames': self.dropped_frames,
+        }
+        for phase in self.PHASES:
+            summary[f'{phase}_ms'] = (self.phase_totals[phase] / n_frames * 1000) if n_frames else 0.0
+        return summary
+
+    def end_trial(self):
+        """
+        Finish the current trial, write its summary via the data logger and
+        stop recording until the next start_trial.
+
+        Returns:
+        --------
+        dict or None
+            The trial summary, or None if profiling is disabled or no trial was started
+        """
+        if not self.enabled or self.trial_start is None:
+            return None
+        summary = self.summary()
+        if self.data_logger is not None:
+            self.data_logger.log_frame_timing(summary)
+        self.trial_start = None
+        self.last_mark = None
+        return summary
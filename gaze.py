@@ -0,0 +1,436 @@
+import math
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+# Record layout of a gaze trace: one row per sample
+GAZE_RECORD_DTYPE = np.dtype([
+    ('timestamp', 'f8'),   # seconds, experiment clock
+    ('x', 'f4'),           # gaze x, pygaze coordinates (pixels, origin top-left)
+    ('y', 'f4'),           # gaze y, pygaze coordinates
+    ('box_hit', 'i1'),     # index of the AOI containing the sample, -1 for none
+])
+
+
+class GazeRingBuffer:
+    """
+    Preallocated ring buffer of (timestamp, x, y, box_hit) gaze records.
+
+    The trial loop appends one record per gaze sample without allocating or
+    formatting anything; at the end of the trial ``dump`` copies the records
+    out in chronological order and writes them to a .npy file on a background
+    thread. If a trial produces more samples than ``capacity``, the oldest
+    records are overwritten and the overflow is reported when dumping.
+
+    Parameters:
+    -----------
+    capacity : int
+        Number of records held before the oldest are overwritten (default: 32768)
+    logger : logging.Logger, optional
+        Logger used to report dumps and overflows (default: None)
+    """
+
+    def __init__(self, capacity=32768, logger=None):
+        self.capacity = capacity
+        self.logger = logger
+        self._timestamp = np.zeros(capacity, dtype='f8')
+        self._x = np.zeros(capacity, dtype='f4')
+        self._y = np.zeros(capacity, dtype='f4')
+        self._box_hit = np.zeros(capacity, dtype='i1')
+        self._index = 0     # next slot to write
+        self._count = 0     # total records appended since the last clear
+        self._dump_threads = []
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    def clear(self):
+        """Discard all records (e.g. at trial start)."""
+        self._index = 0
+        self._count = 0
+
+    def append(self, timestamp, x, y, box_hit=-1):
+        """Append one gaze record, overwriting the oldest if the buffer is full."""
+        i = self._index
+        self._timestamp[i] = timestamp
+        self._x[i] = x
+        self._y[i] = y
+        self._box_hit[i] = box_hit
+        self._index = i + 1 if i + 1 < self.capacity else 0
+        self._count += 1
+
+    def snapshot(self):
+        """
+        Return the buffered records in chronological order.
+
+        Returns:
+        --------
+        numpy.ndarray
+            Structured array with GAZE_RECORD_DTYPE
+        """
+        n = len(self)
+        records = np.empty(n, dtype=GAZE_RECORD_DTYPE)
+        if self._count <= self.capacity:
+            order = slice(0, n)
+        else:
+            # Wrapped: oldest record is at the write index
+            order = np.r_[self._index:self.capacity, 0:self._index]
+        records['timestamp'] = self._timestamp[order]
+        records['x'] = self._x[order]
+        records['y'] = self._y[order]
+        records['box_hit'] = self._box_hit[order]
+        return records
+
+    def dump(self, path, clear=True):
+        """
+        Write the buffered records to a .npy file on a background thread.
+
+        Parameters:
+        -----------
+        path : str
+            Destination .npy file
+        clear : bool
+            Clear the buffer after taking the snapshot (default: True)
+
+        Returns:
+        --------
+        threading.Thread
+            The writer thread (join it to wait for the file)
+        """
+        records = self.snapshot()
+        overflow = max(0, self._count - self.capacity)
+        if clear:
+            self.clear()
+        if overflow and self.logger is not None:
+            self.logger.warning(f"Gaze buffer overflowed: oldest {overflow} samples dropped from {path}")
+
+        def _write():
+            np.save(path, records)
+            if self.logger is not None:
+                self.logger.info(f"Gaze trace written: {path} ({len(records)} samples)")
+
+        thread = threading.Thread(target=_write, name="GazeTraceWriter", daemon=True)
+        thread.start()
+        self._dump_threads = [t for t in self._dump_threads if t.is_alive()] + [thread]
+        return thread
+
+    def wait(self, timeout=None):
+        """Block until all pending dumps have been written."""
+        for thread in self._dump_threads:
+            thread.join(timeout)
+        self._dump_threads = []
+
+
+def is_valid_sample(gaze_sample):
+    """
+    Return True if a pygaze gaze sample holds a usable position.
+
+    pygaze reports track loss (blinks, lost eyes) as (-1, -1); None means no
+    tracker is in use. NaN coordinates are treated as invalid too.
+    """
+    if gaze_sample is None:
+        return False
+    x, y = gaze_sample[0], gaze_sample[1]
+    if x != x or y != y:  # NaN
+        return False
+    return not (x == -1 and y == -1)
+
+
+class FixationTracker:
+    """
+    Constant-time dwell tracking per AOI.
+
+    Only the dwell onset and the time of the most recent in-AOI sample are
+    stored for each AOI, so dwell time is computed in O(1) time and memory
+    (last in-AOI sample minus onset, like the first/last timestamps of the old
+    gaze history lists).
+
+    A valid sample outside an AOI ends its dwell. Invalid samples (track loss,
+    blinks) do not: if the gaze comes back to the same AOI within
+    ``dropout_tolerance`` seconds of the last in-AOI sample, the dwell simply
+    continues, otherwise it restarts.
+
+    Parameters:
+    -----------
+    aoi_names : list of str
+        Names of the AOIs to track (e.g. box names)
+    dropout_tolerance : float
+        Longest track-loss gap in seconds that does not reset a dwell (default: 0.1)
+    """
+
+    def __init__(self, aoi_names, dropout_tolerance=0.1):
+        self.aoi_names = list(aoi_names)
+        self.dropout_tolerance = dropout_tolerance
+        self._onset = {name: None for name in self.aoi_names}
+        self._last_seen = {name: None for name in self.aoi_names}
+
+    def hit(self, aoi, timestamp):
+        """Record a valid sample inside the AOI."""
+        last_seen = self._last_seen[aoi]
+        if self._onset[aoi] is None or timestamp - last_seen > self.dropout_tolerance:
+            self._onset[aoi] = timestamp
+        self._last_seen[aoi] = timestamp
+
+    def miss(self, aoi, timestamp, valid=True):
+        """
+        Record a sample that is not inside the AOI. A valid sample elsewhere
+        ends the dwell; an invalid one is tolerated (see dropout_tolerance).
+        """
+        if valid:
+            self._onset[aoi] = None
+
+    def update(self, timestamp, hit_aoi=None, valid=True):
+        """
+        Record one sample for all AOIs.
+
+        Parameters:
+        -----------
+        timestamp : float
+            Sample time in seconds
+        hit_aoi : str or None
+            The AOI containing the sample, or None
+        valid : bool
+            False if the sample is track loss
+        """
+        for name in self.aoi_names:
+            if valid and name == hit_aoi:
+                self.hit(name, timestamp)
+            else:
+                self.miss(name, timestamp, valid)
+
+    def dwell(self, aoi):
+        """Return the current dwell time in seconds on the AOI (0 if not dwelling)."""
+        onset = self._onset[aoi]
+        if onset is None:
+            return 0
+        return self._last_seen[aoi] - onset
+
+    def reset(self, aoi=None):
+        """End the dwell on one AOI, or on all AOIs if aoi is None."""
+        names = self.aoi_names if aoi is None else [aoi]
+        for name in names:
+            self._onset[name] = None
+            self._last_seen[name] = None
+
+
+class AOIIndex:
+    """
+    Vectorized AOI hit-testing across all AOIs at once.
+
+    AOI geometry is stored as NumPy arrays (one row per AOI), so "which AOI,
+    if any, contains this point?" is a single vectorized test instead of one
+    pygaze ``AOI.contains`` call per AOI. ``hit_many`` answers the same
+    question for whole arrays of samples, so offline replay of recorded gaze
+    uses exactly the same geometry as the live trigger.
+
+    Coordinates are pygaze coordinates (pixels, origin top-left). Rectangles
+    use pygaze's strict-inequality containment; ellipses contain points on or
+    inside their outline.
+
+    Parameters:
+    -----------
+    names : list of str
+        AOI names; hit indices refer to this order
+    bounds : array-like, shape (n, 4)
+        (left, top, right, bottom) of each AOI's bounding box
+    shapes : list of str, optional
+        "rectangle" or "ellipse" per AOI (default: all rectangles)
+    """
+    RECTANGLE = "rectangle"
+    ELLIPSE = "ellipse"
+
+    def __init__(self, names, bounds, shapes=None):
+        self.names = list(names)
+        bounds = np.asarray(bounds, dtype='f8').reshape(len(self.names), 4)
+        self.left, self.top, self.right, self.bottom = bounds.T.copy()
+        self.center_x = (self.left + self.right) / 2
+        self.center_y = (self.top + self.bottom) / 2
+        self.radius_x = (self.right - self.left) / 2
+        self.radius_y = (self.bottom - self.top) / 2
+        if shapes is None:
+            shapes = [self.RECTANGLE] * len(self.names)
+        self.is_ellipse = np.array([shape in (self.ELLIPSE, "circle") for shape in shapes])
+
+    @classmethod
+    def from_rects(cls, names, positions, sizes, shapes=None):
+        """
+        Build an index from pygaze-style AOIs (top-left position and size).
+
+        Parameters:
+        -----------
+        names : list of str
+            AOI names
+        positions : list of (x, y)
+            Top-left corner of each AOI in pygaze coordinates
+        sizes : list of (w, h)
+            Size of each AOI in pixels
+        shapes : list of str, optional
+            "rectangle" or "ellipse" per AOI
+        """
+        bounds = [(x, y, x + w, y + h) for (x, y), (w, h) in zip(positions, sizes)]
+        return cls(names, bounds, shapes)
+
+    @classmethod
+    def from_centers(cls, names, centers, size, shapes=None):
+        """Build an index of equally sized AOIs from their centers (pygaze coordinates)."""
+        w, h = size
+        bounds = [(x - w / 2, y - h / 2, x + w / 2, y + h / 2) for x, y in centers]
+        return cls(names, bounds, shapes)
+
+    def _contains(self, x, y):
+        # x, y broadcast against the per-AOI arrays (last axis = AOI)
+        in_rect = (x > self.left) & (x < self.right) & (y > self.top) & (y < self.bottom)
+        if not self.is_ellipse.any():
+            return in_rect
+        dx = (x - self.center_x) / self.radius_x
+        dy = (y - self.center_y) / self.radius_y
+        in_ellipse = dx * dx + dy * dy <= 1.0
+        return np.where(self.is_ellipse, in_ellipse, in_rect)
+
+    def hit(self, x, y):
+        """
+        Return the index of the first AOI containing (x, y), or -1 for none.
+        """
+        inside = self._contains(x, y)
+        if not inside.any():
+            return -1
+        return int(inside.argmax())
+
+    def hit_many(self, xs, ys):
+        """
+        Hit-test arrays of samples.
+
+        Parameters:
+        -----------
+        xs, ys : array-like, shape (n,)
+            Sample coordinates; NaN samples never hit
+
+        Returns:
+        --------
+        numpy.ndarray, shape (n,), dtype int8
+            Index of the first AOI containing each sample, -1 for none
+        """
+        xs = np.asarray(xs, dtype='f8')[:, None]
+        ys = np.asarray(ys, dtype='f8')[:, None]
+        inside = self._contains(xs, ys)
+        hits = inside.argmax(axis=1).astype('i1')
+        hits[~inside.any(axis=1)] = -1
+        return hits
+
+    def name(self, index):
+        """Return the AOI name for a hit index, or None for -1."""
+        return self.names[index] if index >= 0 else None
+
+
+class GazeStream:
+    """
+    Full-rate gaze acquisition decoupled from the render loop.
+
+    With a Tobii Pro tracker, the stream subscribes its own callback to the
+    SDK's gaze data stream. Callbacks arrive on the SDK's thread at the
+    tracker's sampling rate; each one converts the sample to pygaze pixel
+    coordinates and the experiment clock, then appends it to a deque.
+    ``collections.deque`` appends and pops are atomic, so producer and
+    consumer never take a lock. The trial loop calls ``drain`` once per frame
+    and gets every sample recorded since the previous frame, not just the
+    latest one.
+
+    Other trackers (e.g. pygaze's dummy/mouse tracker) have no push stream.
+    For those, ``drain`` falls back to polling ``tracker.sample()`` once per
+    call on the main thread, which matches the old per-frame sampling.
+
+    Samples are (timestamp, x, y, valid) tuples; timestamps are on the
+    experiment clock in seconds.
+
+    Parameters:
+    -----------
+    tracker : pygaze.eyetracker.EyeTracker
+        The pygaze tracker (its Tobii SDK handle is used when available)
+    disp_size : tuple (w, h)
+        Display resolution used to convert normalised gaze to pixels
+    clock : callable
+        Experiment clock returning seconds, e.g. psychopy.core.getTime (default: time.perf_counter)
+    maxlen : int
+        Maximum number of undrained samples kept; the oldest are dropped beyond this (default: 4096)
+    logger : logging.Logger, optional
+        Experiment logger (default: None)
+    """
+
+    def __init__(self, tracker, disp_size, clock=time.perf_counter, maxlen=4096, logger=None):
+        self.tracker = tracker
+        self.disp_w, self.disp_h = disp_size
+        self.clock = clock
+        self.logger = logger
+        self._samples = deque(maxlen=maxlen)
+        self._sdk = None
+        self._sdk_tracker = None
+        self._clock_offset = 0.0
+        self.streaming = False
+
+    def start(self):
+        """Subscribe to the tracker's gaze stream (or switch to polling if there is none)."""
+        self._samples.clear()
+        sdk_tracker = getattr(self.tracker, 'eyetracker', None)
+        if sdk_tracker is None or not hasattr(sdk_tracker, 'subscribe_to'):
+            self.streaming = False
+            return False
+
+        import tobii_research as tr
+        self._sdk = tr
+        self._sdk_tracker = sdk_tracker
+        # Tobii system timestamps are microseconds on the SDK clock; map them onto the experiment clock
+        self._clock_offset = self.clock() - tr.get_system_time_stamp() / 1e6
+        sdk_tracker.subscribe_to(tr.EYETRACKER_GAZE_DATA, self._on_gaze_data, as_dictionary=True)
+        self.streaming = True
+        if self.logger is not None:
+            self.logger.info("Gaze stream subscribed to full-rate tracker data")
+        return True
+
+    def stop(self):
+        """Unsubscribe from the tracker's gaze stream."""
+        if self.streaming:
+            self._sdk_tracker.unsubscribe_from(self._sdk.EYETRACKER_GAZE_DATA, self._on_gaze_data)
+            self.streaming = False
+
+    def _on_gaze_data(self, gaze_data):
+        # Runs on the Tobii SDK thread - keep it short and allocation-light
+        xs = []
+        ys = []
+        for eye in ('left', 'right'):
+            if gaze_data[f'{eye}_gaze_point_validity']:
+                nx, ny = gaze_data[f'{eye}_gaze_point_on_display_area']
+                if not (math.isnan(nx) or math.isnan(ny)):
+                    xs.append(nx)
+                    ys.append(ny)
+        timestamp = gaze_data['system_time_stamp'] / 1e6 + self._clock_offset
+        if xs:
+            self._samples.append((timestamp, sum(xs) / len(xs) * self.disp_w,
+                                  sum(ys) / len(ys) * self.disp_h, True))
+        else:
+            self._samples.append((timestamp, -1.0, -1.0, False))
+
+    def drain(self):
+        """
+        Return all samples received since the last call, oldest first.
+
+        Returns:
+        --------
+        list of (timestamp, x, y, valid)
+        """
+        if not self.streaming:
+            gaze_sample = self.tracker.sample()
+            if gaze_sample is None:
+                return []
+            valid = is_valid_sample(gaze_sample)
+            return [(self.clock(), gaze_sample[0], gaze_sample[1], valid)]
+
+        samples = []
+        popleft = self._samples.popleft
+        while True:
+            try:
+                samples.append(popleft())
+            except IndexError:
+                return samples
@@ -0,0 +1,269 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from constants import DISPSIZE, SACCACCTHRESH, SACCVELTHRESH
+
+
+# Defaults for sessions without an initiation report (the pilot setup)
+DEFAULT_SCREEN_SIZE_CM = (33.8, 27.1)
+DEFAULT_FIXATION_THRESHOLD = 1.5  # degrees
+# pygaze's default viewing distance (SCREENDIST); the report does not record it
+DEFAULT_VIEWING_DISTANCE_CM = 57.0
+
+FIXATION_DTYPE = np.dtype([
+    ('start_index', 'i8'), ('end_index', 'i8'),      # sample offsets, end exclusive
+    ('start_time', 'f8'), ('end_time', 'f8'), ('duration', 'f8'),  # ms
+    ('x', 'f4'), ('y', 'f4'),                        # mean position, pixels
+    ('dispersion', 'f4'),                            # degrees
+])
+
+SACCADE_DTYPE = np.dtype([
+    ('start_index', 'i8'), ('end_index', 'i8'),
+    ('start_time', 'f8'), ('end_time', 'f8'), ('duration', 'f8'),
+    ('start_x', 'f4'), ('start_y', 'f4'), ('end_x', 'f4'), ('end_y', 'f4'),
+    ('amplitude', 'f4'),                             # degrees
+    ('peak_velocity', 'f4'),                         # degrees/second
+])
+
+
+def pixels_per_cm(disp_size, screen_size_cm):
+    """Mean pixel density of the display, as pygaze computes it."""
+    return (disp_size[0] / float(screen_size_cm[0]) + disp_size[1] / float(screen_size_cm[1])) / 2
+
+
+def pixels_to_degrees(pixels, pix_per_cm, viewing_distance_cm=DEFAULT_VIEWING_DISTANCE_CM):
+    """Convert an on-screen distance in pixels to visual angle in degrees."""
+    return np.degrees(np.arctan(pixels / pix_per_cm / viewing_distance_cm))
+
+
+def _runs(mask):
+    """Return (starts, ends) of the runs of True in a boolean array (ends exclusive)."""
+    edges = np.diff(np.concatenate(([False], mask, [False])).astype('i1'))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def _run_reduce(ufunc, values, starts, ends):
+    """Apply a ufunc reduction (np.add, np.maximum, ...) over each values[start:end] run."""
+    # reduceat over interleaved (start, end) pairs reduces [start, end) at the even positions;
+    # the padding element keeps an end equal to len(values) a valid index
+    padded = np.append(values, values[-1:] if len(values) else 0)
+    bounds = np.empty(2 * len(starts), dtype='i8')
+    bounds[0::2] = starts
+    bounds[1::2] = ends
+    return ufunc.reduceat(padded, bounds)[0::2]
+
+
+def _run_dispersion(x, y, starts, ends, pix_per_cm, viewing_distance_cm):
+    """Dispersion in degrees (largest of the x and y extent) of each [start, end) run."""
+    spread_x = _run_reduce(np.maximum, x, starts, ends) - _run_reduce(np.minimum, x, starts, ends)
+    spread_y = _run_reduce(np.maximum, y, starts, ends) - _run_reduce(np.minimum, y, starts, ends)
+    return pixels_to_degrees(np.maximum(spread_x, spread_y), pix_per_cm, viewing_distance_cm)
+
+
+def _split_dispersed_run(t, x, y, start, end, max_spread, min_duration):
+    """
+    Split one sub-threshold run whose overall dispersion is too large into
+    fixations with dispersion-threshold identification (I-DT): open a window
+    spanning ``min_duration``, slide its start on while the window is wider
+    than ``max_spread`` (pixels), otherwise grow it until the next sample
+    would exceed ``max_spread`` and emit it.
+
+    Returns:
+    --------
+    list of (start, end)
+        Sample offsets of the fixations found in [start, end), end exclusive
+    """
+    windows = []
+    i = start
+    while i < end:
+        # Smallest window [i, j) lasting min_duration
+        j = int(np.searchsorted(t, t[i] + min_duration)) + 1
+        if j > end:
+            break
+        min_x, max_x = x[i:j].min(), x[i:j].max()
+        min_y, max_y = y[i:j].min(), y[i:j].max()
+        if max(max_x - min_x, max_y - min_y) > max_spread:
+            i += 1
+            continue
+        while j < end:
+            next_min_x, next_max_x = min(min_x, x[j]), max(max_x, x[j])
+            next_min_y, next_max_y = min(min_y, y[j]), max(max_y, y[j])
+            if max(next_max_x - next_min_x, next_max_y - next_min_y) > max_spread:
+                break
+            min_x, max_x, min_y, max_y = next_min_x, next_max_x, next_min_y, next_max_y
+            j += 1
+        windows.append((i, j))
+        i = j
+    return windows
+
+
+def detect_events(timestamps, xs, ys, header=None, velocity_threshold=SACCVELTHRESH,
+                  acceleration_threshold=SACCACCTHRESH, fixation_threshold=None, min_fixation_duration=100,
+                  viewing_distance_cm=DEFAULT_VIEWING_DISTANCE_CM):
+    """
+    Detect fixations and saccades in a gaze recording.
+
+    Velocity-threshold identification over whole arrays: the gaze
+    displacement across each sample (+/-2 samples) is converted to degrees
+    with the display geometry, differentiated into velocity and
+    acceleration, and every sample above
+    the velocity or acceleration threshold is a saccade sample. Runs of
+    valid, non-saccade samples lasting at least ``min_fixation_duration``
+    whose spatial dispersion stays within ``fixation_threshold`` are
+    fixations; runs of saccade samples are saccades. Missing samples (NaN)
+    end both.
+
+    A sub-threshold run can drift further than ``fixation_threshold`` without
+    any sample reaching saccadic velocity (slow drift, or two fixations
+    joined by a small saccade the +/-2 sample velocity smooths away). Such a
+    run is split into fixations by dispersion-threshold identification
+    within the run (see _split_dispersed_run); samples that fit no window
+    lasting ``min_fixation_duration`` are left unclassified.
+
+    Parameters:
+    -----------
+    timestamps : array-like
+        Sample times in ms, sorted
+    xs, ys : array-like
+        Gaze position in pixels (NaN where missing)
+    header : dict, optional
+        pygaze initiation report (see tobii_data.parse_report_header); its
+        display_resolution, display_size_cm and fixation_threshold are used
+        when present
+    velocity_threshold : float
+        Saccade velocity threshold in degrees/second (default: SACCVELTHRESH)
+    acceleration_threshold : float
+        Saccade acceleration threshold in degrees/second**2 (default: SACCACCTHRESH)
+    fixation_threshold : float, optional
+        Maximum fixation dispersion in degrees (default: from the header, else 1.5)
+    min_fixation_duration : float
+        Minimum fixation duration in ms (default: 100)
+    viewing_distance_cm : float
+        Eye-to-screen distance in cm (default: 57, pygaze's default)
+
+    Returns:
+    --------
+    tuple (fixations, saccades)
+        Structured arrays of FIXATION_DTYPE and SACCADE_DTYPE
+    """
+    header = header or {}
+    disp_size = header.get('display_resolution', DISPSIZE)
+    screen_size_cm = header.get('display_size_cm', DEFAULT_SCREEN_SIZE_CM)
+    if fixation_threshold is None:
+        fixation_threshold = header.get('fixation_threshold', DEFAULT_FIXATION_THRESHOLD)
+    pix_per_cm = pixels_per_cm(disp_size, screen_size_cm)
+
+    t = np.asarray(timestamps, dtype='f8')
+    x = np.asarray(xs, dtype='f8')
+    y = np.asarray(ys, dtype='f8')
+    n = len(t)
+    if n < 3:
+        return np.empty(0, dtype=FIXATION_DTYPE), np.empty(0, dtype=SACCADE_DTYPE)
+    valid = ~(np.isnan(x) | np.isnan(y))
+
+    # Velocity (deg/s) as a central difference over +/-2 samples, which keeps
+    # single-pixel jitter at 300 Hz from reading as saccadic speed
+    velocity = np.full(n, np.nan)
+    span = (t[4:] - t[:-4]) / 1000.0
+    span[span <= 0] = np.nan
+    step_deg = pixels_to_degrees(np.hypot(x[4:] - x[:-4], y[4:] - y[:-4]), pix_per_cm, viewing_distance_cm)
+    velocity[2:-2] = step_deg / span
+    acceleration = np.full(n, np.nan)
+    acceleration[1:] = np.abs(np.diff(velocity)) / (np.diff(t) / 1000.0)
+
+    with np.errstate(invalid='ignore'):
+        saccade_sample = (velocity > velocity_threshold) | (acceleration > acceleration_threshold)
+    # Samples near a gap have no velocity and belong to neither event type
+    measured = ~np.isnan(velocity)
+
+    # Fixations: valid, measured, sub-threshold runs
+    fix_starts, fix_ends = _runs(valid & measured & ~saccade_sample)
+    if len(fix_starts):
+        fix_durations = t[fix_ends - 1] - t[fix_starts]
+        long_enough = fix_durations >= min_fixation_duration
+        fix_starts, fix_ends = fix_starts[long_enough], fix_ends[long_enough]
+    if len(fix_starts):
+        dispersion = _run_dispersion(x, y, fix_starts, fix_ends, pix_per_cm, viewing_distance_cm)
+        dispersed = dispersion > fixation_threshold
+        if dispersed.any():
+            # Largest on-screen spread (pixels) within fixation_threshold degrees
+            max_spread = np.tan(np.radians(fixation_threshold)) * viewing_distance_cm * pix_per_cm
+            windows = np.array([window for start, end in zip(fix_starts[dispersed], fix_ends[dispersed])
+                                for window in _split_dispersed_run(t, x, y, start, end, max_spread,
+                                                                   min_fixation_duration)], dtype='i8').reshape(-1, 2)
+            fix_starts = np.concatenate((fix_starts[~dispersed], windows[:, 0]))
+            fix_ends = np.concatenate((fix_ends[~dispersed], windows[:, 1]))
+            order = np.argsort(fix_starts)
+            fix_starts, fix_ends = fix_starts[order], fix_ends[order]
+            dispersion = _run_dispersion(x, y, fix_starts, fix_ends, pix_per_cm, viewing_distance_cm)
+    if len(fix_starts):
+        counts = fix_ends - fix_starts
+        fixations = np.empty(len(fix_starts), dtype=FIXATION_DTYPE)
+        fixations['start_index'] = fix_starts
+        fixations['end_index'] = fix_ends
+        fixations['start_time'] = t[fix_starts]
+        fixations['end_time'] = t[fix_ends - 1]
+        fixations['duration'] = fixations['end_time'] - fixations['start_time']
+        fixations['x'] = _run_reduce(np.add, x, fix_starts, fix_ends) / counts
+        fixations['y'] = _run_reduce(np.add, y, fix_starts, fix_ends) / counts
+        fixations['dispersion'] = dispersion
+    else:
+        fixations = np.empty(0, dtype=FIXATION_DTYPE)
+
+    # Saccades: runs of supra-threshold samples
+    sac_starts, sac_ends = _runs(valid & measured & saccade_sample)
+    saccades = np.empty(len(sac_starts), dtype=SACCADE_DTYPE)
+    if len(sac_starts):
+        onset = sac_starts
+        offset = sac_ends - 1
+        saccades['start_index'] = onset
+        saccades['end_index'] = sac_ends
+        saccades['start_time'] = t[onset]
+        saccades['end_time'] = t[offset]
+        saccades['duration'] = t[offset] - t[onset]
+        saccades['start_x'] = x[onset]
+        saccades['start_y'] = y[onset]
+        saccades['end_x'] = x[offset]
+        saccades['end_y'] = y[offset]
+        saccades['amplitude'] = pixels_to_degrees(np.hypot(x[offset] - x[onset], y[offset] - y[onset]),
+                                                  pix_per_cm, viewing_distance_cm)
+        saccades['peak_velocity'] = _run_reduce(np.maximum, velocity, sac_starts, sac_ends)
+    return fixations, saccades
+
+
+def detect_session_events(session, **kwargs):
+    """
+    Detect fixations and saccades over a whole converted session
+    (tobii_data.ColumnarSession), using the display geometry of its
+    initiation report. Keyword arguments are passed on to detect_events.
+    """
+    return detect_events(session['timestamp'], session['x'], session['y'], header=session.header, **kwargs)
+
+
+def main():
+    from tobii_data import load_study
+
+    parser = argparse.ArgumentParser(description="Detect fixations and saccades in converted Tobii sessions.")
+    parser.add_argument('studies', nargs='+', help="Converted study directories (see tobii_data.py, e.g. data/columnar/pilot_2)")
+    parser.add_argument('--save', action='store_true',
+                        help="Write fixations.npy and saccades.npy into each session directory")
+    args = parser.parse_args()
+
+    for study_dir in args.studies:
+        for subject, session in load_study(study_dir).items():
+            start = time.perf_counter()
+            fixations, saccades = detect_session_events(session)
+            elapsed = time.perf_counter() - start
+            if args.save:
+                np.save(os.path.join(session.session_dir, 'fixations.npy'), fixations)
+                np.save(os.path.join(session.session_dir, 'saccades.npy'), saccades)
+            mean_duration = fixations['duration'].mean() if len(fixations) else 0.0
+            print(f"{subject}: {len(session)} samples, {len(fixations)} fixations (mean {mean_duration:.0f} ms), "
+                  f"{len(saccades)} saccades in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,301 @@
+import argparse
+import csv
+import glob
+import os
+from collections import namedtuple
+
+# One step of a compiled order. assets maps a column to (kind, name, handle)
+# - handle is None until resolve_order binds it to a loaded stimulus;
+# durations maps a duration column to seconds; fields holds the remaining
+# non-empty columns (condition, positions, labels, ...) as strings, plus
+# "objects" (list of str) for boxTraining trials.
+PlannedTrial = namedtuple('PlannedTrial', ['trial_type', 'trial_id', 'block_id', 'assets', 'durations', 'fields'])
+
+# Stimulus columns of each trial type: column -> asset kind
+TRIAL_TYPES = {
+    'AG': {},
+    'boxTraining': {},
+    'training': {'leftImage': 'image', 'rightImage': 'image', 'label': 'sound', 'video': 'movie'},
+    'test': {'TargetImage': 'image', 'DistracterImage': 'image', 'Audio': 'sound'},
+    'activeTraining': {'leftStim': 'image', 'rightStim': 'image', 'leftAudio': 'sound', 'rightAudio': 'sound'},
+    'activeTest': {'leftStim': 'image', 'rightStim': 'image', 'leftAudio': 'sound', 'rightAudio': 'sound'},
+}
+
+# Attention-getter columns, used by rows with AG=1
+AG_COLUMNS = {'AGImage': 'image', 'AGVideo': 'movie', 'AGAudio': 'sound'}
+AG_TYPE_COLUMN = {'movie': 'AGVideo', 'image': 'AGImage'}
+
+# Columns holding durations in ms
+DURATION_COLUMNS = ['trialDuration', 'trialAudioDuration', 'trialStartSilence', 'trialEndSilence', 'AGTime']
+
+EXTENSIONS = {
+    'image': ['.png', '.jpg', '.jpeg', '.gif'],
+    'movie': ['.mp4'],
+    'sound': ['.wav', '.mp3'],
+}
+
+
+class OrderError(ValueError):
+    """An order file that cannot be run; ``problems`` lists every reason."""
+
+    def __init__(self, path, problems):
+        self.path = path
+        self.problems = list(problems)
+        super().__init__(f"{path}: " + "; ".join(self.problems))
+
+
+class AssetInventory:
+    """
+    The stimulus files an order can refer to, by kind and name (file name
+    without extension), as the experiment loads them.
+
+    Parameters:
+    -----------
+    assets : dict
+        {kind: {name: path}} for the kinds "image", "movie" and "sound"
+    """
+
+    def __init__(self, assets):
+        self.assets = {kind: dict(assets.get(kind, {})) for kind in EXTENSIONS}
+
+    @classmethod
+    def scan(cls, stimuli_root='stimuli'):
+        """
+        Index a stimuli/ directory: images/, movies/ (box videos), movies/AGStims/
+        (attention-getter videos, sounds and images) and every directory under sounds/.
+        """
+        directories = {
+            'image': [os.path.join(stimuli_root, 'images'), os.path.join(stimuli_root, 'movies', 'AGStims')],
+            'movie': [os.path.join(stimuli_root, 'movies'), os.path.join(stimuli_root, 'movies', 'AGStims')],
+            'sound': [os.path.join(stimuli_root, 'movies', 'AGStims')] +
+                     sorted(glob.glob(os.path.join(stimuli_root, 'sounds', '*', ''))),
+        }
+        assets = {}
+        for kind, dirs in directories.items():
+            found = assets.setdefault(kind, {})
+            for directory in dirs:
+                for extension in EXTENSIONS[kind]:
+                    for path in sorted(glob.glob(os.path.join(directory, '*' + extension))):
+                        found.setdefault(os.path.splitext(os.path.basename(path))[0], path)
+        return cls(assets)
+
+    @classmethod
+    def from_manifest(cls, manifest):
+        """Index the files of an asset_manifest.AssetManifest without touching the disk."""
+        assets = {}
+        for relative, entry in sorted(manifest.entries.items()):
+            name = os.path.splitext(os.path.basename(relative))[0]
+            assets.setdefault(entry['kind'], {}).setdefault(name, os.path.join(manifest.root, relative))
+        return cls(assets)
+
+    def has(self, kind, name):
+        return name in self.assets[kind]
+
+    def path(self, kind, name):
+        return self.assets[kind][name]
+
+
+def read_order(path):
+    """Read an order file into a list of row dicts (surrounding whitespace stripped, blank rows dropped)."""
+    with open(path, newline='') as f:
+        rows = []
+        for row in csv.DictReader(f):
+            row = {key.strip(): (value or '').strip() for key, value in row.items() if key}
+            if any(row.values()):
+                rows.append(row)
+    return rows
+
+
+def _parse_int(value, column, problems, where):
+    try:
+        return int(float(value))
+    except ValueError:
+        problems.append(f"{where}: {column} is not a number ({value!r})")
+        return None
+
+
+def compile_order(path, inventory, box_order=None, objects=None, supported_types=None):
+    """
+    Validate an order file against the stimulus inventory and compile it
+    into a flat trial plan.
+
+    Every referenced image, movie and sound must exist, durations must be
+    numbers and trial IDs unique. A row with AG=1 contributes an "AG" step
+    (before the row's own trial, unless the row is an AG row). All problems
+    are collected, so one run reports everything that needs fixing.
+
+    Parameters:
+    -----------
+    path : str
+        Order CSV file
+    inventory : AssetInventory
+        Available stimuli
+    box_order : list of str, optional
+        Box names; needed for boxTraining rows, whose optional "objects"
+        column ("ball-cat-dog-truck", one per box) must name existing box videos
+    objects : list of str, optional
+        Objects a box can show (default: any with a video)
+    supported_types : iterable of str, optional
+        Trial types the caller can run (default: all of TRIAL_TYPES)
+
+    Returns:
+    --------
+    list of PlannedTrial
+
+    Raises:
+    -------
+    OrderError
+        If anything in the file cannot be run
+    """
+    supported_types = set(supported_types or TRIAL_TYPES)
+    problems = []
+    plan = []
+    seen_ids = set()
+    try:
+        rows = read_order(path)
+    except OSError as e:
+        raise OrderError(path, [str(e)])
+    if not rows:
+        raise OrderError(path, ["no trials"])
+
+    for line, row in enumerate(rows, start=2):
+        where = f"line {line}"
+        trial_type = row.get('trialType', '')
+        if trial_type not in TRIAL_TYPES:
+            problems.append(f"{where}: unknown trialType {trial_type!r}")
+            continue
+        if trial_type not in supported_types:
+            problems.append(f"{where}: trialType {trial_type!r} is not supported here")
+            continue
+        trial_id = _parse_int(row.get('trialID', ''), 'trialID', problems, where)
+        if trial_id in seen_ids:
+            problems.append(f"{where}: duplicate trialID {trial_id}")
+        seen_ids.add(trial_id)
+        block_id = _parse_int(row['blockID'], 'blockID', problems, where) if row.get('blockID') else None
+
+        durations = {}
+        for column in DURATION_COLUMNS:
+            if row.get(column):
+                ms = _parse_int(row[column], column, problems, where)
+                if ms is not None:
+                    durations[column] = ms / 1000.0
+
+        # Attention-getter step
+        if row.get('AG') == '1' or trial_type == 'AG':
+            ag_type = row.get('AGType', '')
+            assets = {}
+            if ag_type not in AG_TYPE_COLUMN:
+                problems.append(f"{where}: unknown AGType {ag_type!r}")
+            elif not row.get(AG_TYPE_COLUMN[ag_type]):
+                problems.append(f"{where}: AGType {ag_type} without {AG_TYPE_COLUMN[ag_type]}")
+            for column, kind in AG_COLUMNS.items():
+                name = row.get(column)
+                if not name:
+                    continue
+                if not inventory.has(kind, name):
+                    problems.append(f"{where}: {column} {kind} {name!r} not found")
+                assets[column] = (kind, name, None)
+            ag_durations = {'AGTime': durations['AGTime']} if 'AGTime' in durations else {}
+            plan.append(PlannedTrial('AG', trial_id, block_id, assets, ag_durations, {'AGType': ag_type}))
+            if trial_type == 'AG':
+                continue
+
+        assets = {}
+        for column, kind in TRIAL_TYPES[trial_type].items():
+            name = row.get(column)
+            if not name:
+                problems.append(f"{where}: {column} is empty")
+            elif not inventory.has(kind, name):
+                problems.append(f"{where}: {column} {kind} {name!r} not found")
+            else:
+                assets[column] = (kind, name, None)
+
+        fields = {column: value for column, value in row.items()
+                  if value and column not in TRIAL_TYPES[trial_type] and column not in AG_COLUMNS
+                  and column not in DURATION_COLUMNS and column not in ('trialType', 'trialID', 'blockID', 'AG', 'AGType')}
+        if trial_type == 'boxTraining':
+            if box_order is None:
+                problems.append(f"{where}: boxTraining trials need the box order")
+            elif row.get('objects'):
+                trial_objects = row['objects'].split('-')
+                if len(trial_objects) != len(box_order) or len(set(trial_objects)) != len(trial_objects):
+                    problems.append(f"{where}: objects must name {len(box_order)} different objects")
+                for box, obj in zip(box_order, trial_objects):
+                    if (objects is not None and obj not in objects) or not inventory.has('movie', f"{box}_{obj}"):
+                        problems.append(f"{where}: no box video {box}_{obj}")
+                fields['objects'] = trial_objects
+            else:
+                fields['objects'] = None
+        plan.append(PlannedTrial(trial_type, trial_id, block_id, assets, durations, fields))
+
+    if problems:
+        raise OrderError(path, problems)
+    return plan
+
+
+def resolve_order(plan, handles):
+    """
+    Bind every asset of a compiled plan to its loaded stimulus.
+
+    Parameters:
+    -----------
+    plan : list of PlannedTrial
+    handles : dict
+        {kind: {name: loaded stimulus}}
+
+    Returns:
+    --------
+    list of PlannedTrial
+        The plan with each asset's handle filled in
+
+    Raises:
+    -------
+    OrderError
+        If an asset exists on disk but was not loaded
+    """
+    problems = []
+    resolved = []
+    for trial in plan:
+        assets = {}
+        for column, (kind, name, _) in trial.assets.items():
+            handle = handles.get(kind, {}).get(name)
+            if handle is None:
+                problems.append(f"trial {trial.trial_id}: {column} {kind} {name!r} is not loaded")
+            assets[column] = (kind, name, handle)
+        resolved.append(trial._replace(assets=assets))
+    if problems:
+        raise OrderError("order", problems)
+    return resolved
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate order files against the stimulus inventory.")
+    parser.add_argument('orders', nargs='*', help="Order CSV files or directories (default: every file under orders/)")
+    parser.add_argument('--stimuli', default='stimuli', help="Stimuli directory (default: stimuli)")
+    args = parser.parse_args()
+
+    inventory = AssetInventory.scan(args.stimuli)
+    box_order = ["cross", "stripes", "dot", "grid"]
+    paths = []
+    for target in args.orders or ['orders']:
+        if os.path.isdir(target):
+            paths.extend(sorted(glob.glob(os.path.join(target, '**', '*.csv'), recursive=True)))
+        else:
+            paths.append(target)
+
+    for path in paths:
+        try:
+            plan = compile_order(path, inventory, box_order)
+        except OrderError as e:
+            print(f"{path}: {len(e.problems)} problems")
+            for problem in e.problems:
+                print(f"    {problem}")
+            continue
+        counts = {}
+        for trial in plan:
+            counts[trial.trial_type] = counts.get(trial.trial_type, 0) + 1
+        print(f"{path}: OK, {len(plan)} steps ({', '.join(f'{n} {t}' for t, n in counts.items())})")
+
+
+if __name__ == '__main__':
+    main()
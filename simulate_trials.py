@@ -0,0 +1,114 @@
+import argparse
+import glob
+import os
+import time
+
+import numpy as np
+
+from chain_store import read_sequence_csv
+from tobii_data import EventIndex, read_tobii_tsv
+from trial_engine import default_box_aoi_index, plan_seeded_trial, scripted_gaze, simulate_trial
+
+OBJECTS = ["ball", "cat", "cookie", "cupcake", "dog", "truck"]
+
+# Example dwell script: look at two boxes, queue a third while the second plays, then look away
+DEMO_SCRIPT = [(None, 0.5), ("cross", 0.4), (None, 1.0), ("dot", 0.4), ("grid", 0.4),
+               (None, 3.0), ("stripes", 0.5), (None, 10.0)]
+
+
+def load_gaze_trace(path):
+    """
+    Load a gaze trace written by GazeRingBuffer.dump.
+
+    Yields:
+    -------
+    tuple (name, (timestamps, xs, ys, valid), start_time)
+    """
+    trace = np.load(path)
+    xs = trace['x'].astype('f8')
+    ys = trace['y'].astype('f8')
+    valid = ~(np.isnan(xs) | np.isnan(ys) | ((xs == -1) & (ys == -1)))
+    yield os.path.basename(path), (trace['timestamp'], xs, ys, valid), None
+
+
+def load_tsv_trials(path):
+    """
+    Split a pygaze/Tobii output file into its gaze-triggered trials.
+
+    Yields:
+    -------
+    tuple (name, (timestamps, xs, ys, valid), start_time)
+        One entry per trial, times converted from ms to seconds
+    """
+    _, samples, events = read_tobii_tsv(path)
+    event_index = EventIndex(samples['timestamp'], events)
+    for trial_num in event_index.trials("gaze_triggered"):
+        start, end = event_index.trial_range(trial_num)
+        trial = event_index.slice(samples, start, end)
+        xs = trial['x'].astype('f8')
+        ys = trial['y'].astype('f8')
+        gaze = (trial['timestamp'] / 1000.0, xs, ys, ~(np.isnan(xs) | np.isnan(ys)))
+        start_time = event_index.trial_events(trial_num)[0][1]
+        yield f"{os.path.basename(path)} trial {trial_num}", gaze, start_time / 1000.0
+
+
+def report(name, result, elapsed, summary_only=False):
+    print(f"{name}: {result.selection_count} selections, ended by {result.end_reason} "
+          f"after {result.end_time - result.start_time:.2f} s "
+          f"(simulated in {elapsed * 1000:.1f} ms)")
+    if summary_only:
+        return
+    for trial_event in result.events:
+        box = trial_event.box or ""
+        print(f"    {trial_event.time:10.3f}  {trial_event.kind:<9} {box:<8} "
+              f"selection={trial_event.selection_num} fixation={trial_event.fixation_duration:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay recorded or scripted gaze through the gaze-triggered trial logic without a display or eyetracker.")
+    parser.add_argument('traces', nargs='*',
+                        help="Gaze traces (.npy from data/gaze), Tobii output files (.tsv, one replay per "
+                             "gaze-triggered trial) or directories of them; a demo script is run if omitted")
+    parser.add_argument('--seed-box', default=None, help="Box that plays automatically at trial start (seeded trials)")
+    parser.add_argument('--parent-sequence', default=None,
+                        help="Parent sequence_<subj>.csv whose trials seed the replays in turn (overrides --seed-box)")
+    parser.add_argument('--seed-selections', type=int, default=None,
+                        help="Parent selections replayed per trial (default: all)")
+    parser.add_argument('--frame-rate', type=float, default=60.0, help="Simulated refresh rate in Hz")
+    parser.add_argument('--video-duration', type=float, default=1.5, help="Simulated video length in seconds")
+    parser.add_argument('--screen', type=int, nargs=2, default=(1920, 1080), help="Display size in pixels")
+    parser.add_argument('--summary', action='store_true', help="Print one line per trial instead of every event")
+    args = parser.parse_args()
+
+    aoi_index = default_box_aoi_index(tuple(args.screen))
+    paths = []
+    for trace in args.traces:
+        if os.path.isdir(trace):
+            paths.extend(sorted(glob.glob(os.path.join(trace, '*.npy')) + glob.glob(os.path.join(trace, '*.tsv'))))
+        else:
+            paths.append(trace)
+
+    if not paths:
+        trials = [("demo script", scripted_gaze(DEMO_SCRIPT, aoi_index), None)]
+    else:
+        trials = (trial for path in paths
+                  for trial in (load_tsv_trials(path) if path.endswith('.tsv') else load_gaze_trace(path)))
+
+    seed_trials = read_sequence_csv(args.parent_sequence) if args.parent_sequence else []
+    for i, (name, (timestamps, xs, ys, valid), start_time) in enumerate(trials):
+        schedule = None
+        if seed_trials:
+            plan = plan_seeded_trial(seed_trials[i % len(seed_trials)], aoi_index.names, OBJECTS, args.seed_selections)
+            schedule = plan.seeds
+        start = time.perf_counter()
+        # A parent sequence overrides --seed-box (the engine would let seed_box replace the schedule)
+        result = simulate_trial(timestamps, xs, ys, valid, aoi_index=aoi_index,
+                                seed_box=None if schedule is not None else args.seed_box,
+                                schedule=schedule, frame_rate=args.frame_rate,
+                                video_duration=args.video_duration, start_time=start_time)
+        report(name, result, time.perf_counter() - start, summary_only=args.summary)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,33 +1,219 @@
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
 import sys
-from psychopy import logging, prefs
-logging.console.setLevel(logging.DEBUG)  # get messages about the sound lib as it loads
+import tempfile
+import time
 
-from psychopy import sound, core
+import constants
+from asset_manifest import MEDIA_KINDS
 
-print('Using %s (with %s) for sounds' % (sound.audioLib, sound.audioDriver))
+SOUND_EXTENSIONS = tuple(ext for ext, kind in MEDIA_KINDS.items() if kind == 'sound')
+SOUND_DIRS = [os.path.join('stimuli', 'sounds'), os.path.join('stimuli', 'movies', 'AGStims')]
 
-highA = sound.Sound('A', octave=3, sampleRate=44100, secs=0.8, stereo=True)
-highA.setVolume(0.8)
-tick = sound.Sound(800, secs=0.01, sampleRate=44100, stereo=True)  # sample rate ignored because already set
-tock = sound.Sound('600', secs=0.01, sampleRate=44100, stereo=True)
 
-highA.play()
-core.wait(0.8)
-tick.play()
-core.wait(0.4)
-tock.play()
-core.wait(0.6)
+def sound_files(directories):
+    """Return every sound file under the given directories (recursively), sorted."""
+    files = []
+    for directory in directories:
+        for root, _, names in os.walk(directory):
+            files.extend(os.path.join(root, name) for name in names if name.lower().endswith(SOUND_EXTENSIONS))
+    return sorted(files)
 
-if sys.platform == 'win32':
-    ding = sound.Sound('ding')
-    ding.play()
 
-    core.wait(1)
+def _stats(values):
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return {}
+    return {
+        'n': len(values),
+        'median_ms': values[len(values) // 2] * 1000,
+        'p95_ms': values[min(len(values) - 1, int(round(0.95 * (len(values) - 1))))] * 1000,
+        'max_ms': values[-1] * 1000,
+    }
 
-    tada = sound.Sound('tada.wav')
-    tada.play()
 
-    core.wait(2)
-print('done')
+def benchmark_backend(backend, files, sample_rate, buffer_size, repeats=5, volume=0.0, null_device=False):
+    """
+    Measure one audio backend in this process (a backend can only be selected
+    once per process, see run_benchmark).
 
-core.quit()
\ No newline at end of file
+    Parameters:
+    -----------
+    backend : str
+        Value for prefs.hardware['audioLib'] ("ptb" or "pyo")
+    files : list of str
+        Sound files to load and play
+    sample_rate : int
+        Stream sample rate in Hz
+    buffer_size : int
+        Stream block size in samples (ptb)
+    repeats : int
+        Play calls per file (default: 5)
+    volume : float
+        Playback volume (default: 0, silent)
+    null_device : bool
+        Play into a null device (ALSA "null" for ptb, pyo's offline driver)
+
+    Returns:
+    --------
+    dict
+        Backend, driver, stream-open cost and per-file creation and play timings
+    """
+    from psychopy import prefs
+    prefs.hardware['audioLib'] = [backend]
+    if null_device:
+        if backend == 'ptb':
+            prefs.hardware['audioDevice'] = 'null'
+        elif backend == 'pyo':
+            prefs.hardware['audioDriver'] = ['offline_nb']
+
+    start = time.perf_counter()
+    from psychopy import sound, core
+    from audio_scheduler import sound_start_time
+    result = {'backend': sound.audioLib, 'driver': str(sound.audioDriver),
+              'sample_rate': sample_rate, 'buffer_size': buffer_size, 'null_device': null_device,
+              'init_s': time.perf_counter() - start}
+    if sound.audioLib != backend:
+        raise RuntimeError(f"{backend} is not available (psychopy fell back to {sound.audioLib})")
+
+    options = {'sampleRate': sample_rate, 'stereo': True}
+    if backend == 'ptb':
+        options['blockSize'] = buffer_size
+
+    # The first sound opens the output stream
+    start = time.perf_counter()
+    tone = sound.Sound(440, secs=0.05, volume=volume, **options)
+    result['stream_open_s'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    tone.play()
+    result['first_play_call_s'] = time.perf_counter() - start
+    core.wait(0.1)
+    tone.stop()
+
+    result['files'] = []
+    for path in files:
+        entry = {'file': path.replace(os.sep, '/')}
+        try:
+            start = time.perf_counter()
+            snd = sound.Sound(path, volume=volume, **options)
+            entry['create_s'] = time.perf_counter() - start
+        except Exception as e:
+            entry['error'] = str(e)
+            result['files'].append(entry)
+            continue
+        play_calls, output_latencies = [], []
+        for _ in range(repeats):
+            called = core.getTime()
+            start = time.perf_counter()
+            snd.play()
+            play_calls.append(time.perf_counter() - start)
+            core.wait(0.05)
+            started = sound_start_time(snd)
+            output_latencies.append(started - called if started is not None else None)
+            snd.stop()
+        entry['play_call'] = _stats(play_calls)
+        entry['output_latency'] = _stats(output_latencies)
+        result['files'].append(entry)
+
+    loaded = [entry for entry in result['files'] if 'error' not in entry]
+    result['summary'] = {
+        'n_files': len(result['files']),
+        'n_failed': len(result['files']) - len(loaded),
+        'create': _stats([entry['create_s'] for entry in loaded]),
+        'play_call_median': _stats([entry['play_call']['median_ms'] / 1000 for entry in loaded]),
+        'output_latency_median': _stats([entry['output_latency']['median_ms'] / 1000 for entry in loaded
+                                         if entry['output_latency']]),
+    }
+    return result
+
+
+def run_benchmark(backends, files, sample_rates, buffer_sizes, repeats=5, volume=0.0, null_device=False):
+    """
+    Benchmark every backend at every sample rate and buffer size, each in a
+    fresh process so the backend and stream are opened from cold.
+
+    Returns:
+    --------
+    list of dict
+        One benchmark_backend result per run, or {'backend', ..., 'error'} if the run failed
+    """
+    results = []
+    for backend in backends:
+        for sample_rate in sample_rates:
+            for buffer_size in buffer_sizes:
+                with tempfile.TemporaryDirectory() as temp_dir:
+                    result_path = os.path.join(temp_dir, 'result.json')
+                    command = [sys.executable, os.path.abspath(__file__), '--worker', result_path,
+                               '--backends', backend, '--sample-rates', str(sample_rate),
+                               '--buffer-sizes', str(buffer_size), '--repeats', str(repeats),
+                               '--volume', str(volume), '--files', *files]
+                    if null_device:
+                        command.append('--null')
+                    run = subprocess.run(command, capture_output=True, text=True)
+                    if run.returncode == 0 and os.path.exists(result_path):
+                        with open(result_path) as f:
+                            results.append(json.load(f))
+                    else:
+                        error = (run.stderr.strip().splitlines() or ['no output'])[-1]
+                        results.append({'backend': backend, 'sample_rate': sample_rate,
+                                        'buffer_size': buffer_size, 'error': error})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark sound creation, stream opening and play latency for each audio backend.")
+    parser.add_argument('--backends', nargs='+', default=['ptb', 'pyo'], help="Audio backends (default: ptb pyo)")
+    parser.add_argument('--sample-rates', nargs='+', type=int, default=[constants.SOUNDSAMPLINGFREQUENCY],
+                        help="Stream sample rates in Hz (default: SOUNDSAMPLINGFREQUENCY)")
+    parser.add_argument('--buffer-sizes', nargs='+', type=int, default=[constants.SOUNDBUFFERSIZE],
+                        help="Stream buffer sizes in samples (default: SOUNDBUFFERSIZE)")
+    parser.add_argument('--repeats', type=int, default=5, help="Play calls per file (default: 5)")
+    parser.add_argument('--volume', type=float, default=0.0, help="Playback volume (default: 0, silent)")
+    parser.add_argument('--null', action='store_true', help="Play into a null audio device (headless machines)")
+    parser.add_argument('--files', nargs='+', help="Sound files (default: everything under stimuli/sounds and AGStims)")
+    parser.add_argument('--out', default=os.path.join('data', 'analysis', f"audio_benchmark_{socket.gethostname()}.json"),
+                        help="Results file (default: data/analysis/audio_benchmark_<host>.json)")
+    parser.add_argument('--worker', metavar='RESULT', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    files = args.files or sound_files(SOUND_DIRS)
+    if args.worker:
+        result = benchmark_backend(args.backends[0], files, args.sample_rates[0], args.buffer_sizes[0],
+                                   args.repeats, args.volume, args.null)
+        with open(args.worker, 'w') as f:
+            json.dump(result, f)
+        return
+
+    start = time.perf_counter()
+    runs = run_benchmark(args.backends, files, args.sample_rates, args.buffer_sizes, args.repeats, args.volume,
+                         args.null)
+    directory = os.path.dirname(args.out)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(args.out, 'w') as f:
+        json.dump({'host': socket.gethostname(), 'platform': platform.platform(), 'python': platform.python_version(),
+                   'created_at': time.time(), 'n_files': len(files), 'runs': runs}, f, indent=1)
+
+    for run in runs:
+        label = f"{run['backend']} {run['sample_rate']} Hz / {run['buffer_size']}"
+        if 'error' in run:
+            print(f"{label}: failed ({run['error']})")
+            continue
+        summary = run['summary']
+        latency = summary['output_latency_median'].get('median_ms')
+        print(f"{label} ({run['driver']}): init {run['init_s'] * 1000:.0f} ms, stream open {run['stream_open_s'] * 1000:.1f} ms, "
+              f"create median {summary['create'].get('median_ms', 0):.1f} ms, "
+              f"play call median {summary['play_call_median'].get('median_ms', 0):.2f} ms, "
+              f"output latency median {'n/a' if latency is None else f'{latency:.1f} ms'}, "
+              f"{summary['n_failed']}/{summary['n_files']} files failed")
+    print(f"{len(runs)} runs over {len(files)} files in {time.perf_counter() - start:.1f} s -> {args.out}")
+
+
+if __name__ == '__main__':
+    main()
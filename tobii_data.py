@@ -0,0 +1,606 @@
+import argparse
+import glob
+import json
+import os
+import re
+import time
+from itertools import islice
+
+import numpy as np
+
+
+# Columns of a pygaze/Tobii output file (after the initiation report header)
+TOBII_COLUMNS = [
+    'TimeStamp', 'Event',
+    'GazePointXLeft', 'GazePointYLeft', 'ValidityLeft',
+    'GazePointXRight', 'GazePointYRight', 'ValidityRight',
+    'GazePointX', 'GazePointY',
+    'PupilSizeLeft', 'PupilValidityLeft', 'PupilSizeRight', 'PupilValidityRight',
+]
+
+# One gaze sample; timestamps stay in the file's units (milliseconds)
+SAMPLE_DTYPE = np.dtype([
+    ('timestamp', 'f8'),
+    ('left_x', 'f4'), ('left_y', 'f4'), ('left_validity', 'u1'),
+    ('right_x', 'f4'), ('right_y', 'f4'), ('right_validity', 'u1'),
+    ('x', 'f4'), ('y', 'f4'),
+    ('left_pupil', 'f4'), ('left_pupil_validity', 'u1'),
+    ('right_pupil', 'f4'), ('right_pupil_validity', 'u1'),
+])
+
+# TSV column index of every SAMPLE_DTYPE field (the Event column is skipped)
+SAMPLE_COLUMNS = (0, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13)
+
+# Float fields where pygaze writes -1 for a missing value
+MISSING_FIELDS = ('left_x', 'left_y', 'right_x', 'right_y', 'x', 'y', 'left_pupil', 'right_pupil')
+MISSING_VALUE = -1
+
+REPORT_START = 'pygaze initiation report start'
+REPORT_END = 'pygaze initiation report end'
+
+
+def parse_report_header(lines):
+    """
+    Parse the pygaze initiation report at the top of a Tobii output file.
+
+    Parameters:
+    -----------
+    lines : list of str
+        Report lines (between the start and end markers)
+
+    Returns:
+    --------
+    dict
+        display_resolution (w, h) in pixels, display_size_cm (w, h),
+        fixation_threshold (degrees), speed_threshold (degrees/second) and
+        acceleration_threshold (degrees/second**2), for whichever are present
+    """
+    header = {}
+    for line in lines:
+        key, sep, value = line.partition(':')
+        if not sep:
+            continue
+        key = key.strip()
+        value = value.strip()
+        if key == 'display resolution':
+            header['display_resolution'] = tuple(int(v) for v in value.split('x'))
+        elif key == 'display size in cm':
+            header['display_size_cm'] = tuple(float(v) for v in value.split('x'))
+        elif key.endswith('threshold'):
+            header[key.replace(' ', '_')] = float(value.split()[0])
+    return header
+
+
+class TobiiTSVReader:
+    """
+    Streaming reader for pygaze/Tobii ``*_TOBII_output.tsv`` files.
+
+    The initiation report header and column line are parsed when the reader
+    is opened. ``chunks`` then walks the rest of the file without loading it
+    whole, yielding gaze samples as fixed-size NumPy structured arrays
+    (SAMPLE_DTYPE) together with the event messages read while filling each
+    chunk, so memory stays bounded by ``chunk_size`` whatever the file size.
+
+    Event rows (a timestamp and a message such as
+    ``training_trial1_trial_start``) never appear in the sample arrays, and
+    the ``-1`` missing-value sentinel in coordinate and pupil columns is
+    replaced by NaN unless ``missing_as_nan`` is False. Validity codes are
+    kept as they are. Malformed lines (e.g. NUL padding left by an
+    interrupted write) and stale sample rows whose timestamp goes back in
+    time are skipped and counted in ``skipped_lines``, so sample timestamps
+    are always sorted.
+
+    Parameters:
+    -----------
+    path : str
+        Path to the TSV file
+    chunk_size : int
+        Number of gaze samples per chunk (default: 65536)
+    missing_as_nan : bool
+        Replace -1 in coordinate and pupil columns by NaN (default: True)
+    """
+
+    SAMPLE = "sample"
+    EVENT = "event"
+
+    def __init__(self, path, chunk_size=65536, missing_as_nan=True):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.missing_as_nan = missing_as_nan
+        self.header = {}
+        self.columns = []
+        self.skipped_lines = 0  # malformed lines (e.g. NUL padding left by an interrupted write)
+        self._last_timestamp = float('-inf')
+        self._file = open(path, 'r', newline='')
+        self._read_header()
+
+    def _read_header(self):
+        line = self._file.readline()
+        if line.strip() == REPORT_START:
+            report = []
+            for line in self._file:
+                if line.strip() == REPORT_END:
+                    break
+                report.append(line)
+            self.header = parse_report_header(report)
+            line = self._file.readline()
+        self.columns = line.rstrip('\r\n').split('\t')
+        if self.columns[:2] != TOBII_COLUMNS[:2]:
+            raise ValueError(f"{self.path} is not a pygaze/Tobii output file (columns: {self.columns[:2]})")
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _classify(self, line):
+        # Sample rows have an empty Event column; event rows are "timestamp<TAB>message"
+        if line[:1] == '\x00':
+            line = line.lstrip('\x00')
+        timestamp, _, rest = line.partition('\t')
+        if rest[:1] == '\t':
+            if line.count('\t') == len(TOBII_COLUMNS) - 1:
+                return self.SAMPLE, line
+        elif rest.strip() and '\t' not in rest:
+            try:
+                return self.EVENT, (float(timestamp), rest.rstrip('\r\n'))
+            except ValueError:
+                pass
+        elif not line.strip():
+            return None, None
+        self.skipped_lines += 1
+        return None, None
+
+    def _to_samples(self, lines):
+        if not lines:
+            return np.empty(0, dtype=SAMPLE_DTYPE)
+        samples = np.loadtxt(lines, dtype=SAMPLE_DTYPE, delimiter='\t', usecols=SAMPLE_COLUMNS, ndmin=1)
+        # Drop stale rows that jump back in time, so sample timestamps are always sorted
+        timestamps = samples['timestamp']
+        running_max = np.maximum.accumulate(np.concatenate(([self._last_timestamp], timestamps)))[:-1]
+        in_order = timestamps >= running_max
+        if not in_order.all():
+            self.skipped_lines += int((~in_order).sum())
+            samples = samples[in_order]
+        if len(samples):
+            self._last_timestamp = max(self._last_timestamp, float(samples['timestamp'][-1]))
+        if self.missing_as_nan:
+            for field in MISSING_FIELDS:
+                column = samples[field]
+                column[column == MISSING_VALUE] = np.nan
+        return samples
+
+    def chunks(self):
+        """
+        Stream the file.
+
+        Yields:
+        -------
+        tuple (samples, events)
+            samples: structured array of up to chunk_size gaze samples
+            (SAMPLE_DTYPE); events: list of (timestamp, message) read while
+            filling the chunk
+        """
+        sample_lines = []
+        events = []
+        while True:
+            block = list(islice(self._file, self.chunk_size))
+            if not block:
+                break
+            for line in block:
+                kind, value = self._classify(line)
+                if kind == self.SAMPLE:
+                    sample_lines.append(value)
+                elif kind == self.EVENT:
+                    events.append(value)
+            # Emit full chunks; the remainder waits for the next block
+            while len(sample_lines) >= self.chunk_size:
+                yield self._to_samples(sample_lines[:self.chunk_size]), events
+                sample_lines = sample_lines[self.chunk_size:]
+                events = []
+        if sample_lines or events:
+            yield self._to_samples(sample_lines), events
+
+    def __iter__(self):
+        return self.chunks()
+
+
+def read_events(path):
+    """
+    Return the event messages of a Tobii output file as a list of
+    (timestamp, message) without converting any gaze samples.
+    """
+    events = []
+    with TobiiTSVReader(path) as reader:
+        for line in reader._file:
+            # Only event rows need parsing; sample rows are recognised by their empty Event column
+            if '\t\t' in line[:32]:
+                continue
+            kind, value = reader._classify(line)
+            if kind == reader.EVENT:
+                events.append(value)
+    return events
+
+
+def read_tobii_tsv(path, chunk_size=65536, missing_as_nan=True):
+    """
+    Read a whole Tobii output file.
+
+    Returns:
+    --------
+    tuple (header, samples, events)
+        The initiation report, all gaze samples (SAMPLE_DTYPE) and the list
+        of (timestamp, message) events
+    """
+    sample_chunks = []
+    events = []
+    with TobiiTSVReader(path, chunk_size, missing_as_nan) as reader:
+        for samples, chunk_events in reader.chunks():
+            sample_chunks.append(samples)
+            events.extend(chunk_events)
+        header = reader.header
+    samples = np.concatenate(sample_chunks) if sample_chunks else np.empty(0, dtype=SAMPLE_DTYPE)
+    return header, samples, events
+
+
+# Logged messages look like <phase>_trial<N>_<event>, e.g. gaze_triggered_trial3_trial_start
+TRIAL_MESSAGE = re.compile(r'^(?P<phase>.+?)_trial(?P<trial>\d+)_(?P<event>.+)$')
+
+
+class EventIndex:
+    """
+    Sorted index from logged event messages to gaze sample offsets.
+
+    Built once per session: every message timestamp is located in the
+    (sorted) sample timestamps by binary search, and messages of the form
+    ``<phase>_trial<N>_<event>`` are grouped per trial. Looking up the
+    samples of a trial, or of one selection within it, is then a dictionary
+    lookup plus O(log n) search, and ``slice`` returns views of the sample
+    arrays (or memory maps) without copying.
+
+    Parameters:
+    -----------
+    sample_timestamps : numpy.ndarray
+        Sorted sample timestamps (e.g. ColumnarSession['timestamp'] or samples['timestamp'])
+    messages : structured array or list of (timestamp, message)
+        The session's event messages
+    """
+
+    def __init__(self, sample_timestamps, messages):
+        self.sample_timestamps = sample_timestamps
+        if isinstance(messages, np.ndarray):
+            times = messages['timestamp'].astype('f8')
+            texts = messages['message'].tolist()
+        else:
+            times = np.array([timestamp for timestamp, _ in messages], dtype='f8')
+            texts = [message for _, message in messages]
+
+        order = np.argsort(times, kind='stable')
+        self.event_times = times[order]
+        self.event_messages = [texts[i] for i in order]
+        # First sample at or after each event
+        self.event_offsets = np.searchsorted(sample_timestamps, self.event_times, side='left')
+
+        self._trials = {}  # {(phase, trial_num): [(event, position), ...]} in time order
+        for position, message in enumerate(self.event_messages):
+            match = TRIAL_MESSAGE.match(message)
+            if match is not None:
+                key = (match.group('phase'), int(match.group('trial')))
+                self._trials.setdefault(key, []).append((match.group('event'), position))
+
+    def __len__(self):
+        return len(self.event_times)
+
+    def offset(self, timestamp):
+        """Return the offset of the first sample at or after a timestamp."""
+        return int(np.searchsorted(self.sample_timestamps, timestamp, side='left'))
+
+    def sample_range(self, start_time, end_time):
+        """Return the (start, end) sample offsets of the half-open interval [start_time, end_time)."""
+        start, end = np.searchsorted(self.sample_timestamps, [start_time, end_time], side='left')
+        return int(start), int(end)
+
+    def trials(self, phase="gaze_triggered"):
+        """Return the sorted trial numbers with messages in a phase."""
+        return sorted(trial for (trial_phase, trial) in self._trials if trial_phase == phase)
+
+    def trial_events(self, trial_num, phase="gaze_triggered"):
+        """
+        Return the messages of one trial.
+
+        Returns:
+        --------
+        list of (event, timestamp, sample_offset)
+            event is the message without its "<phase>_trial<N>_" prefix
+        """
+        return [(event, float(self.event_times[position]), int(self.event_offsets[position]))
+                for event, position in self._trials.get((phase, trial_num), [])]
+
+    def trial_range(self, trial_num, phase="gaze_triggered"):
+        """
+        Return the (start, end) sample offsets of a trial, from its trial_start
+        to its trial_end message (or its first to last message if those are missing).
+
+        Raises:
+        -------
+        KeyError
+            If the trial has no messages
+        """
+        events = self._trials.get((phase, trial_num))
+        if not events:
+            raise KeyError(f"No messages for {phase} trial {trial_num}")
+        positions = dict(events)
+        start = positions.get('trial_start', events[0][1])
+        end = positions.get('trial_end', events[-1][1])
+        return int(self.event_offsets[start]), int(self.event_offsets[end])
+
+    def selection_range(self, trial_num, selection_num, phase="gaze_triggered"):
+        """
+        Return the (start, end) sample offsets from executed selection
+        ``selection_num`` (1-based) to the next one, or to the trial end for
+        the last selection. Queued selections are not counted.
+
+        Raises:
+        -------
+        KeyError
+            If the trial has fewer selections
+        """
+        events = self._trials.get((phase, trial_num), [])
+        selections = [position for event, position in events if event.startswith('selection_')]
+        if not 1 <= selection_num <= len(selections):
+            raise KeyError(f"{phase} trial {trial_num} has no selection {selection_num}")
+        start = int(self.event_offsets[selections[selection_num - 1]])
+        if selection_num < len(selections):
+            end = int(self.event_offsets[selections[selection_num]])
+        else:
+            end = self.trial_range(trial_num, phase)[1]
+        return start, end
+
+    @staticmethod
+    def slice(samples, start, end):
+        """
+        Return samples [start, end) without copying.
+
+        Parameters:
+        -----------
+        samples : structured array or ColumnarSession
+            Sample data the index was built for
+
+        Returns:
+        --------
+        structured array view, or dict {field: memmap view} for a ColumnarSession
+        """
+        if isinstance(samples, ColumnarSession):
+            return samples.slice(start, end)
+        return samples[start:end]
+
+
+# Columnar session format: one raw little-endian binary file per SAMPLE_DTYPE
+# field (<field>.bin), the event messages in messages.npy and a session.json
+# with the sample count, dtypes, initiation report and source file details.
+SESSION_META = 'session.json'
+MESSAGES_FILE = 'messages.npy'
+MANIFEST_FILE = 'manifest.json'
+
+
+def subject_from_path(tsv_path):
+    """Return the subject code of a ``<subj>_TOBII_output.tsv`` file."""
+    name = os.path.basename(tsv_path)
+    return name.split('_TOBII_output')[0].rstrip('_')
+
+
+def convert_session(tsv_path, session_dir, chunk_size=65536):
+    """
+    Convert one Tobii output file to the columnar session format.
+
+    The TSV is streamed chunk by chunk, appending each field to its own
+    binary column file, so memory stays bounded whatever the file size.
+
+    Parameters:
+    -----------
+    tsv_path : str
+        Path to the *_TOBII_output.tsv file
+    session_dir : str
+        Directory the columns are written to (created if needed)
+    chunk_size : int
+        Samples converted per chunk (default: 65536)
+
+    Returns:
+    --------
+    dict
+        The session metadata written to session.json
+    """
+    os.makedirs(session_dir, exist_ok=True)
+    column_files = {field: open(os.path.join(session_dir, f"{field}.bin"), 'wb') for field in SAMPLE_DTYPE.names}
+    n_samples = 0
+    events = []
+    try:
+        with TobiiTSVReader(tsv_path, chunk_size) as reader:
+            for samples, chunk_events in reader.chunks():
+                for field, column_file in column_files.items():
+                    column_file.write(np.ascontiguousarray(samples[field], dtype=SAMPLE_DTYPE[field].newbyteorder('<')).tobytes())
+                n_samples += len(samples)
+                events.extend(chunk_events)
+            header = reader.header
+            skipped_lines = reader.skipped_lines
+    finally:
+        for column_file in column_files.values():
+            column_file.close()
+
+    message_length = max((len(message) for _, message in events), default=1)
+    messages = np.array(events, dtype=[('timestamp', 'f8'), ('message', f'U{message_length}')])
+    np.save(os.path.join(session_dir, MESSAGES_FILE), messages)
+
+    stat = os.stat(tsv_path)
+    meta = {
+        'subject': subject_from_path(tsv_path),
+        'source': os.path.abspath(tsv_path),
+        'source_size': stat.st_size,
+        'source_mtime': stat.st_mtime,
+        'n_samples': n_samples,
+        'n_messages': len(events),
+        'skipped_lines': skipped_lines,
+        'columns': {field: SAMPLE_DTYPE[field].newbyteorder('<').str for field in SAMPLE_DTYPE.names},
+        'header': header,
+    }
+    with open(os.path.join(session_dir, SESSION_META), 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+class ColumnarSession:
+    """
+    A converted session, opened without copying any sample data.
+
+    Every column is a read-only ``np.memmap`` over its binary file, so opening
+    a session only reads session.json and the (small) message table; sample
+    pages are read from disk when they are first touched.
+
+    Parameters:
+    -----------
+    session_dir : str
+        Directory written by convert_session
+    """
+
+    def __init__(self, session_dir):
+        self.session_dir = session_dir
+        with open(os.path.join(session_dir, SESSION_META)) as f:
+            self.meta = json.load(f)
+        self.subject = self.meta['subject']
+        self.header = self.meta['header']
+        self.n_samples = self.meta['n_samples']
+        self.messages = np.load(os.path.join(session_dir, MESSAGES_FILE))
+        self._columns = {}
+        self._event_index = None
+
+    def __len__(self):
+        return self.n_samples
+
+    @property
+    def columns(self):
+        return list(self.meta['columns'])
+
+    def event_index(self):
+        """Return the session's EventIndex (built on first use)."""
+        if self._event_index is None:
+            self._event_index = EventIndex(self['timestamp'], self.messages)
+        return self._event_index
+
+    def slice(self, start, end, fields=None):
+        """Return {field: column[start:end]} views of the memory maps (no copy)."""
+        return {field: self[field][start:end] for field in (fields or self.columns)}
+
+    def __getitem__(self, field):
+        """Return a column as a read-only memory map."""
+        column = self._columns.get(field)
+        if column is None:
+            dtype = np.dtype(self.meta['columns'][field])
+            path = os.path.join(self.session_dir, f"{field}.bin")
+            if self.n_samples == 0:
+                column = np.empty(0, dtype=dtype)
+            else:
+                column = np.memmap(path, dtype=dtype, mode='r', shape=(self.n_samples,))
+            self._columns[field] = column
+        return column
+
+
+def convert_study(study_dir, out_dir, force=False, logger=None):
+    """
+    Convert every Tobii output file of a study and write its manifest.
+
+    Sessions whose source file has the same size and modification time as
+    recorded in the existing manifest are not converted again.
+
+    Parameters:
+    -----------
+    study_dir : str
+        Directory containing *_TOBII_output.tsv files (e.g. eyetrackingData/pilot_2)
+    out_dir : str
+        Directory for the converted sessions and manifest.json
+    force : bool
+        Convert every session even if it is up to date (default: False)
+    logger : logging.Logger, optional
+        Logger for progress messages
+
+    Returns:
+    --------
+    dict
+        The manifest
+    """
+    manifest_path = os.path.join(out_dir, MANIFEST_FILE)
+    previous = {}
+    if os.path.exists(manifest_path) and not force:
+        with open(manifest_path) as f:
+            previous = {entry['subject']: entry for entry in json.load(f)['sessions']}
+
+    sessions = []
+    for tsv_path in sorted(glob.glob(os.path.join(study_dir, '*_TOBII_output.tsv'))):
+        subject = subject_from_path(tsv_path)
+        session_dir = os.path.join(out_dir, subject)
+        stat = os.stat(tsv_path)
+        entry = previous.get(subject)
+        if (entry is not None and entry['source_size'] == stat.st_size and entry['source_mtime'] == stat.st_mtime
+                and os.path.exists(os.path.join(session_dir, SESSION_META))):
+            sessions.append(entry)
+            continue
+
+        start = time.perf_counter()
+        meta = convert_session(tsv_path, session_dir)
+        if logger is not None:
+            logger.info(f"Converted {subject}: {meta['n_samples']} samples in {time.perf_counter() - start:.2f} s")
+        sessions.append({
+            'subject': subject,
+            'path': subject,
+            'source_size': meta['source_size'],
+            'source_mtime': meta['source_mtime'],
+            'n_samples': meta['n_samples'],
+            'n_messages': meta['n_messages'],
+        })
+
+    manifest = {
+        'study': os.path.basename(os.path.normpath(study_dir)),
+        'source_dir': os.path.abspath(study_dir),
+        'sessions': sessions,
+    }
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_study(out_dir):
+    """
+    Open every converted session of a study listed in its manifest.
+
+    Returns:
+    --------
+    dict
+        {subject: ColumnarSession}
+    """
+    with open(os.path.join(out_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    return {entry['subject']: ColumnarSession(os.path.join(out_dir, entry['path'])) for entry in manifest['sessions']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert pygaze/Tobii TSV output to the columnar session format.")
+    parser.add_argument('studies', nargs='+', help="Study directories (e.g. eyetrackingData/pilot_1)")
+    parser.add_argument('--out', default=os.path.join('data', 'columnar'),
+                        help="Output root; each study gets its own subdirectory (default: data/columnar)")
+    parser.add_argument('--force', action='store_true', help="Convert sessions even if they are up to date")
+    args = parser.parse_args()
+
+    for study_dir in args.studies:
+        start = time.perf_counter()
+        out_dir = os.path.join(args.out, os.path.basename(os.path.normpath(study_dir)))
+        manifest = convert_study(study_dir, out_dir, force=args.force)
+        n_samples = sum(entry['n_samples'] for entry in manifest['sessions'])
+        print(f"{manifest['study']}: {len(manifest['sessions'])} sessions, {n_samples} samples "
+              f"-> {out_dir} ({time.perf_counter() - start:.2f} s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,596 @@
+import random
+from collections import namedtuple
+
+import numpy as np
+
+from gaze import AOIIndex, FixationTracker
+
+
+# An engine output. kind is one of the GazeTriggeredTrialEngine event kinds;
+# selection_num is the selection number the event refers to (0 if none).
+TrialEvent = namedtuple('TrialEvent', ['kind', 'box', 'time', 'fixation_duration', 'selection_num', 'reason'])
+
+# Result of a headless simulated trial
+TrialResult = namedtuple('TrialResult', ['selection_count', 'end_reason', 'start_time', 'end_time', 'events'])
+
+# Everything a gaze-triggered trial needs decided before it starts: one object
+# per box (in box order), the seed selections as (onset in seconds from trial
+# start, box), and the parent trial number they were taken from (None if unseeded)
+TrialSchedule = namedtuple('TrialSchedule', ['objects', 'seeds', 'source_trial'])
+
+
+class GazeTriggeredTrialEngine:
+    """
+    Pure state machine for a gaze-triggered trial: fixation-triggered
+    selections, N+1 queueing while a video plays, cooldowns and timeouts.
+
+    The engine never reads a clock, draws, logs or plays anything. The caller
+    feeds it gaze samples (``add_sample``) and advances it once per frame with
+    the current time and whether the active video just finished (``step``);
+    the engine returns TrialEvents that the caller turns into side effects
+    (logging the selection, starting a video, ...). The same engine therefore
+    drives the live trial loop in experiment.py and headless replays of
+    scripted or recorded gaze (see ``simulate_trial``).
+
+    Event kinds:
+        SELECT    - box selected by fixation (or a scheduled seed); start its video now
+        QUEUE     - box fixated while a video plays; becomes the next selection
+        PROMOTE   - queued box becomes the active selection; start its video now
+        COMPLETE  - the active video finished
+        END       - the trial is over (reason says why)
+        DISCARD   - a queued selection was never shown (emitted by ``finish``)
+
+    Parameters:
+    -----------
+    boxes : list of str
+        Box names in box_order
+    required_fixation : float
+        Dwell time in seconds that selects a box (default: 0.25)
+    max_trial_time : float
+        Maximum trial duration in seconds (default: 20)
+    selection_timeout : float
+        Maximum time in seconds between selections (default: 7)
+    initial_selection_timeout : float
+        Maximum time in seconds to wait for the first infant selection (default: 5)
+    cooldown : float
+        Seconds before the same box can be selected again (default: 5.0)
+    max_selections : int
+        Selections that complete the trial (default: 4)
+    dropout_tolerance : float
+        Track-loss gap in seconds that does not reset a dwell (default: 0.1)
+    frame_tolerance : float
+        A scheduled seed selection fires on the first step whose time is within
+        this many seconds of its onset; half a frame period puts it on the
+        frame nearest the onset (default: 0.0)
+    """
+    SELECT = "select"
+    QUEUE = "queue"
+    PROMOTE = "promote"
+    COMPLETE = "complete"
+    END = "end"
+    DISCARD = "discard"
+
+    def __init__(self, boxes, required_fixation=0.25, max_trial_time=20, selection_timeout=7,
+                 initial_selection_timeout=5, cooldown=5.0, max_selections=4, dropout_tolerance=0.1,
+                 frame_tolerance=0.0):
+        self.boxes = list(boxes)
+        self.required_fixation = required_fixation
+        self.max_trial_time = max_trial_time
+        self.selection_timeout = selection_timeout
+        self.initial_selection_timeout = initial_selection_timeout
+        self.cooldown = cooldown
+        self.max_selections = max_selections
+        self.frame_tolerance = frame_tolerance
+        self.fixation_tracker = FixationTracker(self.boxes, dropout_tolerance)
+
+        self.trial_start_time = None
+        self.selection_count = 0
+        self.seeded = False
+        # Seed selections as absolute (onset, box), and the next one to play
+        self.schedule = []
+        self.next_scheduled = 0
+        self.last_selection_time = None
+        # -inf means "never triggered", so the cooldown holds whatever the clock's origin
+        self.last_triggered = {box: float('-inf') for box in self.boxes}
+        self.active_box = None
+        self.queued_box = None
+        self.ended = False
+        self.end_reason = None
+        self._new_samples = False
+
+    def _event(self, kind, box=None, time=0.0, fixation_duration=0.0, selection_num=0, reason=None):
+        return TrialEvent(kind, box, time, fixation_duration, selection_num, reason)
+
+    def start(self, current_time, seed_box=None, schedule=None):
+        """
+        Start the trial.
+
+        Parameters:
+        -----------
+        current_time : float
+            Trial start time in seconds
+        seed_box : str, optional
+            Box that is selected automatically at trial start (seeded trials);
+            shorthand for ``schedule=[(0.0, seed_box)]``
+        schedule : list of (float, str), optional
+            Seed selections as (onset in seconds from trial start, box). Each
+            plays at its onset, or as soon as the previous one has finished if
+            that is later; fixations select nothing until all have played
+
+        Returns:
+        --------
+        list of TrialEvent
+            The seed selection, if one is due at trial start
+        """
+        self.trial_start_time = current_time
+        self.last_selection_time = current_time
+        if seed_box is not None:
+            schedule = [(0.0, seed_box)]
+        self.schedule = [(current_time + onset, box) for onset, box in sorted(schedule or [])]
+        self.next_scheduled = 0
+        # Seeds count as selections but not as infant selections
+        self.seeded = bool(self.schedule)
+        return self._play_scheduled(current_time)
+
+    def _schedule_pending(self):
+        return self.next_scheduled < len(self.schedule)
+
+    def _play_scheduled(self, current_time):
+        """Select the next seed box if it is due and nothing is playing."""
+        if not self._schedule_pending() or self.active_box is not None or self.selection_count >= self.max_selections:
+            return []
+        onset, box = self.schedule[self.next_scheduled]
+        if current_time + self.frame_tolerance < onset:
+            return []
+        self.next_scheduled += 1
+        self.selection_count += 1
+        self.last_selection_time = current_time
+        self.active_box = box
+        self.last_triggered[box] = current_time
+        return [self._event(self.SELECT, box, current_time, 0.0, self.selection_count)]
+
+    def add_sample(self, timestamp, hit_box=None, valid=True):
+        """
+        Feed one gaze sample.
+
+        Parameters:
+        -----------
+        timestamp : float
+            Sample time in seconds
+        hit_box : str or None
+            Box containing the sample (None if outside all boxes)
+        valid : bool
+            False for track loss
+        """
+        self.fixation_tracker.update(timestamp, hit_box, valid)
+        self._new_samples = True
+
+    def _end(self, current_time, reason):
+        self.ended = True
+        self.end_reason = reason
+        return self._event(self.END, None, current_time, reason=reason)
+
+    def _check_end(self, current_time):
+        elapsed = current_time - self.trial_start_time
+        if elapsed >= self.max_trial_time:
+            return "max_trial_time"
+        if self.selection_count >= self.max_selections and self.active_box is None:
+            return "max_selections"
+        if self._schedule_pending():
+            # The infant's turn starts once every seed has played
+            return None
+        # Selections made by the infant (seeds do not count)
+        if self.selection_count <= len(self.schedule):
+            # Measured from the last seed selection (the trial start if unseeded)
+            if self.active_box is None and current_time - self.last_selection_time > self.initial_selection_timeout:
+                return "initial_selection_timeout"
+        elif (self.selection_count < self.max_selections and self.active_box is None
+              and current_time - self.last_selection_time > self.selection_timeout):
+            return "selection_timeout"
+        return None
+
+    def step(self, current_time, active_complete=False):
+        """
+        Advance the trial by one frame.
+
+        Parameters:
+        -----------
+        current_time : float
+            Current time in seconds
+        active_complete : bool
+            True if the active box's video finished playing this frame
+
+        Returns:
+        --------
+        list of TrialEvent
+        """
+        if self.ended:
+            return []
+        events = []
+
+        reason = self._check_end(current_time)
+        if reason is not None:
+            events.append(self._end(current_time, reason))
+            return events
+
+        # Active video finished
+        if self.active_box is not None and active_complete:
+            events.append(self._event(self.COMPLETE, self.active_box, current_time))
+            self.last_triggered[self.active_box] = current_time
+            self.active_box = None
+
+        # Promote the queued selection once nothing is playing
+        if self.active_box is None and self.queued_box is not None and self.selection_count < self.max_selections:
+            box = self.queued_box
+            self.selection_count += 1
+            self.last_selection_time = current_time
+            for other_box in self.boxes:
+                if other_box != box:
+                    self.last_triggered[other_box] = float('-inf')
+            self.active_box = box
+            self.queued_box = None
+            events.append(self._event(self.PROMOTE, box, current_time, 0.0, self.selection_count))
+
+        # Seed selections play at their scheduled onsets
+        events.extend(self._play_scheduled(current_time))
+
+        # Fixation checks only when new gaze arrived this frame, and not while seeds remain
+        if self._new_samples:
+            self._new_samples = False
+            if self._schedule_pending():
+                return events
+            for box in self.boxes:
+                fixation_duration = float(self.fixation_tracker.dwell(box))
+                if fixation_duration < self.required_fixation:
+                    continue
+
+                # Immediate trigger only if nothing is playing and the trial isn't full
+                if self.active_box is None and self.selection_count < self.max_selections:
+                    # Enforce cooldown
+                    if current_time - self.last_triggered[box] < self.cooldown:
+                        continue
+                    self.selection_count += 1
+                    self.last_selection_time = current_time
+                    self.active_box = box
+                    self.fixation_tracker.reset(box)
+                    self.last_triggered[box] = current_time
+                    for other_box in self.boxes:
+                        if other_box != box:
+                            self.last_triggered[other_box] = float('-inf')  # Reset cooldown for others
+                    events.append(self._event(self.SELECT, box, current_time, fixation_duration,
+                                              self.selection_count))
+
+                # While a video plays, queue the next candidate (N+1)
+                elif self.active_box is not None and self.selection_count < self.max_selections - 1:
+                    if self.queued_box != box:
+                        self.queued_box = box
+                        self.fixation_tracker.reset(box)
+                        events.append(self._event(self.QUEUE, box, current_time, fixation_duration,
+                                                  self.selection_count + 1))
+        return events
+
+    def finish(self, current_time):
+        """
+        Close the trial.
+
+        Returns:
+        --------
+        list of TrialEvent
+            A DISCARD event if a queued selection was never shown
+        """
+        events = []
+        if not self.ended:
+            events.append(self._end(current_time, "stopped"))
+        if self.queued_box is not None:
+            events.append(self._event(self.DISCARD, self.queued_box, current_time, 0.0, self.selection_count + 1))
+            self.queued_box = None
+        return events
+
+
+class AttentionGetterEngine:
+    """
+    Pure state machine for an attention-getter: when it is over, and how long
+    the infant looked at the screen while it ran.
+
+    Like GazeTriggeredTrialEngine it never reads a clock or draws: the caller
+    feeds it gaze samples (``add_sample``) and advances it once per frame
+    (``step``), which returns the end reason once the attention-getter is over:
+
+        DURATION   - it ran its full duration
+        REENGAGED  - after min_duration, gaze stayed on the screen for reengage_dwell
+        STOPPED    - the caller ended it (``stop``, e.g. on an experimenter key press)
+
+    Looking time is the time between consecutive samples that start on the
+    screen; gaps longer than dropout_tolerance are not counted.
+
+    Parameters:
+    -----------
+    duration : float
+        Maximum duration in seconds
+    reengage_dwell : float or None
+        On-screen dwell in seconds that ends the attention-getter early
+        (default: None, always run the full duration)
+    min_duration : float
+        Re-engagement never ends the attention-getter before this many seconds (default: 1.0)
+    dropout_tolerance : float
+        Track-loss gap in seconds that does not reset the on-screen dwell (default: 0.1)
+    """
+    DURATION = "duration"
+    REENGAGED = "reengaged"
+    STOPPED = "stopped"
+    SCREEN = "screen"
+
+    def __init__(self, duration, reengage_dwell=None, min_duration=1.0, dropout_tolerance=0.1):
+        self.duration = duration
+        self.reengage_dwell = reengage_dwell
+        self.min_duration = min_duration
+        self.dropout_tolerance = dropout_tolerance
+        self.fixation_tracker = FixationTracker([self.SCREEN], dropout_tolerance)
+
+        self.start_time = None
+        self.end_time = None
+        self.ended = False
+        self.end_reason = None
+        self.looking_time = 0.0
+        self.n_samples = 0
+        self._last_sample = None  # (timestamp, on screen)
+
+    def start(self, current_time):
+        """Start the attention-getter at current_time (seconds)."""
+        self.start_time = current_time
+        self.end_time = None
+        self.ended = False
+        self.end_reason = None
+        self.looking_time = 0.0
+        self.n_samples = 0
+        self._last_sample = None
+        self.fixation_tracker.reset()
+
+    def add_sample(self, timestamp, on_screen, valid=True):
+        """
+        Feed one gaze sample.
+
+        Parameters:
+        -----------
+        timestamp : float
+            Sample time in seconds
+        on_screen : bool
+            Whether the sample falls on the screen
+        valid : bool
+            False for track loss
+        """
+        if self.ended:
+            return
+        on_screen = on_screen and valid
+        if self._last_sample is not None:
+            last_time, last_on_screen = self._last_sample
+            if last_on_screen and timestamp - last_time <= self.dropout_tolerance:
+                self.looking_time += timestamp - last_time
+        self._last_sample = (timestamp, on_screen)
+        self.fixation_tracker.update(timestamp, self.SCREEN if on_screen else None, valid)
+        self.n_samples += 1
+
+    def _end(self, current_time, reason):
+        self.ended = True
+        self.end_reason = reason
+        self.end_time = current_time
+        return reason
+
+    def stop(self, current_time):
+        """End the attention-getter now (if it is still running)."""
+        if not self.ended:
+            self._end(current_time, self.STOPPED)
+        return self.end_reason
+
+    def step(self, current_time):
+        """
+        Advance the attention-getter by one frame.
+
+        Returns:
+        --------
+        str or None
+            The end reason once the attention-getter is over, else None
+        """
+        if self.ended:
+            return self.end_reason
+        elapsed = current_time - self.start_time
+        if elapsed >= self.duration:
+            return self._end(current_time, self.DURATION)
+        if (self.reengage_dwell is not None and elapsed >= self.min_duration
+                and self.fixation_tracker.dwell(self.SCREEN) >= self.reengage_dwell):
+            return self._end(current_time, self.REENGAGED)
+        return None
+
+
+def default_box_aoi_index(disp_size=(1920, 1080), aoi_size=(500, 500)):
+    """
+    Return an AOIIndex with the experiment's box layout (pygaze coordinates):
+    cross top-left, stripes bottom-left, dot top-right, grid bottom-right,
+    each centred in its screen quadrant.
+    """
+    w, h = disp_size
+    names = ["cross", "stripes", "dot", "grid"]
+    centers = [(w / 4, h / 4), (w / 4, 3 * h / 4), (3 * w / 4, h / 4), (3 * w / 4, 3 * h / 4)]
+    return AOIIndex.from_centers(names, centers, aoi_size)
+
+
+def plan_seeded_trial(seed_trial, boxes, objects, n_seeds=None, rng=random):
+    """
+    Turn one trial of a parent's selection sequence into a TrialSchedule.
+
+    The parent's first ``n_seeds`` selections become seed selections at the
+    parent's own times (timing_sequence_ms is cumulated into onsets from
+    trial start), and every box the parent saw keeps the object it held, so
+    the child sees the parent's choices replayed. Boxes the parent never
+    selected get objects drawn from the remaining ones. Selections logged
+    without a box (e.g. the pilot's plain shape names) cannot be replayed
+    and are skipped; if none remain, the first box is the seed at trial start.
+
+    Parameters:
+    -----------
+    seed_trial : chain_store.SeedTrial
+        The parent trial (shapes are "box_object" names as logged by DataLogger)
+    boxes : list of str
+        Box names in box order
+    objects : list of str
+        Objects the boxes can hold
+    n_seeds : int, optional
+        Number of parent selections replayed (default: all)
+    rng : random.Random
+        Source for the objects of boxes the parent never selected (default: random)
+
+    Returns:
+    --------
+    TrialSchedule
+    """
+    assignment = {}
+    seeds = []
+    onset_ms = 0
+    for shape, timing_ms in zip(seed_trial.shapes, seed_trial.timings_ms):
+        onset_ms += timing_ms
+        box, _, obj = shape.partition('_')
+        if box not in boxes or obj not in objects:
+            continue
+        if assignment.get(box, obj) != obj or (box not in assignment and obj in assignment.values()):
+            # Contradicts what the boxes held earlier in the trial
+            continue
+        assignment[box] = obj
+        seeds.append((onset_ms / 1000.0, box))
+    if n_seeds is not None:
+        seeds = seeds[:n_seeds]
+    if not seeds:
+        seeds = [(0.0, boxes[0])]
+
+    unused = [obj for obj in objects if obj not in assignment.values()]
+    unused = rng.sample(unused, len(unused))
+    assigned = [assignment[box] if box in assignment else unused.pop() for box in boxes]
+    return TrialSchedule(assigned, seeds, seed_trial.trial_num)
+
+
+def simulate_trial(timestamps, xs, ys, valid=None, aoi_index=None, seed_box=None, schedule=None,
+                   frame_rate=60.0, video_duration=1.5, start_time=None, **engine_params):
+    """
+    Run a gaze-triggered trial headlessly against a recorded or scripted gaze stream.
+
+    A virtual clock advances one frame at a time; every sample up to the
+    frame time is fed to the engine, and each started video is assumed to
+    finish ``video_duration`` seconds after it starts. No window, tracker or
+    real-time waiting is involved, so replays run far faster than real time.
+
+    Parameters:
+    -----------
+    timestamps, xs, ys : array-like
+        Gaze samples (seconds, pygaze pixel coordinates), sorted by time
+    valid : array-like of bool, optional
+        Sample validity (default: samples that are not (-1, -1) or NaN)
+    aoi_index : AOIIndex, optional
+        Box geometry (default: default_box_aoi_index())
+    seed_box : str, optional
+        Box auto-selected at trial start (seeded trials)
+    schedule : list of (float, str), optional
+        Seed selections as (onset in seconds from trial start, box), e.g.
+        TrialSchedule.seeds
+    frame_rate : float
+        Simulated display refresh rate in Hz (default: 60)
+    video_duration : float
+        Simulated video length in seconds (default: 1.5)
+    start_time : float, optional
+        Trial start time (default: first sample time)
+    **engine_params
+        Passed on to GazeTriggeredTrialEngine
+
+    Returns:
+    --------
+    TrialResult
+    """
+    timestamps = np.asarray(timestamps, dtype='f8')
+    xs = np.asarray(xs, dtype='f8')
+    ys = np.asarray(ys, dtype='f8')
+    if valid is None:
+        valid = ~(np.isnan(xs) | np.isnan(ys) | ((xs == -1) & (ys == -1)))
+    valid = np.asarray(valid, dtype=bool)
+    if aoi_index is None:
+        aoi_index = default_box_aoi_index()
+
+    # Hit-test the whole stream up front
+    hits = aoi_index.hit_many(xs, ys)
+    hits[~valid] = -1
+
+    frame_period = 1.0 / frame_rate
+    engine_params.setdefault('frame_tolerance', frame_period / 2)
+    engine = GazeTriggeredTrialEngine(aoi_index.names, **engine_params)
+    if start_time is None:
+        start_time = float(timestamps[0]) if len(timestamps) else 0.0
+
+    events = list(engine.start(start_time, seed_box, schedule))
+    video_end = start_time + video_duration if events else None
+
+    sample_i = 0
+    n_samples = len(timestamps)
+    frame = 0
+    current_time = start_time
+    while not engine.ended:
+        frame += 1
+        current_time = start_time + frame * frame_period
+        # Feed every sample recorded up to this frame
+        while sample_i < n_samples and timestamps[sample_i] <= current_time:
+            hit = hits[sample_i]
+            engine.add_sample(timestamps[sample_i], aoi_index.names[hit] if hit >= 0 else None, valid[sample_i])
+            sample_i += 1
+
+        active_complete = video_end is not None and current_time >= video_end
+        for event in engine.step(current_time, active_complete):
+            events.append(event)
+            if event.kind == engine.COMPLETE:
+                video_end = None
+            elif event.kind in (engine.SELECT, engine.PROMOTE):
+                video_end = current_time + video_duration
+
+    events.extend(engine.finish(current_time))
+    return TrialResult(engine.selection_count, engine.end_reason, start_time, current_time, events)
+
+
+def scripted_gaze(script, aoi_index=None, sample_rate=300.0, start_time=0.0):
+    """
+    Build a synthetic gaze stream from a dwell script.
+
+    Parameters:
+    -----------
+    script : list of (target, duration)
+        target is a box name (gaze at the box centre), None (gaze at the
+        screen centre, outside every box) or "lost" (track loss); duration is
+        in seconds
+    aoi_index : AOIIndex, optional
+        Box geometry (default: default_box_aoi_index())
+    sample_rate : float
+        Samples per second (default: 300, the Tobii rate)
+    start_time : float
+        Time of the first sample in seconds (default: 0.0)
+
+    Returns:
+    --------
+    tuple of numpy arrays
+        (timestamps, xs, ys, valid)
+    """
+    if aoi_index is None:
+        aoi_index = default_box_aoi_index()
+    # Midpoint of the box layout, which lies outside every box
+    screen_center = (aoi_index.left.min() + aoi_index.right.max()) / 2, (aoi_index.top.min() + aoi_index.bottom.max()) / 2
+
+    timestamps, xs, ys, valid = [], [], [], []
+    t = start_time
+    for target, duration in script:
+        n = int(round(duration * sample_rate))
+        if target == "lost":
+            x, y, ok = -1.0, -1.0, False
+        elif target is None:
+            (x, y), ok = screen_center, True
+        else:
+            i = aoi_index.names.index(target)
+            x, y, ok = aoi_index.center_x[i], aoi_index.center_y[i], True
+        timestamps.append(t + np.arange(n) / sample_rate)
+        xs.append(np.full(n, x))
+        ys.append(np.full(n, y))
+        valid.append(np.full(n, ok))
+        t += n / sample_rate
+    return (np.concatenate(timestamps), np.concatenate(xs), np.concatenate(ys), np.concatenate(valid))
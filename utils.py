@@ -1,21 +1,43 @@
+import glob
 import logging
+import math
 import os
-#import pyo as pyo
-from psychopy import prefs
+import random
 
-prefs.hardware['audioLib'] = ['ptb', 'pyo']
+from psychopy import core, gui, visual
 
-from psychopy import sound, core, visual
-import math
-import random
+# Audio backends in order of preference; see init_audio
+AUDIO_LIBS = ['ptb', 'pyo']
+
+_sound = None
+
+
+def init_audio(audio_libs=None):
+    """
+    Select the audio backend and import psychopy.sound, the first time it is
+    needed. Importing psychopy.sound starts the backend (and opens the sound
+    device for ptb), so it is deferred until sounds are loaded rather than
+    paid by everything that imports this module.
 
-print('Using %s(with %s) for sounds' % (sound.audioLib, sound.audioDriver))
+    Parameters:
+    -----------
+    audio_libs : list of str, optional
+        Backends in order of preference (default: AUDIO_LIBS). Only the first
+        call selects the backend.
 
-from psychopy import core, event, visual, data, gui, misc
-import glob, os, random, sys, gc, time, hashlib, subprocess
-from math import *
-from pygaze import libtime, libscreen
-from pygaze.plugins import aoi
+    Returns:
+    --------
+    module
+        psychopy.sound
+    """
+    global _sound
+    if _sound is None:
+        from psychopy import prefs
+        prefs.hardware['audioLib'] = list(audio_libs or AUDIO_LIBS)
+        from psychopy import sound
+        _sound = sound
+        logging.getLogger("InfantEyetracking").info(f"Using {sound.audioLib} (with {sound.audioDriver}) for sounds")
+    return _sound
 
 
 def setup_logging(log_file):
@@ -43,6 +65,7 @@ def setup_logging(log_file):
 
 def enterSubjInfo(expName, optionList):
     """ Brings up a GUI in which to enter all the subject info."""
+    from psychopy import data, misc
 
     def inputsOK(optionList, expInfo):
         for curOption in sorted(optionList.items()):
@@ -83,30 +106,45 @@ def popupError(text):
     errorDlg.show()
 
 
-def loadFilesMovie(directory, extension, fileType, win='', whichFiles='*', stimList=[]):
-    """ Load all the pics and sounds"""
+def loadFiles(directory, extension, fileType, win='', whichFiles='*', stimList=[], manifest=None):
+    """ Load all the pics, sounds and movies of a directory.
+
+    With an AssetManifest (see asset_manifest.py) the file list and image
+    dimensions come from the manifest instead of globbing and probing the
+    disk, and missing stimList entries are reported before anything is loaded.
+    """
     path = os.getcwd()  # set path to current directory
-    if isinstance(extension, list):
+    extensions = extension if isinstance(extension, list) else [extension]
+    if manifest is not None and whichFiles == '*':
+        fileList = manifest.files(os.path.join(path, directory), extensions)
+    else:
         fileList = []
-        for curExtension in extension:
+        for curExtension in extensions:
             fileList.extend(glob.glob(os.path.join(path, directory, whichFiles + curExtension)))
-    else:
-        fileList = glob.glob(os.path.join(path, directory, whichFiles + extension))
+
+    # check before loading anything
+    stimNames = set(os.path.splitext(os.path.basename(curFile))[0] for curFile in fileList)
+    if stimList and stimNames.intersection(stimList) != set(stimList):
+        popupError(str(set(stimList).difference(stimNames)) + " does not exist in " + path + '\\' + directory)
+
     fileMatrix = {}  # initialize fileMatrix  as a dict because it'll be accessed by picture names, cound names, whatver
     for num, curFile in enumerate(fileList):
         fullPath = curFile
         fullFileName = os.path.basename(fullPath)
         stimFile = os.path.splitext(fullFileName)[0]
         if fileType == "image":
-            try:
-                surface = pygame.image.load(fullPath)  # gets height/width of the image
-                stim = visual.ImageStim(win, image=fullPath, mask=None, interpolate=True)
-                fileMatrix[stimFile] = ((stim, fullFileName, num, surface.get_width(), surface.get_height(), stimFile))
-            except:  # no pygame, so don't store the image dims
-                stim = visual.ImageStim(win, image=fullPath, mask=None, interpolate=True)
-                fileMatrix[stimFile] = ((stim, fullFileName, num, '', '', stimFile))
+            entry = manifest.get(fullPath) if manifest is not None else None
+            stim = visual.ImageStim(win, image=fullPath, mask=None, interpolate=True)
+            if entry is not None and 'width' in entry:
+                fileMatrix[stimFile] = ((stim, fullFileName, num, entry['width'], entry['height'], stimFile))
+            else:
+                try:
+                    surface = pygame.image.load(fullPath)  # gets height/width of the image
+                    fileMatrix[stimFile] = ((stim, fullFileName, num, surface.get_width(), surface.get_height(), stimFile))
+                except:  # no pygame, so don't store the image dims
+                    fileMatrix[stimFile] = ((stim, fullFileName, num, '', '', stimFile))
         elif fileType == "sound":
-            soundRef = sound.Sound(fullPath)
+            soundRef = init_audio().Sound(fullPath)
             fileMatrix[stimFile] = ((soundRef))
         elif fileType == "winSound":
             soundRef = open(fullPath, "rb").read()
@@ -115,47 +153,12 @@ def loadFilesMovie(directory, extension, fileType, win='', whichFiles='*', stimL
         elif fileType == "movie":
             movie = visual.MovieStim(win, fullPath, noAudio=True)
             fileMatrix[stimFile] = ((movie))
-
-    # check
-    if stimList and set(fileMatrix.keys()).intersection(stimList) != set(stimList):
-        popupError(str(set(stimList).difference(fileMatrix.keys())) + " does not exist in " + path + '\\' + directory)
     return fileMatrix
 
 
-def loadFiles(directory, extension, fileType, win='', whichFiles='*', stimList=[]):
-    """ Load all the pics and sounds"""
-    path = os.getcwd()  # set path to current directory
-    if isinstance(extension, list):
-        fileList = []
-        for curExtension in extension:
-            fileList.extend(glob.glob(os.path.join(path, directory, whichFiles + curExtension)))
-    else:
-        fileList = glob.glob(os.path.join(path, directory, whichFiles + extension))
-    fileMatrix = {}  # initialize fileMatrix  as a dict because it'll be accessed by picture names, cound names, whatver
-    for num, curFile in enumerate(fileList):
-        fullPath = curFile
-        fullFileName = os.path.basename(fullPath)
-        stimFile = os.path.splitext(fullFileName)[0]
-        if fileType == "image":
-            try:
-                surface = pygame.image.load(fullPath)  # gets height/width of the image
-                stim = visual.ImageStim(win, image=fullPath, mask=None, interpolate=True)
-                fileMatrix[stimFile] = ((stim, fullFileName, num, surface.get_width(), surface.get_height(), stimFile))
-            except:  # no pygame, so don't store the image dims
-                stim = visual.ImageStim(win, image=fullPath, mask=None, interpolate=True)
-                fileMatrix[stimFile] = ((stim, fullFileName, num, '', '', stimFile))
-        elif fileType == "sound":
-            soundRef = sound.Sound(fullPath)
-            fileMatrix[stimFile] = ((soundRef))
-        elif fileType == "winSound":
-            soundRef = open(fullPath, "rb").read()
-            fileMatrix[stimFile] = ((soundRef))
-            fileMatrix[stimFile + '-path'] = fullPath  # this allows asynchronous playing in winSound.
-
-    # check
-    if stimList and set(fileMatrix.keys()).intersection(stimList) != set(stimList):
-        popupError(str(set(stimList).difference(fileMatrix.keys())) + " does not exist in " + path + '\\' + directory)
-    return fileMatrix
+def loadFilesMovie(directory, extension, fileType, win='', whichFiles='*', stimList=[], manifest=None):
+    """ Load all the movies (same as loadFiles) """
+    return loadFiles(directory, extension, fileType, win, whichFiles, stimList, manifest)
 
 
 def buildScreenPsychoPy(screen, stimuli):
@@ -179,6 +182,7 @@ def setAndPresentScreen(display, screen, duration=0):
     else:
         display.show()
         # relies on pygaze's libtime module
+        from pygaze import libtime
         libtime.pause(duration)
 
 def assign_shape_positions(shapes, possible_locations):
@@ -214,11 +218,17 @@ def draw_static_shapes(preloaded_stimuli):
         stim.draw()
 
 
-def draw_static_videos(preloaded_videos):
+def draw_static_videos(preloaded_videos, still_frames=None):
     """
     Draws preloaded video stimuli paused on first frame.
+
+    If still_frames ({box: ImageStim}) has a cached still for a box, the still
+    is drawn instead of touching that box's video decoder.
     """
-    for video in preloaded_videos.values():
+    for box, video in preloaded_videos.items():
+        if still_frames and still_frames.get(box) is not None:
+            still_frames[box].draw()
+            continue
         # Ensure video is paused (will show current frame)
         if not video.isFinished:
             video.pause()
@@ -258,6 +268,14 @@ def psychopy_to_pygaze(psychopy_coord, screen_width=1920, screen_height=1080, y_
     return (pyg_x, pyg_y)
 
 
+def play_sound(snd, audio_scheduler=None, label=''):
+    """Play a sound now, or with the next flip through an AudioScheduler (see audio_scheduler.py)."""
+    if audio_scheduler is not None:
+        audio_scheduler.play_at_flip(snd, label)
+    else:
+        snd.play()
+
+
 class LoomAnimation:
     """
     Animation class that handles the looming, jiggling, and fade-back phases
@@ -297,6 +315,13 @@ class LoomAnimation:
         Sound to play during looming phase (default: None)
     selection_sound : psychopy.sound.Sound
         Sound to play during jiggling phase (default: None)
+    audio_scheduler : AudioScheduler, optional
+        If given, sounds start with the next flip instead of immediately (default: None)
+    frame_profiler : FrameProfiler, optional
+        If given, run_to_completion flips through the profiler so frames are timed (default: None)
+
+    update() only advances the animation state and draw() only draws; neither
+    flips the window. The caller owns the flip so each frame flips exactly once.
     """
     # Define explicit states
     LOOMING = "looming"
@@ -309,7 +334,7 @@ class LoomAnimation:
                  init_opacity=0.3, target_opacity=1.0,
                  loom_duration=1.0, jiggle_duration=0.5, fade_duration=0.5,
                  jiggle_amplitude=5, jiggle_frequency=2,
-                 loom_sound=None, selection_sound=None):
+                 loom_sound=None, selection_sound=None, frame_profiler=None, audio_scheduler=None):
 
         self.stim = stim
         self.win = win
@@ -325,6 +350,7 @@ class LoomAnimation:
         self.fade_duration = fade_duration
         self.jiggle_amplitude = jiggle_amplitude
         self.jiggle_frequency = jiggle_frequency
+        self.frame_profiler = frame_profiler
 
         # Store the original stimulus properties to restore later
         self.original_size = stim.size
@@ -336,6 +362,7 @@ class LoomAnimation:
         self.selection_sound = selection_sound
         self.loom_sound_played = False
         self.selection_sound_played = False
+        self.audio_scheduler = audio_scheduler
 
         # Animation state
         from psychopy import core
@@ -375,7 +402,7 @@ class LoomAnimation:
 
         if self.state == self.LOOMING:
             if not self.loom_sound_played and self.loom_sound is not None:
-                self.loom_sound.play()
+                play_sound(self.loom_sound, self.audio_scheduler, f"loom {self.current_shape}")
                 self.loom_sound_played = True
 
             if elapsed < self.loom_duration:
@@ -388,7 +415,7 @@ class LoomAnimation:
 
         elif self.state == self.JIGGLING:
             if not self.selection_sound_played and self.selection_sound is not None:
-                self.selection_sound.play()
+                play_sound(self.selection_sound, self.audio_scheduler, f"selection {self.current_shape}")
                 self.selection_sound_played = True
 
             if elapsed < self.jiggle_duration:
@@ -409,12 +436,10 @@ class LoomAnimation:
                 self.state = self.COMPLETE
                 self.reset_stimulus()
 
-        self.draw()
-
         return self.state == self.COMPLETE
 
     def draw(self):
-        """Draw the current animation frame to the window"""
+        """Draw the current animation frame to the window (does not flip)"""
         # Draw the background stimuli if available
         if self.background_stimuli:
             for shape, bg_stim in self.background_stimuli.items():
@@ -423,7 +448,12 @@ class LoomAnimation:
 
         # Draw the animated stimulus
         self.stim.draw()
-        self.win.flip()
+
+    def _flip(self):
+        if self.frame_profiler is not None:
+            self.frame_profiler.flip()
+        else:
+            self.win.flip()
 
     def reset_stimulus(self):
         """Reset the stimulus to its initial state"""
@@ -443,21 +473,28 @@ class LoomAnimation:
         looming_end = core.getTime() + self.loom_duration
         while core.getTime() < looming_end:
             self.update()
+            self.draw()
+            self._flip()
 
         # Run the jiggling phase
         jiggling_end = core.getTime() + self.jiggle_duration
         while core.getTime() < jiggling_end:
             self.update()
+            self.draw()
+            self._flip()
 
         # Run the fade-back phase
         fade_end = core.getTime() + self.fade_duration
         while core.getTime() < fade_end:
             self.update()
+            self.draw()
+            self._flip()
 
         # Ensure we're fully complete
         self.state = self.COMPLETE
         self.reset_stimulus()
         self.draw()
+        self._flip()
 
 
 class VideoAnimation:
@@ -479,13 +516,22 @@ class VideoAnimation:
         The name/identifier of the object being revealed (e.g., "ball", "cat")
     background_videos : dict
         Dictionary of {box_name: video_stim} for all background boxes
-    video_duration : float
-        Maximum duration fallback in seconds (default: 1.5). Videos play to completion
-        naturally, but this provides a safety timeout if needed.
+    video_duration : float, optional
+        Length of the video in seconds, e.g. from the asset manifest (default: 1.5).
+        If None, the video's own duration is read once here.
     selection_sound : psychopy.sound.Sound
         Sound to play when video starts playing  (default: None)
     loom_sound : psychopy.sound.Sound
         Sound to play when video starts (looming phase) (default: None)
+    background_stills : dict, optional
+        Dictionary of {box_name: ImageStim} cached still frames drawn in place
+        of the paused background videos (default: None)
+    audio_scheduler : AudioScheduler, optional
+        If given, the loom sound starts with the next flip instead of immediately (default: None)
+
+    update() only advances the playback state and draw() only draws; neither
+    flips the window. The trial loop must call draw() and flip once per frame
+    while the video is playing, since MovieStim only advances when drawn.
     """
     # Define explicit states
     PAUSED_FIRST = "paused_first"
@@ -494,18 +540,29 @@ class VideoAnimation:
     COMPLETE = "complete"
 
     def __init__(self, video, win, pos, current_box, current_object, background_videos,
-                 video_duration=1.5, selection_sound=None, loom_sound=None):
+                 video_duration=1.5, selection_sound=None, loom_sound=None, background_stills=None,
+                 audio_scheduler=None):
         self.video = video
         self.win = win
         self.pos = pos
         self.current_box = current_box
         self.current_object = current_object
         self.background_videos = background_videos
+        self.background_stills = background_stills
+        if video_duration is None:
+            # Not known in advance: ask the decoder once rather than every frame
+            try:
+                video_duration = self.video.duration
+            except Exception:
+                video_duration = None
+            if video_duration is None or video_duration <= 0:
+                video_duration = 1.5  # Default fallback for ~1.5 second videos
         self.video_duration = video_duration
         self.selection_sound = selection_sound
         self.selection_sound_played = False
         self.loom_sound = loom_sound
         self.loom_sound_played = False
+        self.audio_scheduler = audio_scheduler
 
         # Set video properties
         self.video.pos = pos
@@ -559,7 +616,7 @@ class VideoAnimation:
         
         # Play loom sound when video starts (looming phase)
         if self.loom_sound is not None and not self.loom_sound_played:
-            self.loom_sound.play()
+            play_sound(self.loom_sound, self.audio_scheduler, f"loom {self.current_box}")
             self.loom_sound_played = True
         
         # Selection sound removed - only using loom sound
@@ -588,20 +645,11 @@ class VideoAnimation:
         if self.state == self.PLAYING:
             # Calculate elapsed time since video started
             elapsed = current_time - self.start_time
-            
-            # CRITICAL: Videos must be drawn every frame to continue playing
-            # Draw the video first to keep it playing
-            self.draw()
-            
-            # Use the actual video duration instead of relying on isFinished
+
+            # Use the known video duration instead of relying on isFinished
             # isFinished can be unreliable in PsychoPy, especially with certain video backends
-            try:
-                video_duration = self.video.duration
-                if video_duration is None or video_duration <= 0:
-                    video_duration = 1.5  # Default fallback for ~1.5 second videos
-            except Exception:
-                video_duration = 1.5  # Fallback if duration not available
-            
+            video_duration = self.video_duration
+
             # Only finish when we've played the full video duration (plus a small buffer)
             if elapsed >= video_duration:
                 logger.info(f"Video {self.current_box} completed: elapsed={elapsed:.2f}s, duration={video_duration:.2f}s")
@@ -609,29 +657,26 @@ class VideoAnimation:
                 # Pause on last frame to keep it displayed
                 self.video.pause()
                 self.state = self.PAUSED_LAST
-                # Draw one final time to show the last frame
-                self.draw()
                 return True
-            
-            # Video is still playing - return False to continue
-            return False
 
-        # If not in PLAYING state, still draw (might be paused on first frame)
-        self.draw()
+        # Video is still playing (or paused) - return False to continue
         return False
 
     def draw(self):
-        """Draw the current video frame and background videos to the window"""
+        """Draw the current video frame and background videos to the window (does not flip)"""
         # Draw the background videos if available
         if self.background_videos:
             for box_name, bg_video in self.background_videos.items():
                 if box_name != self.current_box:
-                    # Draw background videos paused on first frame
-                    bg_video.draw()
+                    if self.background_stills and self.background_stills.get(box_name) is not None:
+                        # Cached still frame - no decoder work
+                        self.background_stills[box_name].draw()
+                    else:
+                        # Draw background videos paused on first frame
+                        bg_video.draw()
 
         # Draw the current video
         self.video.draw()
-        self.win.flip()
 
     def is_complete(self):
         """Check if video playback is complete"""
@@ -0,0 +1,166 @@
+import os
+import threading
+from collections import OrderedDict
+
+from psychopy import visual
+
+
+class VideoPool:
+    """
+    Lazily opened, LRU-evicted pool of box videos ({box}_{obj}.mp4).
+
+    Instead of constructing a MovieStim for every box/object combination at
+    startup, the pool only records which files exist and opens a decoder the
+    first time a combination is requested. The next trial's combinations can
+    be prefetched: a background thread reads the files so they are in the OS
+    page cache, and ``service`` (called once per frame from the main thread,
+    e.g. during the fixator spin or the attention-getter) opens at most one
+    pending decoder per call. MovieStim creation touches the OpenGL context,
+    so decoders are only ever opened on the main thread.
+
+    Once more than ``max_decoders`` decoders are open, the least recently used
+    ones that are not pinned by the current trial are unloaded, which caps the
+    resident decoder memory.
+
+    Parameters:
+    -----------
+    win : psychopy.visual.Window
+        The window the videos are drawn to
+    movie_path : str
+        Directory containing the {box}_{obj}.mp4 files
+    box_types : list of str
+        Box styles (e.g. ["cross", "stripes", "dot", "grid"])
+    objects : list of str
+        Objects that can be revealed (e.g. ["ball", "cat", ...])
+    logger : logging.Logger
+        Experiment logger
+    max_decoders : int
+        Maximum number of open decoders before idle ones are evicted (default: 8)
+    size : tuple (w, h)
+        Size applied to every video (default: (500, 500))
+    """
+
+    def __init__(self, win, movie_path, box_types, objects, logger, max_decoders=8, size=(500, 500)):
+        self.win = win
+        self.movie_path = movie_path
+        self.logger = logger
+        self.max_decoders = max_decoders
+        self.size = size
+
+        self._videos = OrderedDict()  # {(box, obj): MovieStim}, least recently used first
+        self._pinned = set()
+        self._pending = []            # prefetched keys waiting to be opened on the main thread
+        self._lock = threading.Lock()
+
+        # Only check which files exist; nothing is decoded until it is needed
+        self.paths = {}
+        for box in box_types:
+            for obj in objects:
+                video_path = os.path.join(movie_path, f"{box}_{obj}.mp4")
+                if os.path.exists(video_path):
+                    self.paths[(box, obj)] = video_path
+                else:
+                    self.logger.warning(f"Video file not found: {video_path}")
+
+    def available(self, box, obj):
+        """Return True if a video file exists for this box/object combination."""
+        return (box, obj) in self.paths
+
+    def available_objects(self, box):
+        """Return the objects that have a video for the given box."""
+        return [obj for (b, obj) in self.paths if b == box]
+
+    def is_open(self, box, obj):
+        """Return True if the decoder for this combination is already open."""
+        return (box, obj) in self._videos
+
+    def get(self, box, obj):
+        """
+        Return the MovieStim for a box/object combination, opening it if needed.
+
+        Raises:
+        -------
+        FileNotFoundError
+            If no video file exists for the combination
+        """
+        key = (box, obj)
+        if key not in self.paths:
+            raise FileNotFoundError(f"Required video file not found: {box}_{obj}.mp4")
+
+        if key in self._videos:
+            self._videos.move_to_end(key)
+            return self._videos[key]
+
+        video = self._open(key)
+        self._evict()
+        return video
+
+    def pin(self, keys):
+        """Protect the given (box, obj) keys from eviction (replaces previous pins)."""
+        self._pinned = set(keys)
+
+    def prefetch(self, keys):
+        """
+        Schedule (box, obj) keys to be opened ahead of time.
+
+        Files are read in a background thread to warm the OS cache; the
+        decoders themselves are opened by ``service`` on the main thread.
+        """
+        keys = [key for key in keys if key in self.paths and key not in self._videos]
+        if not keys:
+            return
+        with self._lock:
+            for key in keys:
+                if key not in self._pending:
+                    self._pending.append(key)
+        threading.Thread(target=self._warm_files, args=(keys,), name="VideoPoolPrefetch", daemon=True).start()
+
+    def service(self):
+        """
+        Open at most one pending prefetched decoder. Call once per frame from
+        the main thread while nothing timing-critical is playing.
+
+        Returns:
+        --------
+        bool
+            True if there are still pending decoders to open
+        """
+        with self._lock:
+            key = self._pending.pop(0) if self._pending else None
+        if key is not None and key not in self._videos:
+            self._open(key)
+            self._evict()
+        return bool(self._pending)
+
+    def _open(self, key):
+        box, obj = key
+        video = visual.MovieStim(self.win, self.paths[key], noAudio=True, loop=False)
+        video.size = self.size
+        self._videos[key] = video
+        self.logger.info(f"Opened video decoder {box}_{obj} ({len(self._videos)} open)")
+        return video
+
+    def _evict(self):
+        # Unload least recently used decoders that the current trial is not using
+        for key in list(self._videos.keys()):
+            if len(self._videos) <= self.max_decoders:
+                break
+            if key in self._pinned:
+                continue
+            video = self._videos.pop(key)
+            unload = getattr(video, 'unload', None)
+            if unload is not None:
+                unload()
+            else:
+                video.stop()
+            self.logger.info(f"Evicted idle video decoder {key[0]}_{key[1]}")
+
+    def _warm_files(self, keys):
+        # Read the files once so opening the decoder later does not wait on the disk
+        for key in keys:
+            try:
+                with open(self.paths[key], 'rb') as f:
+                    while f.read(1 << 20):
+                        pass
+            except OSError as e:
+                self.logger.warning(f"Could not prefetch {self.paths[key]}: {e}")